@@ -0,0 +1,109 @@
+import csv
+import time
+import argparse
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDDispatcher import Mini4WDActuatorState
+from Mini4WDHandler import Mini4WDSerialHandler,Mini4WDSerialLoopback
+
+class CountingSerialHandler(Mini4WDSerialHandler):
+    '''
+    送信したフレームの数(往復の回数)を数えるMini4WDSerialHandler
+    '''
+
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.RoundTrips = 0
+
+    def Send(self,key,value):
+        self.RoundTrips += 1
+        super().Send(key,value)
+
+def CreateLap(filepath):
+    '''
+    DutyMapの外周を1周するエリアの列を作り，エリアごとのアクチュエータの状態を返す．
+    LEDはduty比が下がるエリアで右，上がるエリアで左を点ける．
+
+    Returns
+    -------
+    lap:list context=tuple
+        エリアごとの(duty比,右のLED,左のLED)
+    '''
+    with open(filepath,newline='') as f:
+        DutyMap = [[float(value) for value in row] for row in csv.reader(f) if len(row) > 0]
+    H, W    = len(DutyMap), len(DutyMap[0])
+    cells   = [(x,0) for x in range(W)]+[(W-1,y) for y in range(1,H)]+\
+                [(x,H-1) for x in range(W-2,-1,-1)]+[(0,y) for y in range(H-2,0,-1)]
+    lap     = list()
+    for i, (x, y) in enumerate(cells):
+        duty        = DutyMap[y][x]
+        previous    = DutyMap[cells[i-1][1]][cells[i-1][0]]
+        lap.append((duty,duty < previous,duty > previous))
+    return lap
+
+def RunLegacy(app,lap):
+    '''
+    エリアが変わるたびにduty比と左右のLEDを別々に送信する(従来の方法)
+    '''
+    for duty, rightLED, leftLED in lap:
+        app.SendDutyCommand(duty)
+        if rightLED:
+            app.onRightLED()
+        else:
+            app.offRightLED()
+        if leftLED:
+            app.onLeftLED()
+        else:
+            app.offLeftLED()
+
+def RunBatched(app,lap,M4DAS,Batched=True):
+    '''
+    変わった項目だけをSendActuatorStateで一度に送信する．
+    Batchedが偽ならSendActuatorStateを持たないJavaプログラムと同じく変わった項目を一つずつ送信する
+    '''
+    for duty, rightLED, leftLED in lap:
+        changed = M4DAS.Diff(duty=duty,rightLED=rightLED,leftLED=leftLED)
+        if len(changed) == 0:
+            continue
+        if Batched:
+            app.SendActuatorState(*Mini4WDActuatorState.Pack(changed))
+            continue
+        for key, value in changed.items():
+            app.Send(key,value)
+
+def main():
+    '''
+    DutyMapの外周を回る周回について，1周あたりの往復の回数と時間を
+    従来の方法，変わった項目だけを一つずつ送信する方法，一度に送信する方法で比べる．
+    疑似端末に対してAcknowledgeありで送信するので，時間には往復の待ち時間が含まれる．
+
+    python BenchmarkActuatorCommands.py [--laps 20] [--delay 0.002] [--dmap ./dmap/ini.csv]
+    '''
+    parser = argparse.ArgumentParser(description='Count actuator round trips per lap with and without batching.')
+    parser.add_argument('--laps',type=int,default=20)
+    parser.add_argument('--delay',type=float,default=0.002,help='echo delay of the pty loopback [s]')
+    parser.add_argument('--dmap',default=None,help='duty map CSV (default: CSVFilePath in the setting file)')
+    parser.add_argument('--setting',default='./.setting')
+    args = parser.parse_args()
+
+    M4DIr       = Mini4WDInitializer(args.setting)
+    lap         = CreateLap(args.dmap or M4DIr.GetFileValue('CSVFilePath'))
+    loopback    = Mini4WDSerialLoopback(args.delay)
+    print('{} cells per lap , {} laps , echo delay {:.1f} ms'.format(len(lap),args.laps,args.delay*1000))
+    print('{:<24}{:>16}{:>16}'.format('method','round trips/lap','ms/lap'))
+    for name in ('legacy','changed fields','batched'):
+        app     = CountingSerialHandler(loopback.GetPortName(),M4DIr.GetFileValue('BaundRate'),Acknowledge=True,\
+                    Protocol=Mini4WDSerialHandler.Protocols[0])         # 疑似端末は送り返すだけなので形式によらない
+        M4DAS   = Mini4WDActuatorState()
+        start   = time.perf_counter()
+        for i in range(args.laps):
+            if name == 'legacy':
+                RunLegacy(app,lap)
+            else:
+                RunBatched(app,lap,M4DAS,name == 'batched')
+        elapsed = time.perf_counter()-start
+        print('{:<24}{:>16.1f}{:>16.2f}'.format(name,app.RoundTrips/args.laps,elapsed/args.laps*1000))
+        app.Close()
+    loopback.Close()
+
+if __name__ == "__main__":
+    main()
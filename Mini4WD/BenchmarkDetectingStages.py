@@ -0,0 +1,75 @@
+import time
+import platform
+import argparse
+from Mini4WDDetector import Mini4WDDetector
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLogger import Mini4WDLogger
+from Mini4WDHandler import Mini4WDHandlerForTest
+from Mini4WDReplay import Mini4WDReplayCapture,Mini4WDSyntheticCapture
+from Mini4WDProfiler import Mini4WDProfiler
+
+# 結果と一緒に保存する設定
+SettingKeys = ('TrimTop','TrimBottom','TrimLeft','TrimRight','DivFrame','DivMapH','DivMapW',\
+                'BGSMethod','DetectionBackend','SearchWindow','Tracker','CaptureBufferSize','PipelineMode')
+
+def main():
+    '''
+    録画した映像もしくは作成した映像で実際のStartDetectingMini4WDを実行し，
+    各段階の時間のp50,p95,p99,最大値をJSONファイルに保存する．
+
+    python BenchmarkDetectingStages.py [映像ファイルもしくはフォルダ] [--output 保存先]
+    映像を指定しなかった場合は楕円のコースを周回する映像を作成して使う．
+    '''
+    parser = argparse.ArgumentParser(description='Measure the latency of each stage of the detection loop.')
+    parser.add_argument('source',nargs='?',default=None,help='video file or frame directory (default: synthetic footage)')
+    parser.add_argument('--output',default='./benchmark.json')
+    parser.add_argument('--setting',default='./.setting')
+    parser.add_argument('--bgsi',default=None,help='saved back ground substractor image')
+    parser.add_argument('--frames',type=int,default=1200,help='number of synthetic frames')
+    parser.add_argument('--width',type=int,default=1280)
+    parser.add_argument('--height',type=int,default=720)
+    args = parser.parse_args()
+
+    M4DIr   = Mini4WDInitializer(args.setting)
+    M4DL    = Mini4WDLogger(M4DIr)
+    M4DH    = Mini4WDHandlerForTest(M4DL)
+    if args.source is None:
+        # トリミング後の範囲にコースが収まるようにする
+        top, bottom = int(M4DIr.GetFileValue('TrimTop')),int(M4DIr.GetFileValue('TrimBottom'))
+        left, right = int(M4DIr.GetFileValue('TrimLeft')),int(M4DIr.GetFileValue('TrimRight'))
+        camera      = Mini4WDSyntheticCapture(args.width,args.height,((left+right)/2,(top+bottom)/2),\
+                        ((right-left)*0.4,(bottom-top)*0.4),FrameCount=args.frames)
+    else:
+        camera      = Mini4WDReplayCapture(args.source,'fast')
+    M4DD    = Mini4WDDetector(M4DH,camera,args.bgsi)
+    M4DPF   = Mini4WDProfiler()
+    M4DD.SetM4DPF(M4DPF)
+
+    M4DL.UpdateDetectionLogFile()
+    first   = camera.GetFrameNum()
+    start   = time.perf_counter()
+    M4DD.StartDetectingMini4WD()
+    elapsed = time.perf_counter()-start
+    frames  = camera.GetFrameNum()-first
+
+    information = {
+        'source'    :'synthetic' if args.source is None else args.source,
+        'frames'    :frames,
+        'elapsed'   :elapsed,
+        'fps'       :frames/elapsed if elapsed > 0 else 0.0,
+        'time'      :time.strftime("%Y%m%d%H%M%S", time.localtime()),
+        'platform'  :platform.platform(),
+        'python'    :platform.python_version(),
+        'settings'  :{key:M4DIr.GetFileValue(key,'') for key in SettingKeys},
+    }
+    M4DPF.SaveJSON(args.output,information)
+
+    print('frames:{} time:{:.3f}s fps:{:.1f}'.format(frames,elapsed,information['fps']))
+    for stage, summary in M4DPF.GetSummary().items():
+        if summary['count'] > 0:
+            print('{:<10} n={:<6} p50={:.3f}ms p95={:.3f}ms p99={:.3f}ms max={:.3f}ms'\
+                .format(stage,summary['count'],summary['p50'],summary['p95'],summary['p99'],summary['max']))
+    print('saved to',args.output)
+
+if __name__ == "__main__":
+    main()
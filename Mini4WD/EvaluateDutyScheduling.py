@@ -0,0 +1,152 @@
+import csv
+import glob
+import argparse
+import numpy as np
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLocationTable import Mini4WDLocationTable,ParseBoundaries
+from Mini4WDScheduler import Mini4WDDutyScheduler
+from Mini4WDTracker import Mini4WDTracker
+from Mini4WDBinaryLog import ReadDetectionLog as ReadBinaryDetectionLog
+
+class RecordedDutyMap():
+    '''
+    Mini4WDLocationTableに渡すための，CSVファイルから読み込んだだけのDutyMap．
+    Mini4WDDutyMapはMini4WDHandlerがないと作れないので代わりに使う．
+    '''
+
+    def __init__(self,filepath):
+        with open(filepath,newline='') as f:
+            self.DutyMap = [[float(value) for value in row] for row in csv.reader(f) if len(row) > 0]
+
+    def GetVersion(self):
+        return 0
+
+    def GetDutyMap(self):
+        return self.DutyMap
+
+def ReadDetectionLog(filepath):
+    '''
+    検知ログ(_detection_N.csvか_detection_N.bin)を読み込む．
+
+    Returns
+    -------
+    log:array_like
+        time,mapX,mapY,xCoordinate,yCoordinateの列を持つ配列
+    '''
+    if filepath.endswith('.bin'):
+        log = ReadBinaryDetectionLog(filepath)
+        return np.stack([log[name].astype(np.float64) for name in log.dtype.names[:5]],axis=1).reshape(-1,5)
+    with open(filepath,newline='') as f:
+        reader = csv.reader(f)
+        next(reader)                                # ヘッダ
+        rows = [row[:5] for row in reader if len(row) >= 5]
+    return np.asarray(rows,dtype=np.float64).reshape(-1,5)
+
+def Evaluate(log,M4DLT,M4DIr,LeadTime,Latency):
+    '''
+    記録した検知ログを順に予測にかけ，実際にエリアが変わった時刻と
+    そのエリアのduty比を送信した時刻を比べる．
+
+    Parameters
+    ----------
+    log:array_like
+        ReadDetectionLogで読み込んだ検知ログ
+    M4DLT:Mini4WDLocationTable
+        座標からエリアを求める表
+    M4DIr:Mini4WDInitializer
+        トラッカーの設定を読み込むインスタンス
+    LeadTime:float
+        コマンドの遅れに加えて，どれだけ早く送信するか[s]
+    Latency:float
+        フレームの取得からコマンドの送信が終わるまでの時間[s]
+
+    Returns
+    -------
+    Transitions:int
+        エリアが変わった回数
+    OnTime:int
+        エリアに入る時刻までに送信が終わっていた回数
+    Leads:list context=float
+        送信を始めてからエリアに入るまでの時間[ms]．予測せずに入った場合は0
+    Counters:tuple
+        Mini4WDDutyScheduler.GetCounters
+    '''
+    M4DT    = Mini4WDTracker(float(M4DIr.GetFileValue('TrackerAlpha','0.75')),\
+                float(M4DIr.GetFileValue('TrackerBeta','0.45')),\
+                float(M4DIr.GetFileValue('TrackerMaxCoast','0.5')))
+    M4DDS   = Mini4WDDutyScheduler(M4DLT,LeadTime,float(M4DIr.GetFileValue('DutyMaxHorizon','0.5')))
+    Sent    = dict()                                # エリアをキーとして，そのエリアを送信した時刻
+    Target  = None
+    Transitions, OnTime, Leads = 0, 0, list()
+    Previous = None
+    for t, mapX, mapY, gx, gy in log:
+        cell = (int(mapX),int(mapY))
+        M4DT.Update(gx,gy,t)
+        vx, vy = M4DT.GetVelocity()
+        if Previous is not None and cell != Previous:
+            Transitions += 1
+            sent = Sent.get(cell,t)                 # 予測していなければこのフレームで送信する
+            lead = t-sent-Latency                   # 送信が終わってからエリアに入るまでの時間
+            Leads.append((t-sent)*1000)
+            if lead >= 0:
+                OnTime += 1
+            Sent = dict()
+        Previous = cell
+        targetX, targetY, DutyRatio = M4DDS.Update(gx,gy,vx,vy,t,Latency)
+        if (targetX,targetY) != Target:
+            Target = (targetX,targetY)
+            Sent[Target] = t
+    return Transitions,OnTime,Leads,M4DDS.GetCounters()
+
+def main():
+    '''
+    記録した検知ログに対して，LeadTimeごとに予測の当たり具合と
+    エリアに入るまでにduty比の送信が間に合った割合を求める．
+
+    python EvaluateDutyScheduling.py ./log/20200101000000/*_detection_*.csv [--lead 0 25 50 100] [--latency 40]
+    --latencyを指定しない場合は，--commandで指定した_command.csvの中央値を使う．
+    '''
+    parser = argparse.ArgumentParser(description='Evaluate predictive duty scheduling against recorded detection logs.')
+    parser.add_argument('logs',nargs='+')
+    parser.add_argument('--lead',type=float,nargs='+',default=[0,25,50,75,100],help='lead times [ms]')
+    parser.add_argument('--latency',type=float,default=None,help='frame-to-command latency [ms]')
+    parser.add_argument('--command',default=None,help='_command.csv to take the latency from')
+    parser.add_argument('--dmap',default=None,help='duty map CSV (default: CSVFilePath in the setting file)')
+    parser.add_argument('--setting',default='./.setting')
+    args = parser.parse_args()
+
+    M4DIr = Mini4WDInitializer(args.setting)
+    Latency = 0.0
+    if args.latency is not None:
+        Latency = args.latency/1000
+    elif args.command is not None:
+        with open(args.command,newline='') as f:
+            rows = [row for row in csv.DictReader(f) if row['frameTime'] != '']
+        Latency = float(np.median([float(row['completeTime'])-float(row['frameTime']) for row in rows])) if rows else 0.0
+
+    DivFrame    = int(M4DIr.GetFileValue('DivFrame'))
+    height      = (int(M4DIr.GetFileValue('TrimBottom'))-int(M4DIr.GetFileValue('TrimTop')))//DivFrame
+    width       = (int(M4DIr.GetFileValue('TrimRight'))-int(M4DIr.GetFileValue('TrimLeft')))//DivFrame
+    M4DLT       = Mini4WDLocationTable(RecordedDutyMap(args.dmap or M4DIr.GetFileValue('CSVFilePath')),\
+                    ParseBoundaries(M4DIr.GetFileValue('MapBoundariesX','')),\
+                    ParseBoundaries(M4DIr.GetFileValue('MapBoundariesY','')))
+    M4DLT.Build((height,width))
+    logs        = [ReadDetectionLog(path) for pattern in args.logs for path in sorted(glob.glob(pattern))]
+
+    print('latency {:.1f} ms , {} logs , frame {}x{}'.format(Latency*1000,len(logs),width,height))
+    print('{:>9} {:>11} {:>8} {:>10} {:>6} {:>6} {:>10} {:>10}'\
+        .format('lead[ms]','transitions','on time','scheduled','hit','miss','lead p50','lead p5'))
+    for lead in args.lead:
+        Transitions, OnTime, Leads, Counters = 0, 0, list(), np.zeros(3,dtype=np.int64)
+        for log in logs:
+            transitions, ontime, leads, counters = Evaluate(log,M4DLT,M4DIr,lead/1000,Latency)
+            Transitions += transitions
+            OnTime      += ontime
+            Leads       += leads
+            Counters    += np.asarray(counters[:3],dtype=np.int64)
+        p50, p5 = np.percentile(Leads,(50,5)) if Leads else (0.0,0.0)
+        print('{:>9.0f} {:>11} {:>7.1f}% {:>10} {:>6} {:>6} {:>8.1f}ms {:>8.1f}ms'\
+            .format(lead,Transitions,OnTime/Transitions*100 if Transitions else 0.0,*Counters,p50,p5))
+
+if __name__ == "__main__":
+    main()
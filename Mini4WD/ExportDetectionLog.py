@@ -0,0 +1,31 @@
+import glob
+import argparse
+from Mini4WDBinaryLog import ReadDetectionLog,ReadDetectionSession,ExportDetectionLogAsCSV
+
+def main():
+    '''
+    バイナリ形式の検知ログ(_detection_N.bin)をcsv形式の検知ログと同じ列のcsvファイルに書き出す．
+    --sessionを指定した場合は，ログファイルの名前を渡してそのフォルダの検知ログをすべてつなげて書き出す．
+
+    python ExportDetectionLog.py ./log/20200101000000/*_detection_*.bin [--car]
+    python ExportDetectionLog.py ./log/20200101000000/20200101000000 --session [--car]
+    '''
+    parser = argparse.ArgumentParser(description='Export binary detection logs as CSV.')
+    parser.add_argument('logs',nargs='+')
+    parser.add_argument('--session',action='store_true',help='treat the arguments as log file names and join all runs')
+    parser.add_argument('--car',action='store_true',help='add the car column (multi-car sessions)')
+    args = parser.parse_args()
+
+    if args.session:
+        for LogFileName in args.logs:
+            log = ReadDetectionSession(LogFileName)
+            ExportDetectionLogAsCSV(log,LogFileName+'_detection.csv',args.car)
+            print('{} rows -> {}'.format(len(log),LogFileName+'_detection.csv'))
+        return
+    for path in [path for pattern in args.logs for path in sorted(glob.glob(pattern))]:
+        log = ReadDetectionLog(path)
+        ExportDetectionLogAsCSV(log,path[:-len('.bin')]+'.csv',args.car)
+        print('{} rows -> {}'.format(len(log),path[:-len('.bin')]+'.csv'))
+
+if __name__ == "__main__":
+    main()
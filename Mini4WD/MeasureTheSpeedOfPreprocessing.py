@@ -0,0 +1,62 @@
+import time
+import argparse
+import cv2
+import numpy as np
+from Mini4WDImage import Mini4WDImageProcessor
+from Mini4WDPipeline import Mini4WDSettingSnapshot
+
+def LegacyImagePreprocessing(img,TrimTop,TrimBottom,TrimLeft,TrimRight,DivFrame):
+    '''
+    変更前のMini4WDImageProcessor.ImagePreprocessingと同じ処理
+    '''
+    img = img[TrimTop:TrimBottom, TrimLeft:TrimRight]
+    img = cv2.resize(img, (img.shape[1]//DivFrame, img.shape[0]//DivFrame))
+    img = cv2.GaussianBlur(img,(5,5),0)
+    return img
+
+def Measure(function,frames,repeat):
+    '''
+    functionを各フレームに対してrepeat周実行し，1フレーム当たりの時間[ms]を返す
+    '''
+    function(frames[0])                             # 使いまわしの配列を先に作っておく
+    start = time.perf_counter()
+    for i in range(repeat):
+        for frame in frames:
+            function(frame)
+    return (time.perf_counter()-start)/(repeat*len(frames))*1000
+
+def main():
+    '''
+    720pと1080pのフレームに対して，変更前の前処理と各設定の前処理の時間を比較する．
+
+    python MeasureTheSpeedOfPreprocessing.py [--divframe 2] [--repeat 50]
+    '''
+    parser = argparse.ArgumentParser(description='Compare preprocessing settings against the legacy implementation.')
+    parser.add_argument('--divframe',type=int,default=2)
+    parser.add_argument('--repeat',type=int,default=50)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    for width, height in ((1280,720),(1920,1080)):
+        frames  = [rng.randint(0,256,(height,width,3)).astype(np.uint8) for i in range(4)]
+        # 上下左右を1/8ずつトリミングする
+        trim    = {'TrimTop':height//8,'TrimBottom':height-height//8,'TrimLeft':width//8,'TrimRight':width-width//8,\
+                    'DivFrame':args.divframe}
+        legacy  = Measure(lambda frame:LegacyImagePreprocessing(frame,trim['TrimTop'],trim['TrimBottom'],\
+                    trim['TrimLeft'],trim['TrimRight'],args.divframe),frames,args.repeat)
+        print('{}x{} DivFrame={}'.format(width,height,args.divframe))
+        print('  {:<32}{:8.3f} ms'.format('legacy',legacy))
+        for gray in ('0','1'):
+            for interpolation in ('linear','area','nearest'):
+                for order in ('after','before'):
+                    setting = dict(trim,PreprocessingGray=gray,ResizeInterpolation=interpolation,BlurOrder=order)
+                    M4DIP   = Mini4WDImageProcessor(Mini4WDSettingSnapshot(setting),None)
+                    buffer  = [None]
+                    def Preprocessing(frame):
+                        buffer[0] = M4DIP.ImagePreprocessing(frame,buffer[0])
+                    elapsed = Measure(Preprocessing,frames,args.repeat)
+                    name    = 'gray={} {} blur={}'.format(gray,interpolation,order)
+                    print('  {:<32}{:8.3f} ms (x{:.2f})'.format(name,elapsed,legacy/elapsed))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import time
+import argparse
+import numpy as np
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDHandler import Mini4WDSerialHandler,Mini4WDSerialLoopback,Mini4WDJavaHandler
+
+def Measure(app,count):
+    '''
+    appのSendDutyCommandをcount回呼び出し，1回ごとの時間[ms]を返す
+    '''
+    latencies = list()
+    for i in range(count):
+        start = time.perf_counter()
+        app.SendDutyCommand((i%11)/10)
+        latencies.append((time.perf_counter()-start)*1000)
+    return np.asarray(latencies)
+
+def Report(name,latencies):
+    p50, p95, p99 = np.percentile(latencies,(50,95,99))
+    print('{:<24} n={:<6} p50={:.3f}ms p95={:.3f}ms p99={:.3f}ms max={:.3f}ms'\
+        .format(name,len(latencies),p50,p95,p99,latencies.max()))
+
+def main():
+    '''
+    1コマンド当たりの送信時間を，疑似端末に対する直接通信とpy4jを介した通信で比較する．
+
+    python MeasureTheSpeedOfTransport.py [--count 1000] [--delay 0] [--py4j] [--port COM4]
+    --portを指定すると疑似端末の代わりに実際のポートに直接送信する．
+    --py4jを指定すると設定ファイルのJavaプログラムを起動してpy4jを介した時間も計測する．
+    '''
+    parser = argparse.ArgumentParser(description='Compare per-command latency of the serial and py4j transports.')
+    parser.add_argument('--count',type=int,default=1000)
+    parser.add_argument('--delay',type=float,default=0.0,help='echo delay of the pty loopback [s]')
+    parser.add_argument('--port',default=None,help='real serial port instead of the pty loopback')
+    parser.add_argument('--py4j',action='store_true')
+    parser.add_argument('--setting',default='./.setting')
+    args = parser.parse_args()
+
+    M4DIr = Mini4WDInitializer(args.setting)
+    if args.port is None:
+        loopback    = Mini4WDSerialLoopback(args.delay)
+        serialApp   = Mini4WDSerialHandler(loopback.GetPortName(),M4DIr.GetFileValue('BaundRate'),Acknowledge=True,\
+                        Protocol=Mini4WDSerialHandler.Protocols[0])     # 疑似端末は送り返すだけなので形式によらない
+        Report('serial (pty loopback)',Measure(serialApp,args.count))
+        serialApp.Close()
+        loopback.Close()
+    else:
+        serialApp   = Mini4WDSerialHandler(args.port,M4DIr.GetFileValue('BaundRate'),\
+                        Protocol=M4DIr.GetFileValue('SerialProtocol','none'))
+        Report('serial ({})'.format(args.port),Measure(serialApp,args.count))
+        serialApp.Close()
+
+    if args.py4j:
+        M4DJH = Mini4WDJavaHandler(M4DIr.GetFileValue('M4DSClassPath'),M4DIr.GetFileValue('M4DSClassName'),\
+                    M4DIr.GetFileValue('M4DSPortNum'),M4DIr.GetFileValue('Mini4WDPortName'),'./transport_benchmark')
+        Report('py4j',Measure(M4DJH.GetApp(),args.count))
+        M4DJH.StopJava()
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,25 @@
 from Mini4WDDetector import Mini4WDDetector
 from Mini4WDInitializer import Mini4WDInitializer
 from Mini4WDLogger import Mini4WDLogger
-from Mini4WDHandler import Mini4WDHandler,Mini4WDHandlerForTest
+from Mini4WDHandler import Mini4WDHandler,Mini4WDHandlerForTest,ShutdownBridge
 from Mini4WDGUI import Mini4WDGUI
 import Mini4WDException
 import wx
+import sys
 
 def main():
     # 初期設定
     M4DIr   = Mini4WDInitializer('./.setting')      # 初期設定を呼び出す者
+    if len(sys.argv) > 1 and sys.argv[1] == 'shutdown-bridge':
+        # 使いまわしているJavaプログラムを終了させる
+        ShutdownBridge(M4DIr.GetFileValue('M4DSPortNum'))
+        return
     M4DL    = Mini4WDLogger(M4DIr)                  # ログをとるクラスのインスタンス
     M4DH    = Mini4WDHandler(M4DL)                  # Mini4WDを制御する者
     # M4DH    = Mini4WDHandlerForTest(M4DL)         # Mini4WDを制御する者
-    M4DD    = Mini4WDDetector(M4DH)                 # Mini4WDを発見する者
+    # 2台目以降は設定の名前に_2,_3,...を付けたポートとDutyMapを使う
+    M4DHs   = [Mini4WDHandler(M4DL,'_{}'.format(i)) for i in range(2,int(M4DIr.GetFileValue('CarCount','1'))+1)]
+    M4DD    = Mini4WDDetector(M4DH,OtherMini4WDHandlers=M4DHs)   # Mini4WDを発見する者
     
     # GUIの起動
     app     = wx.App()
@@ -0,0 +1,244 @@
+import cv2
+import time
+from Mini4WDException import NotAllowedValue
+
+class Mini4WDBackgroundModel():
+    '''
+    背景画像から前景（ミニ四駆）の二値画像を作成するクラス．
+    背景モデルは背景画像が決まったときに一度だけ作成し，
+    それ以降はフレームごとに使いまわす．
+
+    Attributes
+    ----------
+    Method:string
+        背景差分の方法．以下のいずれか
+        absdiff:背景画像との差の絶対値を閾値処理する（静的な背景）
+        mog2:学習率を0に固定したMOG2
+        knn:学習率を0に固定したKNN
+        legacy:フレームごとにMOGを作り直す従来の方法
+    Threshold:int
+        absdiffで前景とみなす輝度差の閾値
+    BackGroundImage:array_like
+        すでに適切に画像処理した後のnumpy配列の背景画像
+    Subtractor:cv2.BackgroundSubtractor
+        mog2,knnのときに使いまわす背景差分オブジェクト
+    FrameCount:int
+        Applyを呼び出した回数
+    TotalCost:float
+        Applyにかかった時間の合計[s]
+    MaxCost:float
+        Applyにかかった時間の最大値[s]
+    '''
+
+    Methods = ('absdiff','mog2','knn','legacy')
+    KNNTrainingFrames = 10                                              # KNNは学習率1では標本が埋まらないので，背景画像を繰り返し学習させる
+
+    def __init__(self,BackGroundImage,Method='legacy',Threshold=25):
+        '''
+        Parameters
+        ----------
+        BackGroundImage:array_like
+            すでに適切に画像処理した後のnumpy配列の背景画像
+        Method:string default='legacy'
+            背景差分の方法
+        Threshold:int default=25
+            absdiffで前景とみなす輝度差の閾値
+
+        Throws
+        ------
+        NotAllowedValue:
+            存在しない背景差分の方法が指定された場合
+        '''
+        if Method not in self.Methods:
+            raise NotAllowedValue
+        self.Method             = Method
+        self.Threshold          = int(Threshold)
+        self.BackGroundImage    = None
+        self.Subtractor         = None
+        self.FrameCount         = 0
+        self.TotalCost          = 0.0
+        self.MaxCost            = 0.0
+        self.SetBackGroundImage(BackGroundImage)
+
+    def SetBackGroundImage(self,BackGroundImage):
+        '''
+        背景画像を設定し，背景モデルを作り直す．
+        計測した時間もリセットする．
+
+        Parameters
+        ----------
+        BackGroundImage:array_like
+            すでに適切に画像処理した後のnumpy配列の背景画像
+        '''
+        self.BackGroundImage = BackGroundImage
+        if self.Method == 'mog2':
+            self.Subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+            self.Subtractor.apply(BackGroundImage,learningRate=1)      # 背景画像だけで学習させる
+        elif self.Method == 'knn':
+            self.Subtractor = cv2.createBackgroundSubtractorKNN(detectShadows=False)
+            for i in range(self.KNNTrainingFrames):
+                self.Subtractor.apply(BackGroundImage)
+        else:
+            self.Subtractor = None
+        self.ResetCost()
+
+    def Apply(self,VideoFrame,Window=None):
+        '''
+        ビデオフレームから前景の二値画像を作成する．
+        Windowを指定した場合はその範囲だけの二値画像を返す．
+        ただしmog2,knnは背景モデルがフレーム全体のものなので，
+        フレーム全体に適用してから切り出す．
+
+        Parameters
+        ----------
+        VideoFrame:array_like
+            すでに適切に画像処理した後のnumpy配列のUSBカメラ画像
+        Window:tuple default=None
+            処理する範囲の(左,上,右,下)の座標．Noneならフレーム全体
+
+        Returns
+        -------
+        fgmask:array_like
+            前景が255，背景が0の二値画像
+        '''
+        start = time.perf_counter()
+        BackGroundImage = self.BackGroundImage
+        if Window is not None and self.Subtractor is None:
+            x0, y0, x1, y1  = Window
+            BackGroundImage = BackGroundImage[y0:y1, x0:x1]
+            VideoFrame      = VideoFrame[y0:y1, x0:x1]
+
+        if self.Method == 'absdiff':
+            fgmask = self.Difference(BackGroundImage,VideoFrame,self.Threshold)
+        elif self.Method == 'legacy':
+            fgbg    = cv2.bgsegm.createBackgroundSubtractorMOG()       # 背景オブジェクトの作成
+            fgbg.apply(BackGroundImage)                                 # 領域の適用
+            fgmask  = fgbg.apply(VideoFrame)
+        else:
+            fgmask = self.Subtractor.apply(VideoFrame,learningRate=0)  # 背景モデルは更新しない
+            if Window is not None:
+                x0, y0, x1, y1  = Window
+                fgmask          = fgmask[y0:y1, x0:x1]
+        cost = time.perf_counter()-start
+        self.FrameCount += 1
+        self.TotalCost  += cost
+        if cost > self.MaxCost:
+            self.MaxCost = cost
+        return fgmask
+
+    @classmethod
+    def Compare(cls,Image1,Image2,Method='legacy',Threshold=25):
+        '''
+        二枚の画像の前景の二値画像を，指定した背景差分の方法で作る．
+        背景画像の自動調節で，連続する二枚のフレームが変わらなくなったかを判定するのに使う．
+
+        Parameters
+        ----------
+        Image1:array_like
+            背景とみなす画像
+        Image2:array_like
+            比較する画像
+        Method:string default='legacy'
+            背景差分の方法
+        Threshold:int default=25
+            absdiffで前景とみなす輝度差の閾値
+
+        Returns
+        -------
+        fgmask:array_like
+            前景が255，背景が0の二値画像
+        '''
+        if Method == 'absdiff':
+            return cls.Difference(Image1,Image2,Threshold)
+        if Method == 'legacy':
+            fgbg = cv2.bgsegm.createBackgroundSubtractorMOG()          # 従来と同じくMOGで比較する
+            fgbg.apply(Image1)
+            return fgbg.apply(Image2)
+        return cls(Image1,Method,Threshold).Apply(Image2)
+
+    @staticmethod
+    def Difference(Image1,Image2,Threshold=25):
+        '''
+        二枚の画像の差の絶対値を閾値処理した二値画像を返す．
+
+        Parameters
+        ----------
+        Image1:array_like
+            比較する画像
+        Image2:array_like
+            比較する画像
+        Threshold:int default=25
+            前景とみなす輝度差の閾値
+
+        Returns
+        -------
+        fgmask:array_like
+            前景が255，背景が0の二値画像
+        '''
+        diff = cv2.absdiff(Image1,Image2)
+        if diff.ndim == 3:
+            diff = cv2.cvtColor(diff,cv2.COLOR_BGR2GRAY)
+        ret, fgmask = cv2.threshold(diff,Threshold,255,cv2.THRESH_BINARY)
+        return fgmask
+
+    def ResetCost(self):
+        '''
+        計測した時間をリセットする．
+        '''
+        self.FrameCount = 0
+        self.TotalCost  = 0.0
+        self.MaxCost    = 0.0
+
+    def GetCost(self):
+        '''
+        1フレーム当たりの背景差分にかかった時間を返す
+
+        Returns
+        -------
+        mean:float
+            平均時間[ms]
+        max:float
+            最大時間[ms]
+        FrameCount:int
+            計測したフレーム数
+        '''
+        if self.FrameCount == 0:
+            return 0.0,0.0,0
+        return self.TotalCost/self.FrameCount*1000,self.MaxCost*1000,self.FrameCount
+
+    def GetMethod(self):
+        return self.Method
+
+    def GetBackGroundImage(self):
+        return self.BackGroundImage
+
+def MeasureBackgroundModels(BackGroundImage,VideoFrames,Methods=Mini4WDBackgroundModel.Methods,Threshold=25):
+    '''
+    同じフレーム群に対して各背景差分の方法を実行し，
+    1フレーム当たりのコストと前景のピクセル数を比較する．
+
+    Parameters
+    ----------
+    BackGroundImage:array_like
+        すでに適切に画像処理した後のnumpy配列の背景画像
+    VideoFrames:list context=array_like
+        すでに適切に画像処理した後のフレームのリスト
+    Methods:tuple context=string
+        比較する背景差分の方法
+    Threshold:int default=25
+        absdiffで前景とみなす輝度差の閾値
+
+    Returns
+    -------
+    result:dict
+        方法の名前をキーとして，(平均時間[ms],最大時間[ms],前景の平均ピクセル数)を持つ
+    '''
+    result = dict()
+    for Method in Methods:
+        M4DBM       = Mini4WDBackgroundModel(BackGroundImage,Method,Threshold)
+        foreground  = 0
+        for VideoFrame in VideoFrames:
+            foreground += cv2.countNonZero(M4DBM.Apply(VideoFrame))
+        mean, maximum, count = M4DBM.GetCost()
+        result[Method] = (mean,maximum,foreground/max(count,1))
+    return result
@@ -0,0 +1,219 @@
+import os
+import re
+import csv
+import gzip
+import glob
+import time
+import threading
+import numpy as np
+
+# 検知ログの1行．名前はcsv形式のヘッダと同じにする．リトルエンディアンで固定する
+DetectionDtype = np.dtype([('time','<f8'),('mapX','<i2'),('mapY','<i2'),
+                    ('xCoordinate','<f4'),('yCoordinate','<f4'),('wLength','<i4'),('hLength','<i4'),
+                    ('mapArea','<f4'),('car','<i2')])
+
+class Mini4WDBinaryLog():
+    '''
+    検知ログをcsvの行ではなく，DetectionDtypeの構造化配列として溜めるクラス．
+    Dtypeを指定すれば，最初の列がtime(float64)である他のログ(センサーログなど)にも使える．
+    あらかじめ確保したChunkSize行の配列に書き込み，いっぱいになるか
+    前回渡してからFlushInterval秒経ったら，その配列をHandOff(chunk)に渡して新しい配列を確保する．
+    書き込みが途絶えた場合も渡すように，書き込みのスレッドなどから定期的にFlushIfDueを呼び出す．
+    渡した配列はそのままファイルに書き出すので，ファイルはヘッダのない
+    DetectionDtypeの並びになり，ReadDetectionLogでそのままメモリマップできる．
+
+    Attributes
+    ----------
+    HandOff:function
+        HandOff(chunk)でいっぱいになった配列を書き込みに渡す関数
+    ChunkSize:int
+        一度に確保する行の数
+    FlushInterval:float
+        前回渡してからこの時間[s]経ったら，いっぱいでなくても渡す
+    Dtype:numpy.dtype
+        1行の型．最初の列はtime(float64)
+    Chunk:array_like
+        書き込み中の配列
+    Index:int
+        Chunkの次に書き込む行
+    Lock:threading.Lock
+        Chunkを操作するときのロック
+    '''
+
+    def __init__(self,HandOff,ChunkSize=4096,FlushInterval=1.0,Dtype=DetectionDtype):
+        '''
+        Parameters
+        ----------
+        HandOff:function
+            HandOff(chunk)でいっぱいになった配列を書き込みに渡す関数
+        ChunkSize:int default=4096
+            一度に確保する行の数
+        FlushInterval:float default=1.0
+            前回渡してからこの時間[s]経ったら，いっぱいでなくても渡す
+        Dtype:numpy.dtype default=DetectionDtype
+            1行の型．最初の列はtime(float64)
+        '''
+        self.HandOff        = HandOff
+        self.ChunkSize      = max(int(ChunkSize),1)
+        self.FlushInterval  = float(FlushInterval)
+        self.Dtype          = Dtype
+        self.Chunk          = np.zeros(self.ChunkSize,dtype=self.Dtype)
+        self.Index          = 0
+        self.LastHandOff    = time.perf_counter()
+        self.Lock           = threading.Lock()
+
+    def Append(self,information):
+        '''
+        検知の情報を1行書き込む．
+
+        Parameters
+        ----------
+        information:tuple
+            (mapX,mapY,xCoordinate,yCoordinate,wLength,hLength,mapArea)か，それにミニ四駆の番号を加えたもの．
+            足りない列は0とする
+        '''
+        record = (time.time(),)+tuple(information)
+        if len(record) < len(self.Dtype.names):                     # 1台だけの場合はミニ四駆の番号を0とする
+            record += (0,)*(len(self.Dtype.names)-len(record))
+        with self.Lock:
+            self.Chunk[self.Index]  = record
+            self.Index              += 1
+            if self.Index == self.ChunkSize or time.perf_counter()-self.LastHandOff >= self.FlushInterval:
+                self.HandOffChunk()
+
+    def Extend(self,records,t=None):
+        '''
+        構造化配列の行をまとめて書き込む．列ごとにコピーするので，1行ずつ書き込むより速い．
+
+        Parameters
+        ----------
+        records:array_like
+            構造化配列．timeを除くDtypeの列を持つ
+        t:float default=None
+            すべての行のtimeに入れる時刻(time.time)．Noneなら呼び出した時刻
+        '''
+        t       = time.time() if t is None else t
+        names   = [name for name in records.dtype.names if name in self.Dtype.names]
+        with self.Lock:
+            start = 0
+            while start < len(records):
+                count   = min(len(records)-start,self.ChunkSize-self.Index)
+                chunk   = self.Chunk[self.Index:self.Index+count]
+                chunk['time'] = t
+                for name in names:
+                    chunk[name] = records[name][start:start+count]
+                self.Index  += count
+                start       += count
+                if self.Index == self.ChunkSize:
+                    self.HandOffChunk()
+            if time.perf_counter()-self.LastHandOff >= self.FlushInterval:
+                self.HandOffChunk()
+
+    def Flush(self):
+        '''
+        書き込み中の行をすべて渡す．ファイルを切り替える前と終了時に呼び出す．
+        '''
+        with self.Lock:
+            self.HandOffChunk()
+
+    def FlushIfDue(self):
+        '''
+        前回渡してからFlushInterval秒経っていれば，書き込み中の行を渡す．
+        AppendとExtendは書き込んだときにしか確かめないので，検知が止まっても
+        最後の行が書き込まれないままにならないように定期的に呼び出す．
+        '''
+        with self.Lock:
+            if self.Index > 0 and time.perf_counter()-self.LastHandOff >= self.FlushInterval:
+                self.HandOffChunk()
+
+    def HandOffChunk(self):
+        '''
+        書き込み中の配列を渡して新しい配列を確保する．Lockを取得してから呼び出す．
+        '''
+        if self.Index > 0:
+            self.HandOff(self.Chunk[:self.Index])
+            self.Chunk  = np.zeros(self.ChunkSize,dtype=self.Dtype)
+            self.Index  = 0
+        self.LastHandOff = time.perf_counter()
+
+def ReadDetectionLog(filepath,mmap=True):
+    '''
+    バイナリ形式の検知ログ(_detection_N.bin)を構文解析せずに読み込む．
+    最後の行が途中までしか書き込まれていない場合(クラッシュした場合)はその行を除く．
+
+    Parameters
+    ----------
+    filepath:string
+        検知ログのパス
+    mmap:boolean default=True
+        メモリマップするかどうか．偽ならメモリに読み込む
+
+    Returns
+    -------
+    log:array_like
+        DetectionDtypeの構造化配列
+    '''
+    count = os.path.getsize(filepath)//DetectionDtype.itemsize
+    if count == 0:
+        return np.zeros(0,dtype=DetectionDtype)
+    if mmap:
+        return np.memmap(filepath,dtype=DetectionDtype,mode='r',shape=(count,))
+    return np.fromfile(filepath,dtype=DetectionDtype,count=count)
+
+def ReadDetectionSession(LogFileName):
+    '''
+    ひとつのログフォルダのバイナリ形式の検知ログをすべて読み込み，検知の実行とセグメントの順につなげる．
+    セグメントに分けたもの(_detection_N.SSS.bin)や圧縮したもの(.bin.gz)も読み込む．
+    圧縮し終えてから元のファイルを消すまでの間は両方が残るので，その場合は.gzだけを読み込む．
+    .gzは圧縮し終えてから名前を付けるので常に完全である．
+    時刻の範囲を指定して読み出す場合はMini4WDLogRotation.OpenSegmentsを使う．
+
+    Parameters
+    ----------
+    LogFileName:string
+        ログファイルの名前(Mini4WDLogger.GetLogFileName)
+
+    Returns
+    -------
+    log:array_like
+        DetectionDtypeの構造化配列
+    '''
+    pattern = re.compile(re.escape(os.path.basename(LogFileName))+r'_detection_(\d+)(?:\.(\d+))?\.bin(\.gz)?$')
+    paths   = dict()
+    for path in glob.glob(LogFileName+'_detection_*.bin*'):
+        match = pattern.match(os.path.basename(path))
+        if match is None:
+            continue
+        key = (int(match.group(1)),int(match.group(2) or 0))
+        if key not in paths or path.endswith('.gz'):                # 同じセグメントは.gzを優先する
+            paths[key] = path
+    logs    = list()
+    for key, path in sorted(paths.items()):
+        if path.endswith('.gz'):
+            with gzip.open(path,'rb') as f:
+                data = f.read()
+            logs.append(np.frombuffer(data,dtype=DetectionDtype,count=len(data)//DetectionDtype.itemsize))
+        else:
+            logs.append(ReadDetectionLog(path,False))
+    if len(logs) == 0:
+        return np.zeros(0,dtype=DetectionDtype)
+    return np.concatenate(logs)
+
+def ExportDetectionLogAsCSV(log,filepath,car=False):
+    '''
+    バイナリ形式の検知ログをcsv形式の検知ログと同じ列で書き出す．
+
+    Parameters
+    ----------
+    log:array_like
+        ReadDetectionLogかReadDetectionSessionで読み込んだ構造化配列
+    filepath:string
+        書き出すcsvファイルのパス
+    car:boolean default=False
+        ミニ四駆の番号の列を加えるかどうか(複数台の場合)
+    '''
+    names = DetectionDtype.names if car else DetectionDtype.names[:-1]
+    with open(filepath,'wt',newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(log[name].tolist() for name in names)))
@@ -0,0 +1,264 @@
+import cv2
+import numpy as np
+from Mini4WDException import NotAllowedValue
+
+class Mini4WDBlobSelector():
+    '''
+    背景差分で得た二値画像から前景の塊（ブロブ）を取り出し，
+    その中からミニ四駆とみなす一つを選ぶクラス．
+    取り出し(Extract)と選択(Select)を分けているのは，
+    それぞれの処理時間を計測できるようにするためである．
+
+    Attributes
+    ----------
+    Backend:string
+        ブロブの取り出し方．以下のいずれか
+        contour:cv2.findContoursで輪郭ごとにPythonで処理する従来の方法
+        ccl:cv2.connectedComponentsWithStatsで全ブロブの統計量を一度に取り出し，
+            numpyで大きさの判定と最近傍の選択を行う方法．座標はcontourと同じく外接矩形の中心とする．
+            contourとの違いは次の3つ
+            ・Mini4WDMinSize,Mini4WDMaxSizeで絞り込む(contourは絞り込みがコメントアウトされている)
+            ・面積は輪郭の面積ではなくピクセル数
+            ・GateDistance以内にブロブがない場合，最後の輪郭ではなく未発見(-1)を返す
+    Mini4WDMinSize:int
+        ミニ四駆とみなす最小のピクセル数
+    Mini4WDMaxSize:int
+        ミニ四駆とみなす最大のピクセル数
+    GateDistance:float
+        前回の座標からこの距離[pixel]より離れたブロブは選ばない．
+        1台の場合は0以下なら距離による制限をしない(cclのみ)．
+        contourは前回の座標から距離の2乗が20未満の輪郭があるときだけ最も近いものを選ぶので，
+        同じ結果にするには4.5とする
+    '''
+
+    Backends = ('contour','ccl')
+    DefaultGateDistance = 4.5                                               # 複数台の場合にGateDistanceが0以下なら使う距離[pixel]
+
+    def __init__(self,Backend='contour',Mini4WDMinSize=14,Mini4WDMaxSize=400,GateDistance=4.5):
+        '''
+        Parameters
+        ----------
+        Backend:string default='contour'
+            ブロブの取り出し方
+        Mini4WDMinSize:int default=14
+            ミニ四駆とみなす最小のピクセル数
+        Mini4WDMaxSize:int default=400
+            ミニ四駆とみなす最大のピクセル数
+        GateDistance:float default=4.5
+            前回の座標から選ぶブロブまでの最大の距離[pixel]
+
+        Throws
+        ------
+        NotAllowedValue:
+            存在しない取り出し方が指定された場合
+        '''
+        if Backend not in self.Backends:
+            raise NotAllowedValue
+        self.Backend        = Backend
+        self.Mini4WDMinSize = int(Mini4WDMinSize)
+        self.Mini4WDMaxSize = int(Mini4WDMaxSize)
+        self.GateDistance   = float(GateDistance)
+
+    def Detect(self,binaryImage,gx_pre,gy_pre,offset=(0,0)):
+        '''
+        二値画像からミニ四駆を一つ選ぶ．
+
+        Parameters
+        ----------
+        binaryImage:array_like
+            背景差分で得た二値画像
+        gx_pre:int
+            前回のミニ四駆の場所
+        gy_pre:int
+            前回のミニ四駆の場所
+        offset:tuple default=(0,0)
+            二値画像の左上のフレーム全体における座標
+
+        Returns
+        -------
+        x, y, w, h, gx, gy, maparea:
+            Mini4WDDetector.DetectMini4WDと同じ．未発見時はすべて-1
+        '''
+        return self.Select(self.Extract(binaryImage,offset),gx_pre,gy_pre)
+
+    def Extract(self,binaryImage,offset=(0,0)):
+        '''
+        二値画像からブロブを取り出す．
+
+        Parameters
+        ----------
+        binaryImage:array_like
+            背景差分で得た二値画像
+        offset:tuple default=(0,0)
+            二値画像の左上のフレーム全体における座標
+
+        Returns
+        -------
+        candidates:object
+            Selectに渡すブロブの情報．
+            contourなら輪郭のリスト，cclなら(stats,centroids)の組．
+            cclのcentroidsは重心ではなく，contourと同じく外接矩形の中心
+        '''
+        if self.Backend == 'contour':
+            contours, hierarchy = cv2.findContours(binaryImage, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+            return contours
+
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(binaryImage,connectivity=8)
+        stats       = stats[1:]                                             # 0番目は背景
+        if offset[0] != 0 or offset[1] != 0:
+            stats       = stats.copy()
+            stats[:,cv2.CC_STAT_LEFT]   += offset[0]
+            stats[:,cv2.CC_STAT_TOP]    += offset[1]
+        centroids   = stats[:,0:2]+stats[:,2:4]/2                           # contourと同じく外接矩形の中心
+        return stats,centroids
+
+    def Select(self,candidates,gx_pre,gy_pre):
+        '''
+        取り出したブロブから前回の座標に最も近いものを選ぶ．
+
+        Parameters
+        ----------
+        candidates:object
+            Extractが返したブロブの情報
+        gx_pre:int
+            前回のミニ四駆の場所
+        gy_pre:int
+            前回のミニ四駆の場所
+
+        Returns
+        -------
+        x, y, w, h, gx, gy, maparea:
+            Mini4WDDetector.DetectMini4WDと同じ．未発見時はすべて-1
+        '''
+        if self.Backend == 'contour':
+            return self.SelectContour(candidates,gx_pre,gy_pre)
+
+        stats, centroids = self.GetArrays(candidates)                       # 大きさで絞り込む
+        if len(stats) == 0:
+            return -1,-1,-1,-1,-1,-1,-1
+        gd  = (centroids[:,0]-gx_pre)**2+(centroids[:,1]-gy_pre)**2
+        i   = int(np.argmin(gd))
+        if self.GateDistance > 0 and gd[i] > self.GateDistance*self.GateDistance:
+            return -1,-1,-1,-1,-1,-1,-1
+        x, y, w, h, area = stats[i]
+        return int(x),int(y),int(w),int(h),float(centroids[i,0]),float(centroids[i,1]),int(area)
+
+    def SelectContour(self,contours,gx_pre,gy_pre):
+        '''
+        輪郭のリストから従来の方法でミニ四駆を選ぶ．
+        前回の座標の近くに輪郭がなかった場合は最後の輪郭を返す．
+        '''
+        IsMini4WD                                   = False
+        rectlist                                    = []
+        gdlist                                      = []
+        x = y = w = h = gx = gy = area = maparea    = -1
+
+        # 各輪郭に対する処理
+        for i in range(0, len(contours)):
+
+            # 輪郭の領域を計算
+            area = cv2.contourArea(contours[i])
+
+            # ノイズ（小さすぎる領域）と全体の輪郭（大きすぎる領域）を除外
+            # if area < self.Mini4WDMinSize or self.Mini4WDMaxSize < area:
+            #     continue
+
+            # 外接矩形
+            if len(contours[i]) > 0:
+                x, y, w, h  = cv2.boundingRect(contours[i])
+                gx          = x+w/2
+                gy          = y+h/2
+                rect        = (x, y, w, h, gx, gy, area)
+                gd          = (gx-gx_pre)*(gx-gx_pre)+(gy-gy_pre)*(gy-gy_pre)
+                maparea     = area
+                rectlist.append(rect)
+                gdlist.append(gd)
+                if gd < 20:
+                    IsMini4WD = True
+                # print(x, y, w, h, gx, gy, maparea)
+
+        if IsMini4WD:
+            x, y, w, h, gx, gy, maparea = rectlist[gdlist.index(min(gdlist))]
+            # print(x, y, w, h, gx, gy, maparea)
+
+        return x, y, w, h, gx, gy, maparea
+
+    def GetArrays(self,candidates):
+        '''
+        Extractが返したブロブの情報を(stats,centroids)の配列の組にそろえ，大きさで絞り込む．
+        contourの場合は外接矩形と面積から作る．
+
+        Parameters
+        ----------
+        candidates:object
+            Extractが返したブロブの情報
+
+        Returns
+        -------
+        stats:array_like
+            ブロブごとの(x,y,w,h,area)
+        centroids:array_like
+            ブロブごとの(gx,gy)
+        '''
+        if self.Backend != 'contour':
+            stats, centroids = candidates
+            area = stats[:,cv2.CC_STAT_AREA]
+            keep = (area >= self.Mini4WDMinSize) & (area <= self.Mini4WDMaxSize)
+            return stats[keep],centroids[keep]
+        rows = list()
+        for contour in candidates:
+            area = cv2.contourArea(contour)
+            if area < self.Mini4WDMinSize or self.Mini4WDMaxSize < area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            rows.append((x,y,w,h,area))
+        stats       = np.asarray(rows,dtype=np.float64).reshape(-1,5)
+        centroids   = stats[:,0:2]+stats[:,2:4]/2
+        return stats,centroids
+
+    def SelectMany(self,candidates,predictions):
+        '''
+        取り出したブロブを複数台のミニ四駆に割り当てる．
+        全ての組の距離の表を一度に作り，全体で最も近い組から順に割り当てる(貪欲法)．
+        GateDistanceより離れた組は割り当てない．GateDistanceが0以下でも，
+        遠くのブロブを別のミニ四駆に割り当てないようにDefaultGateDistanceを使う．
+
+        Parameters
+        ----------
+        candidates:object
+            Extractが返したブロブの情報
+        predictions:array_like
+            ミニ四駆ごとの予測した座標(gx,gy)の配列．大きさは(台数,2)
+
+        Returns
+        -------
+        results:list context=tuple
+            ミニ四駆ごとの(x,y,w,h,gx,gy,area)．見つからなかったミニ四駆はすべて-1
+        '''
+        stats, centroids    = self.GetArrays(candidates)
+        predictions         = np.asarray(predictions,dtype=np.float64).reshape(-1,2)
+        results             = [(-1,-1,-1,-1,-1,-1,-1)]*len(predictions)
+        if len(stats) == 0 or len(predictions) == 0:
+            return results
+        gd                  = ((predictions[:,None,:]-centroids[None,:,:])**2).sum(axis=2)
+        order               = np.argsort(gd,axis=None)
+        gate                = self.GateDistance if self.GateDistance > 0 else self.DefaultGateDistance
+        limit               = gate*gate
+        tracks              = np.zeros(len(predictions),dtype=bool)
+        blobs               = np.zeros(len(stats),dtype=bool)
+        for k in order:
+            t, b = divmod(int(k),len(stats))
+            if gd[t,b] > limit:
+                break
+            if tracks[t] or blobs[b]:
+                continue
+            tracks[t]   = True
+            blobs[b]    = True
+            x, y, w, h, area = stats[b]
+            results[t]  = (int(x),int(y),int(w),int(h),float(centroids[b,0]),float(centroids[b,1]),int(area))
+            if tracks.all() or blobs.all():
+                break
+        return results
+
+    def GetBackend(self):
+        return self.Backend
@@ -0,0 +1,172 @@
+import time
+import threading
+import collections
+
+class Mini4WDCaptureThread():
+    '''
+    カメラからの読み込みを別スレッドで行い，最新のフレームだけを
+    検知側に渡すクラス．cv2.VideoCaptureと同じようにisOpened,readで使える．
+    読み込んだフレームは小さなリングバッファに入れ，readでは最新のものを取り出し，
+    それより古いものは捨てる．
+
+    Attributes
+    ----------
+    Camera:cv2.VideoCapture
+        読み込むUSBカメラもしくは映像
+    Buffer:collections.deque
+        (フレーム,取得時刻)を入れるリングバッファ
+    Condition:threading.Condition
+        バッファを操作するときのロック
+    RunFlag:boolean
+        読み込みのスレッドを動かすかどうかのフラグ
+    IsEnded:boolean
+        カメラから読み込めなくなったかどうか
+    FrameTime:float
+        最後にreadで渡したフレームの取得時刻[s](time.perf_counterと同じ基準)
+    CaptureCount:int
+        カメラから読み込んだフレーム数
+    ReadCount:int
+        readで渡したフレーム数
+    StoppedCount:int
+        Stopでバッファから除いたフレーム数．処理が間に合わずに捨てたものではないので，捨てたフレーム数には数えない
+    TotalAge:float
+        readで渡したときのフレームの経過時間の合計[s]
+    MaxAge:float
+        readで渡したときのフレームの経過時間の最大値[s]
+    '''
+
+    def __init__(self,Camera,BufferSize=2):
+        '''
+        Parameters
+        ----------
+        Camera:cv2.VideoCapture
+            読み込むUSBカメラもしくは映像
+        BufferSize:int default=2
+            リングバッファの大きさ
+        '''
+        self.Camera         = Camera
+        self.Buffer         = collections.deque(maxlen=max(int(BufferSize),1))
+        self.Condition      = threading.Condition()
+        self.Thread         = None
+        self.RunFlag        = False
+        self.IsEnded        = False
+        self.FrameTime      = 0.0
+        self.CaptureCount   = 0
+        self.ReadCount      = 0
+        self.StoppedCount   = 0
+        self.TotalAge       = 0.0
+        self.MaxAge         = 0.0
+
+    def Start(self):
+        '''
+        読み込みのスレッドを始動する．
+        '''
+        self.RunFlag    = True
+        self.IsEnded    = False
+        self.Thread     = threading.Thread(target=self.CaptureLoop,daemon=True)
+        self.Thread.start()
+
+    def Stop(self):
+        '''
+        読み込みのスレッドを停止し，終了するまで待つ．
+        '''
+        self.RunFlag = False
+        if self.Thread is not None:
+            self.Thread.join()
+            self.Thread = None
+        with self.Condition:
+            self.StoppedCount += len(self.Buffer)
+            self.Buffer.clear()
+            self.Condition.notify_all()
+
+    def CaptureLoop(self):
+        '''
+        カメラからフレームを読み込み続け，リングバッファに入れる．
+        読み込みに失敗した場合（映像の終わりなど）は終了する．
+        '''
+        while self.RunFlag and self.Camera.isOpened():
+            ret, frame = self.Camera.read()
+            t = time.perf_counter()
+            if not ret:
+                break
+            with self.Condition:
+                self.Buffer.append((frame,t))       # いっぱいなら一番古いものが捨てられる
+                self.CaptureCount += 1
+                self.Condition.notify()
+        with self.Condition:
+            self.IsEnded = True
+            self.Condition.notify_all()
+
+    def isOpened(self):
+        '''
+        まだフレームを渡せるかどうかを返す．
+
+        Returns
+        -------
+        ret:boolean
+            カメラが開いていて，読み込みが終了していないか，バッファにフレームが残っている場合True
+        '''
+        with self.Condition:
+            return self.Camera.isOpened() and (not self.IsEnded or len(self.Buffer) > 0)
+
+    def read(self,timeout=0.5):
+        '''
+        最新のフレームを取り出す．それより古いフレームは捨てる．
+
+        Parameters
+        ----------
+        timeout:float default=0.5
+            フレームが来るまで待つ最大の時間[s]
+
+        Returns
+        -------
+        ret:boolean
+            フレームを取り出せたかどうか
+        frame:array_like
+            取り出したフレーム．取り出せなかった場合はNone
+        '''
+        with self.Condition:
+            if len(self.Buffer) == 0 and not self.IsEnded:
+                self.Condition.wait(timeout)
+            if len(self.Buffer) == 0:
+                return False,None
+            frame, t = self.Buffer.pop()
+            self.Buffer.clear()
+            self.ReadCount += 1
+        age             = time.perf_counter()-t
+        self.FrameTime  = t
+        self.TotalAge   += age
+        if age > self.MaxAge:
+            self.MaxAge = age
+        return True,frame
+
+    def GetFrameTime(self):
+        '''
+        最後にreadで渡したフレームの取得時刻を返す．
+
+        Returns
+        -------
+        FrameTime:float
+            取得時刻[s](time.perf_counterと同じ基準)
+        '''
+        return self.FrameTime
+
+    def GetCounters(self):
+        '''
+        捨てたフレーム数とフレームの経過時間を返す．
+
+        Returns
+        -------
+        CaptureCount:int
+            カメラから読み込んだフレーム数
+        DropCount:int
+            処理が間に合わずに捨てられたフレーム数．Stopでバッファから除いたものは含まない
+        MeanAge:float
+            readで渡したときのフレームの経過時間の平均[ms]
+        MaxAge:float
+            readで渡したときのフレームの経過時間の最大値[ms]
+        '''
+        with self.Condition:
+            DropCount = self.CaptureCount-self.ReadCount-len(self.Buffer)-self.StoppedCount
+        MeanAge = self.TotalAge/self.ReadCount*1000 if self.ReadCount > 0 else 0.0
+        return self.CaptureCount,DropCount,MeanAge,self.MaxAge*1000
@@ -0,0 +1,144 @@
+import time
+from Mini4WDTracker import Mini4WDTracker
+from Mini4WDLocationTable import Mini4WDLocationTable,ParseBoundaries
+from Mini4WDHysteresis import Mini4WDCellHysteresis
+
+class Mini4WDCar():
+    '''
+    複数台のミニ四駆を同時に検知する場合の，1台分の状態をまとめたクラス．
+    ミニ四駆ごとにMini4WDHandler(DutyMapと送信先)，トラッカー，
+    エリアを求める表を持ち，検知した座標からエリアを求めてduty比を送信する．
+    背景差分とブロブの取り出しはMini4WDDetectorが全台分まとめて一度だけ行う．
+
+    Attributes
+    ----------
+    Index:int
+        ミニ四駆の番号(0から)．検知ログの最後の列に記録する
+    M4DH:Mini4WDHandler
+        このミニ四駆のDutyMapと送信先を持つインスタンス
+    M4DT:Mini4WDTracker
+        このミニ四駆の位置と速度を推定するインスタンス．ブロブの割り当てに使う
+    M4DLT:Mini4WDLocationTable
+        このミニ四駆のDutyMapからエリアとduty比を求める表
+    M4DCH:Mini4WDCellHysteresis, default=None
+        境界付近での重心のぶれによるエリアの変化を抑えるインスタンス
+    gx_pre:float
+        最後に検知したX座標
+    gy_pre:float
+        最後に検知したY座標
+    Information:tuple
+        最後に検知したときの(mapX,mapY,xCoordinate,yCoordinate,wLength,hLength,mapArea)
+    '''
+
+    def __init__(self,Index,M4DH):
+        '''
+        Parameters
+        ----------
+        Index:int
+            ミニ四駆の番号(0から)
+        M4DH:Mini4WDHandler
+            このミニ四駆のDutyMapと送信先を持つインスタンス
+        '''
+        M4DIr           = M4DH.GetM4DIr()
+        self.Index      = Index
+        self.M4DH       = M4DH
+        self.M4DL       = M4DH.GetM4DL()
+        self.M4DT       = Mini4WDTracker(float(M4DIr.GetFileValue('TrackerAlpha','0.75')),\
+                            float(M4DIr.GetFileValue('TrackerBeta','0.45')),\
+                            float(M4DIr.GetFileValue('TrackerMaxCoast','0.5')))
+        self.M4DLT      = Mini4WDLocationTable(M4DH.GetM4DM(),\
+                            ParseBoundaries(M4DH.GetCarValue('MapBoundariesX','')),\
+                            ParseBoundaries(M4DH.GetCarValue('MapBoundariesY','')),\
+                            bool(int(M4DIr.GetFileValue('DutyInterpolation','0'))))
+        self.M4DCH      = None
+        if int(M4DIr.GetFileValue('CellHysteresis','0')):
+            self.M4DCH  = Mini4WDCellHysteresis(self.M4DLT,int(M4DIr.GetFileValue('HysteresisMargin','3')),\
+                            int(M4DIr.GetFileValue('HysteresisFrames','1')),\
+                            float(M4DIr.GetFileValue('HysteresisTime','0.03')))
+        self.gx_pre     = -1
+        self.gy_pre     = -1
+        self.Information= (-1,-1,-1,-1,-1,-1,-1)
+
+    def Start(self,shape):
+        '''
+        設定ファイルのmapX_pre,mapY_pre(接尾辞付き)のエリアにミニ四駆を置いたものとして
+        状態を初期化し，そのエリアのduty比を送信する．
+
+        Parameters
+        ----------
+        shape:tuple
+            前処理後のフレームのshape
+        '''
+        mapX_pre,mapY_pre   = int(self.M4DH.GetCarValue('mapX_pre')),int(self.M4DH.GetCarValue('mapY_pre'))
+        self.M4DH.LocationChangeEventListner(mapX_pre,mapY_pre)
+        self.gx_pre         = (shape[1]/self.M4DH.GetDivMapW())//2*(mapX_pre+1)
+        self.gy_pre         = (shape[0]/self.M4DH.GetDivMapH())//2*(mapY_pre+1)
+        self.M4DT.Reset(self.gx_pre,self.gy_pre)
+        self.Information    = (mapX_pre,mapY_pre,-1,-1,-1,-1,-1)
+        if self.M4DCH is not None:
+            self.M4DCH.Reset((mapX_pre,mapY_pre))
+
+    def Predict(self,t):
+        '''
+        時刻tにおけるこのミニ四駆の位置を予測する．ブロブの割り当てに使う．
+
+        Returns
+        -------
+        gx:float
+            予測したX座標
+        gy:float
+            予測したY座標
+        '''
+        gx, gy = self.M4DT.Predict(t)
+        if gx == -1:
+            return self.gx_pre,self.gy_pre
+        return gx,gy
+
+    def OnDetected(self,result,shape,FrameID=-1,FrameTime=None):
+        '''
+        割り当てられたブロブからエリアを求め，ログに記録して，
+        エリアが変わった場合はこのミニ四駆にduty比を送信する．
+        duty比を補間する場合はエリアが変わらなくても送信を試みる．
+
+        Parameters
+        ----------
+        result:tuple
+            Mini4WDBlobSelector.SelectManyが返した(x,y,w,h,gx,gy,area)
+        shape:tuple
+            前処理後のフレームのshape
+        FrameID:int default=-1
+            ミニ四駆が見つかったフレームの番号
+        FrameTime:float default=None
+            ミニ四駆が見つかったフレームを取得した時刻
+        '''
+        x, y, w, h, gx, gy, area = result
+        t                   = time.perf_counter() if FrameTime is None else FrameTime
+        self.M4DT.Update(gx,gy,t)
+        self.gx_pre,self.gy_pre = gx,gy
+        mapX_pre,mapY_pre   = self.Information[0],self.Information[1]
+        if self.M4DLT.IsOutdated(shape):
+            self.M4DLT.Build(shape)
+        mapX,mapY,DutyRatio = self.M4DLT.Lookup(gx,gy)
+        if self.M4DCH is not None:
+            mapX,mapY,filtered  = self.M4DCH.Filter(gx,gy,mapX,mapY,DutyRatio,t)
+            if not self.M4DLT.Interpolate:
+                DutyRatio       = filtered
+        self.Information    = (mapX,mapY,gx,gy,w,h,area)
+        self.M4DL.AppendDetectionLog(self.Information+(self.Index,))
+        if mapX!=mapX_pre or mapY!=mapY_pre or self.M4DLT.Interpolate:
+            self.M4DH.LocationChangeEventListner(mapX,mapY,DutyRatio,FrameID,FrameTime)
+
+    def GetInformationsOfDetection(self):
+        return self.Information
+
+    def GetIndex(self):
+        return self.Index
+
+    def GetM4DH(self):
+        return self.M4DH
+
+    def GetM4DT(self):
+        return self.M4DT
+
+    def GetM4DCH(self):
+        return self.M4DCH
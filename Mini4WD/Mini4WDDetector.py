@@ -4,6 +4,16 @@ import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image
 from Mini4WDImage import Mini4WDImageProcessor
+from Mini4WDBackground import Mini4WDBackgroundModel
+from Mini4WDSearchWindow import Mini4WDSearchWindow
+from Mini4WDBlob import Mini4WDBlobSelector
+from Mini4WDTracker import Mini4WDTracker
+from Mini4WDCapture import Mini4WDCaptureThread
+from Mini4WDPipeline import Mini4WDPipeline
+from Mini4WDLocationTable import Mini4WDLocationTable,ParseBoundaries
+from Mini4WDScheduler import Mini4WDDutyScheduler
+from Mini4WDHysteresis import Mini4WDCellHysteresis
+from Mini4WDCar import Mini4WDCar
 from Mini4WDException import NotAllowedValue,InvalidOperation,InvalidImageFile,CameraIsNotOpened,FailedCapturingBGSI
 
 class Mini4WDDetector():
@@ -18,10 +28,54 @@ class Mini4WDDetector():
     ----------
     M4DIP:Mini4WDImageprocessor
         ミニ四駆の画像の処理を行うクラスのインスタンス
+    M4DBM:Mini4WDBackgroundModel
+        背景画像から作成した，使いまわす背景モデルのインスタンス
+    BGSMethod:string
+        背景差分の方法(absdiff,mog2,knn,legacy)
+    BGSThreshold:int
+        absdiffで前景とみなす輝度差の閾値
+    M4DBS:Mini4WDBlobSelector
+        二値画像からミニ四駆を選ぶインスタンス
+    M4DT:Mini4WDTracker, default=None
+        ミニ四駆の位置と速度から次の位置を予測するインスタンス．
+        Noneならば前回の座標をそのまま次の探索の中心とする
+    M4DCT:Mini4WDCaptureThread, default=None
+        検知中に別スレッドでカメラから読み込むインスタンス．
+        Noneならば検知のスレッドで直接カメラから読み込む
+    CaptureBufferSize:int
+        別スレッドで読み込む場合のリングバッファの大きさ．0以下なら別スレッドで読み込まない
+    M4DLT:Mini4WDLocationTable
+        ピクセルからエリアとduty比を求める表．設定ファイルのDutyInterpolationが1なら
+        duty比はエリアの中心の値を補間した連続な値になり，エリアが変わらなくても毎フレーム送信を試みる
+    M4DDS:Mini4WDDutyScheduler, default=None
+        次に入るエリアを予測して先にduty比を送信するインスタンス．
+        Noneならばエリアに入ってから送信する．M4DTがNoneの場合は使えない
+    TargetCell:tuple
+        最後にduty比を送信したエリア(mapX,mapY)
+    M4DCH:Mini4WDCellHysteresis, default=None
+        境界付近での重心のぶれによるエリアの変化を抑えるインスタンス．
+        Noneならば観測したエリアをそのまま使う
+    Cars:list context=Mini4WDCar or None
+        複数台のミニ四駆を検知する場合の1台ごとの状態．先頭はM4DHのミニ四駆．
+        Noneならば1台だけを検知する
+    M4DPF:Mini4WDProfiler, default=None
+        検知のループの各段階の時間を記録するインスタンス．Noneなら記録しない
+    M4DSW:Mini4WDSearchWindow, default=None
+        前回の位置の周りだけを探索するための探索窓．
+        Noneならば常にフレーム全体を探索する
     USBCamera:cv2.VideoCapture()
             読み込むUSBカメラもしくは映像
+    CameraSource:int or string
+        USBCameraを開くときに指定したカメラの番号もしくは映像のパス
+    M4DPL:Mini4WDPipeline, default=None
+        読み込みと検知を別プロセスで行うインスタンス．
+        Noneならばすべて検知のスレッドで行う．
+        1台のミニ四駆だけを検知し，各段階の時間は記録しないので，
+        複数台の場合(Cars)と時間を記録する場合(M4DPF)には使えない
     BackGroundImage:array_like
         numpy型として保存した背景画像
+    FrameID:int
+        検知を始めてから読み込んだフレームの番号．コマンドの記録に使う
     Mini4WDMinSize:int
         ミニ四駆とみなす最小のピクセル数
     Mini4WDMaxSize:int
@@ -53,7 +107,7 @@ class Mini4WDDetector():
         ただしこれは検出した領域で囲まれるピクセルの数
     '''
 
-    def __init__(self,Mini4WDHandler):
+    def __init__(self,Mini4WDHandler,USBCamera=None,BGSIFilePath=None,OtherMini4WDHandlers=None):
         '''
         初期化を行う．
         Parameters
@@ -62,19 +116,74 @@ class Mini4WDDetector():
             ミニ四駆の初期設定ファイルを扱うインスタンス
         M4DH:Mini4WDHandler
             ミニ四駆に信号を送るインスタンス
+        OtherMini4WDHandlers:list context=Mini4WDHandler default=None
+            2台目以降のミニ四駆に信号を送るインスタンス．指定すると複数台を同時に検知する
+        USBCamera:cv2.VideoCapture default=None
+            読み込むカメラの代わりに使うインスタンス(Mini4WDReplayCaptureなど)．
+            Noneなら設定ファイルのUSBCameraNumのカメラを開く
+        BGSIFilePath:string default=None
+            保存してある背景画像のパス．Noneならカメラから背景画像を取得する
         '''
         self.M4DH               = Mini4WDHandler
         self.M4DIr              = self.M4DH.GetM4DIr()
         self.M4DL               = self.M4DH.GetM4DL()
         self.M4DIP              = Mini4WDImageProcessor(self.M4DIr,self.M4DH)
         self.BackGroundImage    = None
+        self.M4DBM              = None
+        self.BGSMethod          = self.M4DIr.GetFileValue('BGSMethod','legacy')
+        self.BGSThreshold       = int(self.M4DIr.GetFileValue('BGSThreshold','25'))
+        self.M4DT               = None
+        if int(self.M4DIr.GetFileValue('Tracker','0')):
+            self.M4DT           = Mini4WDTracker(float(self.M4DIr.GetFileValue('TrackerAlpha','0.75')),\
+                                    float(self.M4DIr.GetFileValue('TrackerBeta','0.45')),\
+                                    float(self.M4DIr.GetFileValue('TrackerMaxCoast','0.5')))
+        self.M4DCT              = None
+        self.M4DPF              = None
+        self.M4DLT              = Mini4WDLocationTable(self.M4DH.GetM4DM(),\
+                                    ParseBoundaries(self.M4DIr.GetFileValue('MapBoundariesX','')),\
+                                    ParseBoundaries(self.M4DIr.GetFileValue('MapBoundariesY','')),\
+                                    bool(int(self.M4DIr.GetFileValue('DutyInterpolation','0'))))
+        self.M4DDS              = None
+        if int(self.M4DIr.GetFileValue('DutyScheduling','0')) and self.M4DT is not None:
+            self.M4DDS          = Mini4WDDutyScheduler(self.M4DLT,float(self.M4DIr.GetFileValue('DutyLeadTime','0.05')),\
+                                    float(self.M4DIr.GetFileValue('DutyMaxHorizon','0.5')))
+        self.TargetCell         = (-1,-1)
+        self.M4DCH              = None
+        if int(self.M4DIr.GetFileValue('CellHysteresis','0')):
+            self.M4DCH          = Mini4WDCellHysteresis(self.M4DLT,int(self.M4DIr.GetFileValue('HysteresisMargin','3')),\
+                                    int(self.M4DIr.GetFileValue('HysteresisFrames','1')),\
+                                    float(self.M4DIr.GetFileValue('HysteresisTime','0.03')))
+        self.Cars               = None
+        if OtherMini4WDHandlers:
+            self.Cars           = [Mini4WDCar(i,M4DH) for i,M4DH in enumerate([self.M4DH]+list(OtherMini4WDHandlers))]
+        self.CaptureBufferSize  = int(self.M4DIr.GetFileValue('CaptureBufferSize','0'))
+        self.M4DSW              = None
+        if int(self.M4DIr.GetFileValue('SearchWindow','0')):
+            self.M4DSW          = Mini4WDSearchWindow(int(self.M4DIr.GetFileValue('SearchWindowSize','40')),\
+                                    float(self.M4DIr.GetFileValue('SearchWindowGrowth','1.5')),\
+                                    int(self.M4DIr.GetFileValue('SearchWindowMaxMiss','5')))
         self.BGSIPath           = self.M4DIr.GetFileValue('BGSIPath')
-        self.USBCamera          = cv2.VideoCapture(int(self.M4DIr.GetFileValue('USBCameraNum')))
+        if USBCamera is None:
+            self.CameraSource   = int(self.M4DIr.GetFileValue('USBCameraNum'))
+            self.USBCamera      = cv2.VideoCapture(self.CameraSource)
+        else:
+            self.CameraSource   = getattr(USBCamera,'Source',None)
+            self.USBCamera      = USBCamera
         self.Mini4WDMaxSize     = int(self.M4DIr.GetFileValue('Mini4WDMaxSize'))
         self.Mini4WDMinSize     = int(self.M4DIr.GetFileValue('Mini4WDMinSize'))
+        self.M4DBS              = Mini4WDBlobSelector(self.M4DIr.GetFileValue('DetectionBackend','contour'),\
+                                    self.Mini4WDMinSize,self.Mini4WDMaxSize,\
+                                    float(self.M4DIr.GetFileValue('GateDistance','4.5')))
+        self.M4DPL              = None
+        if int(self.M4DIr.GetFileValue('PipelineMode','0')):
+            if self.Cars is not None:
+                print('PipelineMode=1は1台のミニ四駆だけを検知します．複数台の場合はPipelineMode=0としてください')
+                raise NotAllowedValue
+            self.M4DPL          = Mini4WDPipeline(self,int(self.M4DIr.GetFileValue('PipelineSlots','4')))
         self.DivMapH            = self.M4DH.GetDivMapH()
         self.DivMapW            = self.M4DH.GetDivMapW()
         self.VideoFrame         = None
+        self.FrameID            = 0
         self.binaryImage        = None
         self.StartFlag          = False
         self.ShowFlag           = False
@@ -85,7 +194,7 @@ class Mini4WDDetector():
         self.wLength            = 0
         self.hLength            = 0
         self.mapArea            = 0
-        self.SetBGSI()
+        self.SetBGSI(BGSIFilePath)
 
     def __del__(self):
         '''
@@ -100,6 +209,7 @@ class Mini4WDDetector():
         '''
         背景画像とビデオフレームを一枚ずつ取得し，前回のミニ四駆の
         座標を用いつつ今回のミニ四駆の座標を推定する．
+        探索窓が有効な場合は前回の座標の周りだけを探索する．
 
         Parameters
         ----------
@@ -137,47 +247,30 @@ class Mini4WDDetector():
             ミニ四駆未発見時は-1
 
         '''
-        IsMini4WD                                   = False
-        rectlist                                    = []
-        gdlist                                      = []
-        x = y = w = h = gx = gy = area = maparea    = -1
-
         # 背景差分をとる
-        fgbg                = cv2.bgsegm.createBackgroundSubtractorMOG()#背景オブジェクトの作成
-        fgmask              = fgbg.apply(BackGroundImage)#領域の適用
-        fgmask              = fgbg.apply(VideoFrame)
-        self.binaryImage    = fgmask
-
-        #ピクセル数を数える
-        contours, hierarchy = cv2.findContours(self.binaryImage, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # 各輪郭に対する処理
-        for i in range(0, len(contours)):
-
-            # 輪郭の領域を計算
-            area = cv2.contourArea(contours[i])
-
-            # ノイズ（小さすぎる領域）と全体の輪郭（大きすぎる領域）を除外
-            # if area < self.Mini4WDMinSize or self.Mini4WDMaxSize < area:
-            #     continue
-
-            # 外接矩形
-            if len(contours[i]) > 0:
-                x, y, w, h  = cv2.boundingRect(contours[i])
-                gx          = x+w/2
-                gy          = y+h/2
-                rect        = (x, y, w, h, gx, gy, area)
-                gd          = (gx-gx_pre)*(gx-gx_pre)+(gy-gy_pre)*(gy-gy_pre)
-                maparea     = area    
-                rectlist.append(rect)
-                gdlist.append(gd)
-                if gd < 20:
-                    IsMini4WD = True
-                # print(x, y, w, h, gx, gy, maparea)
-                
-        if IsMini4WD:
-            x, y, w, h, gx, gy, maparea = rectlist[gdlist.index(min(gdlist))]
-            # print(x, y, w, h, gx, gy, maparea)
+        if BackGroundImage is not self.M4DBM.GetBackGroundImage():       # 背景画像が変わったときだけ作り直す
+            self.M4DBM.SetBackGroundImage(BackGroundImage)
+        Window = None
+        if self.M4DSW is not None:
+            Window = self.M4DSW.GetWindow(gx_pre,gy_pre,VideoFrame.shape)
+        self.binaryImage    = self.M4DBM.Apply(VideoFrame,Window)
+        offset              = (0,0) if Window is None else (Window[0],Window[1])
+        if self.M4DPF is not None:
+            self.M4DPF.Lap('bgsub')
+
+        # ブロブを取り出し，前回の座標に最も近いものを選ぶ
+        candidates          = self.M4DBS.Extract(self.binaryImage,offset)
+        if self.M4DPF is not None:
+            self.M4DPF.Lap('extract')
+        x, y, w, h, gx, gy, maparea = self.M4DBS.Select(candidates,gx_pre,gy_pre)
+
+        if self.M4DSW is not None:
+            if gx == -1:
+                self.M4DSW.Miss()
+            else:
+                self.M4DSW.Hit()
+        if self.M4DPF is not None:
+            self.M4DPF.Lap('select')
         
         return x, y, w, h, gx, gy, maparea
 
@@ -219,6 +312,27 @@ class Mini4WDDetector():
         '''
         return self.xCoordinate,self.yCoordinate
 
+    def GetPredictedMini4WDXYCoordinates(self,Milliseconds=0):
+        '''
+        Milliseconds[ms]後のミニ四駆の座標を予測する．
+        トラッカーが無効な場合は現在の座標を返す．
+
+        Parameters
+        ----------
+        Milliseconds:float default=0
+            何ミリ秒後の座標を予測するか
+
+        Returns
+        -------
+        xCoordinate:float
+            予測したミニ四駆の横の座標
+        yCoordinate:float
+            予測したミニ四駆の縦の座標
+        '''
+        if self.M4DT is None:
+            return self.xCoordinate,self.yCoordinate
+        return self.M4DT.GetPredictedPosition(Milliseconds)
+
     def GetMini4WDLocation(self):
         '''
         ミニ四駆のマップ上のエリアを示す．
@@ -290,12 +404,39 @@ class Mini4WDDetector():
         '''
         cv2.imwrite(pathname,self.BackGroundImage)
 
-    def SetBGSI(self):
+    def SetBGSI(self,pathname=None):
         '''
         現在のカメラから背景画像を適切に取得する．
-        カメラはパラメータを自動調整するので，それが終了したら背景画像を取得する
-        '''
-        if self.USBCamera.isOpened():
+        カメラはパラメータを自動調整するので，それが終了したら背景画像を取得する．
+        pathnameを指定した場合は，SaveBackGroundSubstractorImageで保存した
+        背景画像を読み込む．
+
+        Parameters
+        ----------
+        pathname:String default=None
+            保存してある背景画像のパス
+
+        Throws
+        ------
+        InvalidImageFile:
+            指定した背景画像が読み込めなかった場合
+        CameraIsNotOpened:
+            カメラが開いていない場合
+        FailedCapturingBGSI:
+            背景画像の自動調節に失敗した場合
+        '''
+        if pathname is not None:
+            BackGroundImage = cv2.imread(pathname,cv2.IMREAD_GRAYSCALE if self.M4DIP.IsGray() else cv2.IMREAD_COLOR)
+            if BackGroundImage is None:
+                raise InvalidImageFile
+            self.BackGroundImage = BackGroundImage
+            if self.M4DBM is None:
+                self.M4DBM = Mini4WDBackgroundModel(self.BackGroundImage,self.BGSMethod,self.BGSThreshold)
+            else:
+                self.M4DBM.SetBackGroundImage(self.BackGroundImage)
+            cv2.imwrite(self.BGSIPath,self.BackGroundImage)
+
+        elif self.USBCamera.isOpened():
             print('背景画像の自動調節中です...')
             ret, frame1 = self.USBCamera.read()
             frame1 = self.M4DIP.ImagePreprocessing(frame1)
@@ -306,9 +447,7 @@ class Mini4WDDetector():
             while True:
                 ret, frame2 = self.USBCamera.read()
                 frame2      = self.M4DIP.ImagePreprocessing(frame2)
-                fgbg                = cv2.bgsegm.createBackgroundSubtractorMOG()#背景オブジェクトの作成
-                fgmask              = fgbg.apply(frame1)#領域の適用
-                fgmask              = fgbg.apply(frame2)
+                fgmask              = Mini4WDBackgroundModel.Compare(frame1,frame2,self.BGSMethod,self.BGSThreshold)
                 contours, hierarchy = cv2.findContours(fgmask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
                 frame1 = frame2
                 if len(contours) > 0:
@@ -324,6 +463,7 @@ class Mini4WDDetector():
 
             # 最後のフレームを背景画像としてセットする
             self.BackGroundImage = frame1
+            self.M4DBM           = Mini4WDBackgroundModel(self.BackGroundImage,self.BGSMethod,self.BGSThreshold)
             cv2.imwrite(self.BGSIPath,self.BackGroundImage)
 
             print('背景画像の自動調節が終了しました!')
@@ -331,6 +471,31 @@ class Mini4WDDetector():
         else :
             raise CameraIsNotOpened
 
+    def ReleaseCamera(self):
+        '''
+        別プロセスでカメラを開くためにUSBカメラを解放する．
+
+        Returns
+        -------
+        CameraSource:int or string
+            USBCameraを開くときに指定したカメラの番号もしくは映像のパス
+        '''
+        if self.USBCamera.isOpened():
+            self.USBCamera.release()
+        return self.CameraSource
+
+    def OpenCamera(self,CameraSource):
+        '''
+        USBカメラを開きなおす．
+
+        Parameters
+        ----------
+        CameraSource:int or string
+            カメラの番号もしくは映像のパス
+        '''
+        self.CameraSource   = CameraSource
+        self.USBCamera      = cv2.VideoCapture(self.CameraSource)
+
     def GetBGSIPath(self):
         return self.BGSIPath
 
@@ -402,41 +567,214 @@ class Mini4WDDetector():
         self.M4DH.LocationChangeEventListner(mapX_pre,mapY_pre)
         # ミニ四駆を一番初めに設置したエリアの座標 -> 1フレーム前のミニ四駆の座標
         gx_pre , gy_pre                         = (self.BackGroundImage.shape[1]/self.DivMapW)//2*(mapX_pre+1), (self.BackGroundImage.shape[0]/self.DivMapH)//2*(mapY_pre+1)
+        if self.M4DT is not None:
+            self.M4DT.Reset(gx_pre,gy_pre)
+        self.mapX,self.mapY                     = mapX_pre,mapY_pre
+        self.TargetCell                         = (mapX_pre,mapY_pre)
+        if self.M4DDS is not None:
+            self.M4DDS.Reset()
+        if self.M4DCH is not None:
+            self.M4DCH.Reset((mapX_pre,mapY_pre))
         self.StartFlag                          = True
+        if self.M4DPL is not None:                                              # 別プロセスで読み込みと検知を行う
+            self.M4DPL.Run(gx_pre,gy_pre)
+            self.WriteTransitionLog()
+            cv2.destroyAllWindows()
+            return
+        Camera                                  = self.USBCamera
+        if self.CaptureBufferSize > 0:                                          # 別スレッドで読み込み，最新のフレームだけを使う
+            self.M4DCT                          = Mini4WDCaptureThread(self.USBCamera,self.CaptureBufferSize)
+            self.M4DCT.Start()
+            Camera                              = self.M4DCT
         #--------------------------------------------#
 
-        while(self.USBCamera.isOpened() & self.StartFlag):
-            ret, frame  = self.USBCamera.read()                                 # VideoCaptureから1フレーム読み込む
+        if self.Cars is not None:                                               # 複数台のミニ四駆を検知する
+            self.DetectMultipleMini4WD(Camera)                                  # StartFlagが偽になるまで戻らない
+
+        while(Camera.isOpened() & self.StartFlag):
+            if self.M4DPF is not None:
+                self.M4DPF.Start()
+            ret, frame  = Camera.read()                                         # VideoCaptureから1フレーム読み込む
+            if self.M4DPF is not None:
+                self.M4DPF.Lap('read')
 
             if(ret):
-                self.VideoFrame     = self.M4DIP.ImagePreprocessing(frame)     # ここでビデオフレームの前処理を行う
+                self.FrameID        += 1
+                t                   = self.GetFrameTime(Camera)                 # フレームを取得した時刻
+                if self.M4DT is not None:
+                    gx_pre,gy_pre   = self.M4DT.Predict(t)                      # 今回の位置を予測して探索の中心とする
+                self.VideoFrame     = self.M4DIP.ImagePreprocessing(frame,self.VideoFrame) # ここでビデオフレームの前処理を行う(前回の配列に上書きする)
+                if self.M4DPF is not None:
+                    self.M4DPF.Lap('preprocess')
                 x,y,w,h,gx,gy,area  = \
                     self.DetectMini4WD(self.BackGroundImage,self.VideoFrame,gx_pre,gy_pre)# ミニ四駆の検知
                 
                 if gx == -1:                                                    # もし見つからなかったら
                     continue                                                    # 次のループへ
-                
-                mapX                 = int(gx//(self.VideoFrame.shape[1]//self.DivMapW))
-                mapY                 = int(gy//(self.VideoFrame.shape[0]//self.DivMapH))
-                # print(mapX,mapY)
-                self.SetInformationsOfDetection(mapX,mapY,gx,gy,w,h,area)
-                self.M4DL.AppendDetectionLog(self.GetInformationsOfDetection())
-                if mapX!=mapX_pre or mapY!=mapY_pre:
-                    self.M4DH.LocationChangeEventListner(mapX,mapY)
-                    mapX_pre=mapX
-                    mapY_pre=mapY
+
+                if self.M4DT is not None:
+                    self.M4DT.Update(gx,gy,t)
+
+                self.OnMini4WDDetected(gx,gy,w,h,area,self.FrameID,t)
                     
                 gx_pre,gy_pre        = gx,gy                                         # 次の呼び出しのために値渡し
 
-                # showFlagがTrueなら下記の処理をする（本来は）
-                if True:
+                # showFlagがTrueなら下記の処理をする
+                if self.ShowFlag:
                     cv2.imshow('USBCamera',self.VideoFrame)
                     cv2.imshow('Binary',self.binaryImage)
                     k = cv2.waitKey(1)
 
+        if self.M4DCT is not None:
+            self.M4DCT.Stop()
+            self.M4DL.WriteOperationLog('Capture thread : captured {} , dropped {} , frame age {:.1f} ms (max {:.1f} ms)'\
+                .format(*self.M4DCT.GetCounters()))
+            self.M4DCT = None
+        mean, maximum, count = self.M4DBM.GetCost()
+        self.M4DL.WriteOperationLog('Background model {} : {:.3f} ms/frame (max {:.3f} ms, {} frames)'\
+            .format(self.M4DBM.GetMethod(),mean,maximum,count))
+        self.M4DBM.ResetCost()
+        if self.M4DSW is not None:
+            self.M4DL.WriteOperationLog('Search window : hit {} , miss {} , fallback {} , pixel ratio {:.3f}'\
+                .format(*self.M4DSW.GetCounters()))
+            self.M4DSW.Reset()
+        self.WriteTransitionLog()
         cv2.destroyAllWindows()
         return
+
+    def DetectMultipleMini4WD(self,Camera):
+        '''
+        複数台のミニ四駆を検知し続ける．背景差分とブロブの取り出しはフレームごとに一度だけ行い，
+        取り出したブロブを各ミニ四駆の予測した位置に全体で近い順に割り当てる．
+        1台増えるごとに増える処理は予測と割り当ての表の1行だけである．
+        探索窓と予測による先行送信は使わない．
+
+        Parameters
+        ----------
+        Camera:cv2.VideoCapture or Mini4WDCaptureThread
+            フレームを読み込むインスタンス
+        '''
+        shape = self.BackGroundImage.shape
+        for car in self.Cars:
+            car.Start(shape)
+        while(Camera.isOpened() & self.StartFlag):
+            ret, frame  = Camera.read()
+            if not ret:
+                continue
+            self.FrameID        += 1
+            t                   = self.GetFrameTime(Camera)
+            self.VideoFrame     = self.M4DIP.ImagePreprocessing(frame,self.VideoFrame)
+            if self.BackGroundImage is not self.M4DBM.GetBackGroundImage():
+                self.M4DBM.SetBackGroundImage(self.BackGroundImage)
+            self.binaryImage    = self.M4DBM.Apply(self.VideoFrame)
+            candidates          = self.M4DBS.Extract(self.binaryImage)
+            results             = self.M4DBS.SelectMany(candidates,[car.Predict(t) for car in self.Cars])
+            for car, result in zip(self.Cars,results):
+                if result[4] != -1:
+                    car.OnDetected(result,shape,self.FrameID,t)
+            if results[0][4] != -1:                                             # GUIには1台目を表示する．見つからなければ前回のまま
+                self.SetInformationsOfDetection(*self.Cars[0].GetInformationsOfDetection())
+
+            if self.ShowFlag:
+                cv2.imshow('USBCamera',self.VideoFrame)
+                cv2.imshow('Binary',self.binaryImage)
+                k = cv2.waitKey(1)
+
+    def GetFrameTime(self,Camera):
+        '''
+        読み込んだフレームの時刻を返す．読み込むインスタンスが時刻を持つ場合
+        (別スレッドの読み込み，録画の再生)はその時刻，持たない場合は今の時刻とする．
+        録画をfastで再生する場合は映像の時刻になるので，予測や速度の推定が処理の速さに左右されない．
+
+        Parameters
+        ----------
+        Camera:cv2.VideoCapture or Mini4WDCaptureThread or Mini4WDReplayCapture
+            フレームを読み込んだインスタンス
+
+        Returns
+        -------
+        t:float
+            フレームの時刻[s](time.perf_counterと同じ基準)
+        '''
+        if hasattr(Camera,'GetFrameTime'):
+            return Camera.GetFrameTime()
+        return time.perf_counter()
+
+    def WriteTransitionLog(self):
+        '''
+        duty比を先に送信した回数と予測が当たった回数，
+        境界付近で抑えたエリアの変化の回数，補間したduty比の送信を抑えた回数を操作ログに記録する．
+        '''
+        if self.M4DDS is not None:
+            self.M4DL.WriteOperationLog('Duty scheduling : scheduled {} , hit {} , missed {} , lead {:.1f} ms'\
+                .format(*self.M4DDS.GetCounters()))
+        if self.M4DCH is not None and self.Cars is None:
+            self.M4DL.WriteOperationLog('Cell hysteresis : accepted {} , suppressed spatial {} , temporal {}'\
+                .format(*self.M4DCH.GetCounters()))
+        for car in self.Cars or []:
+            if car.GetM4DCH() is not None:
+                self.M4DL.WriteOperationLog('Cell hysteresis (car {}) : accepted {} , suppressed spatial {} , temporal {}'\
+                    .format(car.GetIndex(),*car.GetM4DCH().GetCounters()))
+        for i, M4DH in enumerate([car.GetM4DH() for car in self.Cars] if self.Cars else [self.M4DH]):
+            if M4DH.GetM4DRL() is not None:
+                self.M4DL.WriteOperationLog('Duty rate limiter (car {}) : sent {} , suppressed {}'\
+                    .format(i,*M4DH.GetM4DRL().GetCounters()))
     
+    def OnMini4WDDetected(self,gx,gy,w,h,area,FrameID=-1,FrameTime=None):
+        '''
+        ミニ四駆が見つかったときの処理．エリアを求めて検知の情報を設定し，
+        ログに記録して，エリアが変わった場合はduty比を送信する．
+        duty比を補間する場合はエリアが変わらなくても送信を試みる(送信するかはM4DHが決める)．
+
+        Parameters
+        ----------
+        gx:int
+            ミニ四駆のX座標
+        gy:int
+            ミニ四駆のY座標
+        w:int
+            ミニ四駆の外接短形の横の長さ
+        h:int
+            ミニ四駆の外接短形の縦の長さ
+        area:int
+            画像上におけるミニ四駆の面積
+        FrameID:int default=-1
+            ミニ四駆が見つかったフレームの番号
+        FrameTime:float default=None
+            ミニ四駆が見つかったフレームを取得した時刻(time.perf_counter)
+        '''
+        mapX_pre,mapY_pre   = self.mapX,self.mapY
+        if self.M4DLT.IsOutdated(self.BackGroundImage.shape):                  # フレームの大きさかDutyMapが変わった
+            self.M4DLT.Build(self.BackGroundImage.shape)
+            self.DivMapH,self.DivMapW = self.M4DLT.DivMapH,self.M4DLT.DivMapW
+        mapX,mapY,DutyRatio = self.M4DLT.Lookup(gx,gy)
+        if self.M4DCH is not None:                                              # 境界付近のぶれではエリアを変えない
+            mapX,mapY,filtered  = self.M4DCH.Filter(gx,gy,mapX,mapY,DutyRatio,\
+                                    time.perf_counter() if FrameTime is None else FrameTime)
+            if not self.M4DLT.Interpolate:                                      # 補間したduty比は位置だけで決まる
+                DutyRatio       = filtered
+        # print(mapX,mapY)
+        self.SetInformationsOfDetection(mapX,mapY,gx,gy,w,h,area)
+        if self.M4DPF is not None:
+            self.M4DPF.Lap('set_info')
+        self.M4DL.AppendDetectionLog(self.GetInformationsOfDetection())
+        if self.M4DPF is not None:
+            self.M4DPF.Lap('log')
+        if self.M4DDS is not None:                                              # 次に入るエリアを予測して先に送信する
+            vx,vy               = self.M4DT.GetVelocity()
+            t                   = time.perf_counter() if FrameTime is None else FrameTime
+            targetX,targetY,targetDutyRatio = \
+                self.M4DDS.Update(gx,gy,vx,vy,t,self.M4DH.GetCommandLatency())
+            if (targetX,targetY) != self.TargetCell or self.M4DLT.Interpolate:
+                self.M4DH.LocationChangeEventListner(targetX,targetY,targetDutyRatio,FrameID,FrameTime)
+                self.TargetCell = (targetX,targetY)
+                if self.M4DPF is not None:
+                    self.M4DPF.Lap('dispatch')
+        elif mapX!=mapX_pre or mapY!=mapY_pre or self.M4DLT.Interpolate:
+            self.M4DH.LocationChangeEventListner(mapX,mapY,DutyRatio,FrameID,FrameTime)
+            if self.M4DPF is not None:
+                self.M4DPF.Lap('dispatch')
+
     def ShowFrame(self):
         self.ShowFlag=True
 
@@ -455,6 +793,52 @@ class Mini4WDDetector():
     def GetM4DIP(self):
         return self.M4DIP
 
+    def GetM4DBM(self):
+        return self.M4DBM
+
+    def GetM4DSW(self):
+        return self.M4DSW
+
+    def GetM4DBS(self):
+        return self.M4DBS
+
+    def GetM4DT(self):
+        return self.M4DT
+
+    def GetM4DCT(self):
+        return self.M4DCT
+
+    def GetM4DPL(self):
+        return self.M4DPL
+
+    def GetM4DLT(self):
+        return self.M4DLT
+
+    def GetCars(self):
+        return self.Cars
+
+    def SetM4DPF(self,M4DPF):
+        '''
+        検知のループの各段階の時間を記録するインスタンスを設定する．
+
+        Parameters
+        ----------
+        M4DPF:Mini4WDProfiler
+            記録するインスタンス．Noneなら記録をやめる
+
+        Throws
+        ------
+        NotAllowedValue:
+            読み込みと検知を別プロセスで行う場合(PipelineMode=1)．各段階の時間は記録できない
+        '''
+        if M4DPF is not None and self.M4DPL is not None:
+            print('PipelineMode=1では検知のループの各段階の時間を記録できません．PipelineMode=0としてください')
+            raise NotAllowedValue
+        self.M4DPF = M4DPF
+
+    def GetM4DPF(self):
+        return self.M4DPF
+
     def GetM4DH(self):
         return self.M4DH
 
@@ -0,0 +1,304 @@
+import time
+import threading
+
+class Mini4WDCommandDispatcher():
+    '''
+    ミニ四駆へのコマンドを別スレッドで送信するクラス．
+    Postはコマンドを預けてすぐに戻るので，検知のループが通信の遅さで止まらない．
+    コマンドは種類(duty,rightLED,leftLED,state)ごとに最新の値だけを保持し，
+    送信されていない古い値は新しい値で上書きして捨てる(latest-wins)．
+    stateは変わった項目だけのdictなので，上書きせずに新しい値で更新する．
+    stateとduty,rightLED,leftLEDの同じ項目が両方未送信の場合は古い方を捨てる．
+    上書きしたコマンドは最後に預けたものとして送信するので，種類をまたいだ順序も保たれる．
+
+    Attributes
+    ----------
+    Transmit:function
+        Transmit(key,value,FrameID,FrameTime,PostTime)でコマンドを実際に送信する関数
+    Pending:dict
+        コマンドの種類をキーとして，(値,預けた時刻,フレームの番号,フレームの時刻)を持つ未送信のコマンド
+    Condition:threading.Condition
+        Pendingを操作するときのロック
+    RunFlag:boolean
+        送信のスレッドを動かすかどうかのフラグ
+    IsSending:boolean
+        送信のスレッドがコマンドを送信中かどうか
+    PostCount:int
+        預けられたコマンドの数
+    SentCount:int
+        送信したコマンドの数
+    CoalescedCount:int
+        新しい値で上書きされて捨てられたコマンドの数
+    MaxDepth:int
+        未送信のコマンドの数の最大値
+    TotalLatency:float
+        預けてから送信が終わるまでの時間の合計[s]
+    MaxLatency:float
+        預けてから送信が終わるまでの時間の最大値[s]
+    '''
+
+    def __init__(self,Transmit):
+        '''
+        Parameters
+        ----------
+        Transmit:function
+            Transmit(key,value,FrameID,FrameTime,PostTime)でコマンドを実際に送信する関数
+        '''
+        self.Transmit       = Transmit
+        self.Pending        = dict()
+        self.Condition      = threading.Condition()
+        self.Thread         = None
+        self.RunFlag        = False
+        self.IsSending      = False
+        self.PostCount      = 0
+        self.SentCount      = 0
+        self.CoalescedCount = 0
+        self.MaxDepth       = 0
+        self.TotalLatency   = 0.0
+        self.MaxLatency     = 0.0
+
+    def Start(self):
+        '''
+        送信のスレッドを始動する．
+        '''
+        self.RunFlag    = True
+        self.Thread     = threading.Thread(target=self.SendLoop,daemon=True)
+        self.Thread.start()
+
+    def Stop(self,timeout=1.0):
+        '''
+        未送信のコマンドを送信し終えてから送信のスレッドを停止する．
+
+        Parameters
+        ----------
+        timeout:float default=1.0
+            送信し終えるまで待つ最大の時間[s]
+        '''
+        self.Flush(timeout)
+        with self.Condition:
+            self.RunFlag = False
+            self.Condition.notify_all()
+        if self.Thread is not None:
+            self.Thread.join(timeout)
+            self.Thread = None
+
+    def Post(self,key,value,FrameID=-1,FrameTime=None):
+        '''
+        コマンドを預ける．同じ種類の未送信のコマンドがあれば上書きする．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類
+        value:object
+            コマンドの値
+        FrameID:int default=-1
+            コマンドの元になった検知のフレームの番号
+        FrameTime:float default=None
+            コマンドの元になったフレームを取得した時刻
+        '''
+        with self.Condition:
+            if key in self.Pending:
+                self.CoalescedCount += 1
+                pending = self.Pending.pop(key)[0]
+                if isinstance(value,dict):                      # まだ送信していない項目を残す
+                    value = dict(pending,**value)
+            self.DiscardOverlapping(key,value)
+            self.Pending[key]   = (value,time.perf_counter(),FrameID,FrameTime)
+            self.PostCount      += 1
+            if len(self.Pending) > self.MaxDepth:
+                self.MaxDepth = len(self.Pending)
+            self.Condition.notify()
+
+    def DiscardOverlapping(self,key,value):
+        '''
+        新しく預けるコマンドと同じ項目を持つ未送信のコマンドを捨てる．Conditionを取得してから呼び出す．
+
+        Parameters
+        ----------
+        key:string
+            新しく預けるコマンドの種類
+        value:object
+            新しく預けるコマンドの値
+        '''
+        if isinstance(value,dict):                              # stateより古いduty,LEDを捨てる
+            for field in value:
+                if field in self.Pending:
+                    del self.Pending[field]
+                    self.CoalescedCount += 1
+            return
+        for composite, (pending, posted, FrameID, FrameTime) in list(self.Pending.items()):
+            if isinstance(pending,dict) and key in pending:     # 古いstateから同じ項目を除く
+                pending = {field:v for field,v in pending.items() if field != key}
+                if len(pending) == 0:
+                    del self.Pending[composite]
+                else:
+                    self.Pending[composite] = (pending,posted,FrameID,FrameTime)
+                self.CoalescedCount += 1
+
+    def Flush(self,timeout=1.0):
+        '''
+        未送信のコマンドがなくなるまで待つ．
+
+        Parameters
+        ----------
+        timeout:float default=1.0
+            待つ最大の時間[s]
+
+        Returns
+        -------
+        ret:boolean
+            すべて送信し終えた場合True
+        '''
+        deadline = time.perf_counter()+timeout
+        with self.Condition:
+            while (len(self.Pending) > 0 or self.IsSending) and self.RunFlag:
+                remaining = deadline-time.perf_counter()
+                if remaining <= 0:
+                    return False
+                self.Condition.wait(remaining)
+            return len(self.Pending) == 0
+
+    def SendLoop(self):
+        '''
+        預けられたコマンドを送信し続ける．
+        '''
+        while True:
+            with self.Condition:
+                while len(self.Pending) == 0 and self.RunFlag:
+                    self.Condition.wait()
+                if len(self.Pending) == 0:
+                    break
+                commands        = self.Pending
+                self.Pending    = dict()
+                self.IsSending  = True
+            for key, (value, posted, FrameID, FrameTime) in commands.items():
+                self.Transmit(key,value,FrameID,FrameTime,posted)
+                latency = time.perf_counter()-posted
+                self.SentCount      += 1
+                self.TotalLatency   += latency
+                if latency > self.MaxLatency:
+                    self.MaxLatency = latency
+            with self.Condition:
+                self.IsSending = False
+                self.Condition.notify_all()
+
+    def GetCounters(self):
+        '''
+        送信の各カウンタを返す．
+
+        Returns
+        -------
+        PostCount:int
+            預けられたコマンドの数
+        SentCount:int
+            送信したコマンドの数
+        CoalescedCount:int
+            新しい値で上書きされて捨てられたコマンドの数
+        Depth:int
+            現在の未送信のコマンドの数
+        MaxDepth:int
+            未送信のコマンドの数の最大値
+        MeanLatency:float
+            預けてから送信が終わるまでの時間の平均[ms]
+        MaxLatency:float
+            預けてから送信が終わるまでの時間の最大値[ms]
+        '''
+        with self.Condition:
+            Depth = len(self.Pending)
+        MeanLatency = self.TotalLatency/self.SentCount*1000 if self.SentCount > 0 else 0.0
+        return self.PostCount,self.SentCount,self.CoalescedCount,Depth,self.MaxDepth,MeanLatency,self.MaxLatency*1000
+
+class Mini4WDActuatorState():
+    '''
+    ミニ四駆のアクチュエータ(duty比と左右のLED)に最後に送信した状態を覚えておき，
+    変わった項目だけを取り出すクラス．送信に失敗した項目は分からない状態に戻すので，
+    次に同じ値を指定したときにもう一度送信される．
+
+    Attributes
+    ----------
+    Fields:tuple context=string
+        アクチュエータの項目の名前
+    Masks:dict
+        項目の名前をキーとして，一度に送信するときに変わった項目を示すビット
+    State:dict
+        項目の名前をキーとして，最後に送信した値を持つ．分からない場合はNone
+    '''
+
+    Fields  = ('duty','rightLED','leftLED')
+    Masks   = {'duty':0x01,'rightLED':0x02,'leftLED':0x04}
+
+    def __init__(self):
+        self.State = dict.fromkeys(self.Fields)
+
+    def Diff(self,**fields):
+        '''
+        指定した値のうち，最後に送信した値と違う項目を取り出し，送信したものとして覚える．
+
+        Parameters
+        ----------
+        duty:float default=None
+            duty比．Noneなら変えない
+        rightLED:boolean default=None
+            右のLEDを点けるかどうか．Noneなら変えない
+        leftLED:boolean default=None
+            左のLEDを点けるかどうか．Noneなら変えない
+
+        Returns
+        -------
+        changed:dict
+            変わった項目と値
+        '''
+        changed = {key:value for key,value in fields.items() if value is not None and self.State[key] != value}
+        self.State.update(changed)
+        return changed
+
+    def Set(self,key,value):
+        '''
+        一つの項目を送信したものとして覚える．
+        '''
+        if key in self.State:
+            self.State[key] = value
+
+    def Invalidate(self,keys):
+        '''
+        送信に失敗した項目を分からない状態に戻す．
+
+        Parameters
+        ----------
+        keys:iterable context=string
+            送信に失敗した項目の名前
+        '''
+        for key in keys:
+            if key in self.State:
+                self.State[key] = None
+
+    def Get(self,key):
+        return self.State[key]
+
+    @classmethod
+    def Pack(cls,changed):
+        '''
+        変わった項目を一度に送信するための引数に変換する．
+
+        Parameters
+        ----------
+        changed:dict
+            Diffが返した変わった項目と値
+
+        Returns
+        -------
+        duty:float
+            duty比．変わっていなければ0
+        rightLED:boolean
+            右のLEDを点けるかどうか．変わっていなければFalse
+        leftLED:boolean
+            左のLEDを点けるかどうか．変わっていなければFalse
+        mask:int
+            変わった項目を示すビットの和
+        '''
+        mask = 0
+        for key in changed:
+            mask |= cls.Masks[key]
+        return float(changed.get('duty',0.0)),bool(changed.get('rightLED',False)),\
+                bool(changed.get('leftLED',False)),mask
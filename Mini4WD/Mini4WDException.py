@@ -110,3 +110,29 @@ class FailedCapturingBGSI(Exception):
 
     def main(self):
         return 'I am sorry. This program failed capturing back ground substractor.'
+
+class JVMStartFailed(Exception):
+    '''
+
+    Javaプログラムが起動の途中で終了した場合，もしくは
+    決められた時間内にエントリーポイントが応答しなかった場合に挙げられる例外
+    
+    '''
+    def __init__(self):
+        self.main()
+
+    def main(self):
+        return 'Java program did not become ready. Check the port number and the class path.'
+
+class UnknownSerialProtocol(Exception):
+    '''
+
+    ミニ四駆と直接通信する場合に，設定ファイルのSerialProtocolで
+    ミニ四駆側が受け付けるフレームの形式が指定されていなかった場合に挙げられる例外
+    
+    '''
+    def __init__(self):
+        self.main()
+
+    def main(self):
+        return 'SerialProtocol is not set. Set it to the frame format the Mini4WD firmware accepts.'
@@ -290,16 +290,20 @@ class Mini4WDGUI(wx.Frame):
 
     def OnOpenDutyMap(self,event):
         '''
-        メニューバーより，duty mapを保存したcsvファイルを開き，現在のduty mapに適用する．
+        メニューバーより，duty mapを保存したcsvファイル(または.npyファイル)を開き，現在のduty mapに適用する．
+        分割数が変わらない場合はパネルを作り直さずに表示だけを更新するので，検知中でも止めずに適用できる．
         '''
         self.dirname = ''
         with wx.FileDialog(self, "Choose a file", self.dirname, "", "*.*", wx.FD_OPEN) as dlg:
             dlg.SetDirectory('./dmap/')
             if dlg.ShowModal() == wx.ID_OK:
                 try:
+                    shape = self.M4DM.GetDutyMap().shape
+                    self.M4DM.ApplyFileWithDmap(dlg.GetPath())
+                    if self.M4DM.GetDutyMap().shape == shape:
+                        self.dp.RefreshDutyMap()
+                        return
                     self.bsV.Clear(True)
-                    
-                    self.M4DM.ApplyCSVFileWithDmap(dlg.GetPath())
                     self.dp = DutyPanel(self,self.M4DH,self.image)
                     bsH1=wx.BoxSizer(wx.HORIZONTAL)
                     # # make the first line that is in this frame
@@ -342,9 +346,9 @@ class Mini4WDGUI(wx.Frame):
     def OnSaveDutyMap(self,event):
         '''
         フレーム上部のSave as ...でduty mapを選択した際の処理．
-        現在表示しているdutymapをcsv形式で保存する．
+        現在表示しているdutymapをcsv形式で保存する．.npyを選んだ場合はバイナリ形式で保存する．
         '''
-        with wx.FileDialog(self, "Save duty map as csv file", wildcard="csv (*.csv)|*.csv",
+        with wx.FileDialog(self, "Save duty map as csv file", wildcard="csv (*.csv)|*.csv|npy (*.npy)|*.npy",
                             style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
 
             fileDialog.SetDirectory('./dmap/')
@@ -356,7 +360,10 @@ class Mini4WDGUI(wx.Frame):
             # save the current contents in the file
             pathname = fileDialog.GetPath()
             try:
-                self.M4DM.SaveDutyMapAsCSV(pathname)
+                if os.path.splitext(pathname)[1].lower() == '.npy':
+                    self.M4DM.SaveDutyMapAsBinary(pathname)
+                else:
+                    self.M4DM.SaveDutyMapAsCSV(pathname)
             except IOError:
                 wx.LogError("Cannot save current data in file '%s'." % pathname)
 
@@ -575,13 +582,27 @@ class DutyPanel():
         # もしミニ四駆の現在地点のduty比を変えたのならそれを反映する
         temp_x, temp_y = self.parent.GetM4DD().GetMini4WDLocation()
         if temp_x == x and temp_y == y and self.parent.GetM4DD().StartFlag == True:
-            self.M4DH.SendDutyRatio(duty/100)
+            self.M4DH.SendDutyCommand(duty/100)
 
         self.M4DM.SetDutyRatio(x, y, duty/100)                  # duty比をパーセントから比率に変える
         self.dutyMapImageWithText[y][x]=\
             self.WriteDutyMapImageWithText(duty/100, self.dutyMapImage[y][x].ConvertToBitmap())
         bt.SetBitmap(self.dutyMapImageWithText[y][x])           # bitmapの更新
 
+    def RefreshDutyMap(self):
+        '''
+        分割数が同じDutyMapを読み込んだときに，ボタンの画像とスライダーを新しいduty比に更新する．
+        '''
+        dutyMap = self.M4DM.GetDutyMap()
+        for i in range(len(dutyMap)):
+            for j in range(len(dutyMap[0])):
+                self.dutyMapImageWithText[i][j]=\
+                    self.WriteDutyMapImageWithText(dutyMap[i][j], self.dutyMapImage[i][j].ConvertToBitmap())
+                self.p1.GetButton(j,i).SetBitmap(self.dutyMapImageWithText[i][j])
+        bt = self.p1.GetFocusedButton()
+        if bt is not None:
+            self.ReflectButtonSelectionToP2Slider(bt.w,bt.h)
+
 class Panel1(wx.Panel):
     '''
     dp:DutyPanel
@@ -606,6 +627,7 @@ class Panel1(wx.Panel):
         self.backColor=wx.Colour(120,120,120)
         self.focusedButton = None
         self.gridBorder = 2
+        self.buttons = list()
 
     def ini_pannel(self,dp,dutyMapImageWithText,dh,dw):
         '''
@@ -637,12 +659,15 @@ class Panel1(wx.Panel):
         gs = wx.GridSizer(divmapH,divmapW,0,0)
 
         for i in range(divmapH):
+            temp = list()
             for j in range(divmapW):
                 bt      = wx.BitmapButton(self, wx.ID_ANY, bitmap=dutyMapImageWithText[i][j],size=(self.dw,self.dh))
                 bt.w    = j
                 bt.h    = i
+                temp.append(bt)
                 gs.Add(bt,flag=wx.ALL,border=self.gridBorder)
                 self.Bind(wx.EVT_BUTTON,self.OnButtonClick,bt)
+            self.buttons.append(temp)
 
         # self.Bind(wx.EVT_PAINT,self.OnPaint,self)
         self.Bind(wx.EVT_SET_FOCUS, self.OnSetFocus,self)
@@ -689,6 +714,12 @@ class Panel1(wx.Panel):
         '''
         return self.focusedButton
 
+    def GetButton(self,x,y):
+        '''
+        エリア(x,y)のボタンを返却する
+        '''
+        return self.buttons[y][x]
+
 class Panel2(wx.Panel):
     '''
     Parameters
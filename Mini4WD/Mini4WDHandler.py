@@ -1,8 +1,13 @@
-from py4j.java_gateway import JavaGateway, GatewayParameters
-from py4j.protocol import Py4JNetworkError
+from py4j.java_gateway import JavaGateway, GatewayParameters, CallbackServerParameters
+from py4j.protocol import Py4JNetworkError,Py4JError
 import subprocess,socket
+import os,time,threading
 import struct,serial
-from Mini4WDException import NoPortOpendeException,DutyRatioException,InvalidDutyMap
+import numpy as np
+from Mini4WDException import NoPortOpendeException,DutyRatioException,InvalidDutyMap,JVMStartFailed,UnknownSerialProtocol,NotAllowedValue
+from Mini4WDDispatcher import Mini4WDCommandDispatcher,Mini4WDActuatorState
+from Mini4WDLatency import Mini4WDLatencyRecorder
+from Mini4WDRateLimiter import Mini4WDDutyRateLimiter
 import csv
 
 class Mini4WDHandler():
@@ -13,8 +18,9 @@ class Mini4WDHandler():
     ----------
     M4DIr:Mini4WDInitializer
         システム初期化インスタンス(設定ファイルから値を呼び出し，書き込むインスタンス)
-    M4DJH:Mini4WDJavaHandler
-        Javaと通信を行うためのハンドラー
+    M4DJH:Mini4WDJavaHandler or Mini4WDSerialHandler
+        Javaと通信を行うためのハンドラー．設定ファイルのMini4WDTransportがserialの場合は
+        ミニ四駆と直接通信するハンドラー
     X:int
         ミニ四駆のXエリア
     Y:int
@@ -25,15 +31,35 @@ class Mini4WDHandler():
         DutyMapの横の分割数
     InitializeDutyRatio:float
             DutyMapにおける初期化時の初期値
-    DutyMap:array-like
-        指定された分割数とduty比に基づいてDuty比を記録するマップ(二次元配列)
+    M4DM:Mini4WDDutyMap
+        エリアごとのDuty比を記録するマップ．設定ファイルのCSVFilePathから読み込む(拡張子が.npyならバイナリ形式)．
+        DutyMapReloadIntervalが正なら，その間隔でファイルの更新を調べて読み込み直す
     app:entry_Point
         Javaプログラムのインスタンス
+    M4DCD:Mini4WDCommandDispatcher, default=None
+        コマンドを別スレッドで送信するインスタンス．
+        Noneならば呼び出したスレッドでそのまま送信する
+    M4DAS:Mini4WDActuatorState
+        最後に送信したduty比と左右のLEDの状態
+    M4DRL:Mini4WDDutyRateLimiter, default=None
+        補間したduty比を毎フレーム受け取る場合に送信の回数を抑えるインスタンス．
+        設定ファイルのDutyInterpolationが0ならNone
+    BatchedCommand:boolean
+        送信先がduty比と左右のLEDを一度に受け取るSendActuatorStateを持つかどうか．
+        直接通信する場合は常に真，Javaプログラムの場合は設定ファイルのM4DSBatchedCommandで指定する．
+        指定したJavaプログラムがSendActuatorStateを持たない場合は起動時にNotAllowedValueを投げる
+    Suffix:string
+        複数台のミニ四駆を制御する場合に，このミニ四駆の設定の名前に付ける接尾辞．
+        例えば2台目は'_2'として，Mini4WDPortName_2やCSVFilePath_2を読み込む．
+        接尾辞の付いた設定がなければ接尾辞のない設定を使う．
+        ただし送信先のポート(ChannelKeys)は2台目以降も必ず指定し，他のミニ四駆と重ならないようにする
 
     Throws
     ------
     KeyError:
-        settingファイルの構文が間違っている
+        settingファイルの構文が間違っている．もしくは2台目以降の送信先のポートが指定されていない
+    NotAllowedValue:
+        送信先のポートが他のミニ四駆と同じ
 
     Attension
     ---------
@@ -48,13 +74,17 @@ class Mini4WDHandler():
 
     '''
 
-    def __init__(self,Mini4WDLogger):
+    ChannelKeys = ('M4DSPortNum','Mini4WDPortName','SensorCallbackPort')    # 2台目以降も接尾辞付きで必ず指定する設定
+
+    def __init__(self,Mini4WDLogger,Suffix=''):
         '''
 
         Parameters
         ----------
         Mini4WDDetector:Mini4WDDetector()
             クラスMini4WDDetectorのインスタンス
+        Suffix:string default=''
+            このミニ四駆の設定の名前に付ける接尾辞
         Error
             ポートが使えないというエラー
             もしくは指定されたワークスペースが間違っている
@@ -63,28 +93,126 @@ class Mini4WDHandler():
         
         self.M4DL                   = Mini4WDLogger
         self.M4DIr                  = self.M4DL.GetM4DIr()
-        self.M4DJH                  = Mini4WDJavaHandler(self.M4DIr.GetFileValue('M4DSClassPath'),\
+        self.Suffix                 = Suffix
+        self.CheckChannels()                                                # Javaプログラムを起動する前に確かめる
+        self.BatchedCommand         = bool(int(self.M4DIr.GetFileValue('M4DSBatchedCommand','0')))
+        if self.GetCarValue('Mini4WDTransport','py4j') == 'serial':
+            self.BatchedCommand     = True
+            self.M4DJH              = Mini4WDSerialHandler(self.GetCarValue('Mini4WDPortName'),\
+                                        self.M4DIr.GetFileValue('BaundRate'),\
+                                        bool(int(self.M4DIr.GetFileValue('SerialAcknowledge','0'))),\
+                                        Protocol=self.GetCarValue('SerialProtocol','none'))
+        else:
+            self.M4DJH              = Mini4WDJavaHandler(self.M4DIr.GetFileValue('M4DSClassPath'),\
                                         self.M4DIr.GetFileValue('M4DSClassName'),\
-                                        self.M4DIr.GetFileValue('M4DSPortNum'),\
-                                        self.M4DIr.GetFileValue('Mini4WDPortName'),\
-                                        self.M4DL.GetLogFileName())
+                                        self.GetCarValue('M4DSPortNum'),\
+                                        self.GetCarValue('Mini4WDPortName'),\
+                                        self.M4DL.GetLogFileName()+self.Suffix,\
+                                        float(self.M4DIr.GetFileValue('JVMStartTimeout','10')),\
+                                        self.M4DL,\
+                                        bool(int(self.M4DIr.GetFileValue('M4DSReuseBridge','0'))),\
+                                        int(self.GetCarValue('SensorCallbackPort','0')) if self.M4DL.GetM4DSL() is not None else 0)
         self.X                      = 0
         self.Y                      = 0
         self.DivMapH                = 0
         self.DivMapW                = 0
         self.InitializeDutyRatio    = float(self.M4DIr.GetFileValue('InitializeDutyRatio'))
         self.M4DM                   = Mini4WDDutyMap(self)
-        self.M4DM.ApplyCSVFileWithDmap(self.M4DIr.GetFileValue('CSVFilePath'))
+        self.M4DM.ApplyFileWithDmap(self.GetCarValue('CSVFilePath'))
+        if float(self.M4DIr.GetFileValue('DutyMapReloadInterval','0')) > 0:
+            self.M4DM.StartWatching(float(self.M4DIr.GetFileValue('DutyMapReloadInterval','0')))
         self.app                    = self.M4DJH.GetApp()
+        self.CheckBatchedCommand()
         self.currentDutyRatio       = 0
+        self.M4DAS                  = Mini4WDActuatorState()
+        self.M4DRL                  = self.CreateRateLimiter()
+        self.M4DCD                  = None
+        self.M4DLR                  = None
+        if int(self.M4DIr.GetFileValue('CommandLatencyLog','0')):
+            self.M4DLR              = Mini4WDLatencyRecorder(self.M4DL.GetLogFileName()+self.Suffix,\
+                                        float(self.M4DIr.GetFileValue('LatencyHistogramBinWidth','1.0')),\
+                                        Report=self.M4DL.WriteOperationLog,\
+                                        ReportInterval=float(self.M4DIr.GetFileValue('LatencyHistogramLogInterval','10')))
+        if int(self.M4DIr.GetFileValue('AsyncDispatch','0')):
+            self.M4DCD              = Mini4WDCommandDispatcher(self.TransmitCommand)
+            self.M4DCD.Start()
 
     def __del__(self):
         '''
         ミニ四駆を停止させる．
         '''
-        self.offRightLED()
-        self.offLeftLED()
-        self.SendDutyCommand(0)
+        if not hasattr(self,'M4DM'):                                        # 初期化の途中で失敗した場合
+            return
+        self.M4DM.StopWatching()
+        self.StopCar()
+        self.StopDispatcher()                                               # 停止のコマンドを送信し終えてから止める
+        self.StopLatencyRecorder()
+
+    def StopCar(self):
+        '''
+        最後に送信した状態に関係なく，duty比を0にして左右のLEDを消すコマンドを送信する．
+        SendActuatorStateは変わった項目だけを送信するので，最後に送信した状態が
+        既に停止になっていると(送信に失敗した場合も含めて)何も送信しない．
+        '''
+        self.M4DAS.Invalidate(Mini4WDActuatorState.Fields)
+        self.SendActuatorState(0,False,False)
+
+    def CheckBatchedCommand(self):
+        '''
+        M4DSBatchedCommandが1の場合に，Javaプログラムのエントリーポイントが
+        SendActuatorStateを持つことを確かめる．持たないJavaプログラムに一度に送信すると
+        全てのコマンドが失敗し，ミニ四駆を操作できない．
+
+        Throws
+        ------
+        NotAllowedValue:
+            エントリーポイントがSendActuatorStateを持たない場合
+        '''
+        if not self.BatchedCommand or self.M4DJH.HasMethod('SendActuatorState'):
+            return
+        print('JavaプログラムがSendActuatorStateを持ちません．M4DSBatchedCommandを0にしてください')
+        raise NotAllowedValue
+
+    def CreateRateLimiter(self):
+        '''
+        設定ファイルのDutyInterpolationが1なら，補間したduty比の送信の回数を抑えるインスタンスを作る．
+
+        Returns
+        -------
+        M4DRL:Mini4WDDutyRateLimiter or None
+            送信の回数を抑えるインスタンス．補間しない場合はNone
+        '''
+        if not int(self.M4DIr.GetFileValue('DutyInterpolation','0')):
+            return None
+        return Mini4WDDutyRateLimiter(float(self.M4DIr.GetFileValue('DutyChangeThreshold','0.02')),\
+                float(self.M4DIr.GetFileValue('DutyMinInterval','0.1')))
+
+    def StopDispatcher(self):
+        '''
+        未送信のコマンドを送信してから送信のスレッドを停止し，
+        送信の各カウンタを操作ログに記録する．
+        '''
+        if self.M4DCD is None:
+            return
+        self.M4DCD.Stop()
+        self.M4DL.WriteOperationLog(\
+            'Command dispatcher : posted {} , sent {} , coalesced {} , depth {} (max {}) , latency {:.1f} ms (max {:.1f} ms)'\
+            .format(*self.M4DCD.GetCounters()))
+        self.M4DCD = None
+
+    def StopLatencyRecorder(self):
+        '''
+        コマンドの記録をファイルに書き込んで閉じ，
+        送信にかかった時間の統計とヒストグラムを操作ログに記録する．
+        '''
+        if self.M4DLR is None:
+            return
+        self.M4DLR.Close()
+        self.M4DL.WriteOperationLog(self.M4DLR.FormatHistogram())
+        self.M4DL.WriteOperationLog(\
+            'Command latency : {} commands , failed {} , p50 {:.0f} ms , p95 {:.0f} ms , p99 {:.0f} ms , max {:.1f} ms'\
+            .format(*self.M4DLR.GetCounters()))
+        self.M4DLR = None
 
     def InitializeDutyMap(self,InitializeDutyRatio=0):
         '''
@@ -164,11 +292,12 @@ class Mini4WDHandler():
             sock.close() #socket.connect_ex は成功すると0を返す
         raise NoPortOpendeException
 
-    def LocationChangeEventListner(self,X,Y):
+    def LocationChangeEventListner(self,X,Y,DutyRatio=None,FrameID=-1,FrameTime=None):
         '''
         
         ミニ四駆のエリアの変化を検知したら呼び出されるイベントリスナー
         Mini4駆が存在するエリアにおけるDuty比を送信する
+        duty比を補間する場合は毎フレーム呼び出され，M4DRLが許した場合だけ送信する
         
         Parameters
         ----------
@@ -176,26 +305,155 @@ class Mini4WDHandler():
             Duty比を変えるエリアのX
         Y:int
             Duty比を変えるエリアのY
+        DutyRatio:float default=None
+            すでに求めてあるそのエリアのDuty比．NoneならDutyMapから取り出す
+        FrameID:int default=-1
+            エリアの変化を検知したフレームの番号
+        FrameTime:float default=None
+            エリアの変化を検知したフレームを取得した時刻(time.perf_counter)
         '''
-        newDutyRatio = self.M4DM.GetDutyRatio(X,Y)
+        newDutyRatio = self.M4DM.GetDutyRatio(X,Y) if DutyRatio is None else DutyRatio
+        if self.M4DRL is not None and not self.M4DRL.Accept(newDutyRatio,\
+            time.perf_counter() if FrameTime is None else FrameTime):
+            return
         if newDutyRatio != self.currentDutyRatio:
-            self.SendDutyCommand(newDutyRatio)
+            self.SendDutyCommand(newDutyRatio,FrameID,FrameTime)
             self.currentDutyRatio = newDutyRatio
         
-    def SendDutyCommand(self,dutyRatio):
+    def SendDutyCommand(self,dutyRatio,FrameID=-1,FrameTime=None):
         '''
         
-        Duty比をMini4WDに送信する
+        Duty比をMini4WDに送信する．
+        送信のスレッドがある場合は預けてすぐに戻る．
 
         Parameters
         ----------
         DutyRatio:float
             指定したDuty比を送信する
+        FrameID:int default=-1
+            送信の元になった検知のフレームの番号
+        FrameTime:float default=None
+            送信の元になったフレームを取得した時刻
+        '''
+        self.PostCommand('duty',dutyRatio,FrameID,FrameTime)
+
+    def SendActuatorState(self,dutyRatio=None,rightLED=None,leftLED=None,FrameID=-1,FrameTime=None):
+        '''
+        duty比と左右のLEDのうち，最後に送信した状態から変わった項目だけを一度に送信する．
+        送信先がSendActuatorStateを持たない場合は変わった項目を一つずつ送信する．
+
+        Parameters
+        ----------
+        dutyRatio:float default=None
+            duty比．Noneなら変えない
+        rightLED:boolean default=None
+            右のLEDを点けるかどうか．Noneなら変えない
+        leftLED:boolean default=None
+            左のLEDを点けるかどうか．Noneなら変えない
+        FrameID:int default=-1
+            送信の元になった検知のフレームの番号
+        FrameTime:float default=None
+            送信の元になったフレームを取得した時刻
+
+        Returns
+        -------
+        ret:boolean
+            変わった項目があって送信した場合True
+        '''
+        changed = self.M4DAS.Diff(duty=dutyRatio,rightLED=rightLED,leftLED=leftLED)
+        if len(changed) == 0:
+            return False
+        if 'duty' in changed:
+            self.currentDutyRatio = changed['duty']
+        self.PostCommand('state',changed,FrameID,FrameTime)
+        return True
+
+    def PostCommand(self,key,value,FrameID=-1,FrameTime=None):
+        '''
+        コマンドを送信のスレッドに預ける．送信のスレッドがない場合はそのまま送信する．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類(duty,rightLED,leftLED)
+        value:object
+            duty比もしくはLEDを点けるかどうか
+        FrameID:int default=-1
+            コマンドの元になった検知のフレームの番号
+        FrameTime:float default=None
+            コマンドの元になったフレームを取得した時刻
+        '''
+        self.M4DAS.Set(key,value)
+        if self.M4DCD is not None:
+            self.M4DCD.Post(key,value,FrameID,FrameTime)
+        else:
+            self.TransmitCommand(key,value,FrameID,FrameTime,time.perf_counter())
+
+    def TransmitCommand(self,key,value,FrameID=-1,FrameTime=None,PostTime=None):
+        '''
+        コマンドをJavaプログラムに送信し，送信にかかった時間を記録する．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類(duty,rightLED,leftLED)
+        value:object
+            duty比もしくはLEDを点けるかどうか
+        FrameID:int default=-1
+            コマンドの元になった検知のフレームの番号
+        FrameTime:float default=None
+            コマンドの元になったフレームを取得した時刻
+        PostTime:float default=None
+            コマンドを預けた時刻．Noneなら送信を始めた時刻とする
+        '''
+        SendTime    = time.perf_counter()
+        succeeded   = self.SendToApp(key,value)
+        if not succeeded:                                   # 次に同じ値を指定したときにもう一度送信する
+            self.M4DAS.Invalidate(value.keys() if key == 'state' else (key,))
+        if self.M4DLR is not None:
+            self.M4DLR.Record(key,value,FrameID,FrameTime,SendTime if PostTime is None else PostTime,\
+                SendTime,time.perf_counter(),succeeded)
+
+    def SendToApp(self,key,value):
+        '''
+        コマンドをJavaプログラムのエントリーポイントに送信する．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類(duty,rightLED,leftLED,state)
+        value:object
+            duty比もしくはLEDを点けるかどうか．stateなら変わった項目のdict
+
+        Returns
+        -------
+        ret:boolean
+            送信に成功した場合True
         '''
+        if key == 'state' and not self.BatchedCommand:      # 一つずつ送信する
+            succeeded = True
+            for field, v in value.items():
+                succeeded = self.SendToApp(field,v) and succeeded
+            return succeeded
         try:
-            self.app.SendDutyCommand(dutyRatio)
+            if key == 'state':
+                self.app.SendActuatorState(*Mini4WDActuatorState.Pack(value))
+            elif key == 'duty':
+                self.app.SendDutyCommand(value)
+            elif key == 'rightLED':
+                if value:
+                    self.app.onRightLED()
+                else:
+                    self.app.offRightLED()
+            elif key == 'leftLED':
+                if value:
+                    self.app.onLeftLED()
+                else:
+                    self.app.offLeftLED()
         except Exception as e:
             print(e)
+            return False
+        return True
 
     def SetDivMapH(self, h):
         self.DivMapH = h
@@ -212,63 +470,199 @@ class Mini4WDHandler():
     def GetM4DL(self):
         return self.M4DL
 
+    def GetCarValue(self,key,default=None):
+        '''
+        このミニ四駆の設定を読み込む．接尾辞の付いた設定がなければ接尾辞のない設定を読み込む．
+
+        Parameters
+        ----------
+        key:string
+            接尾辞のない設定の名前
+        default:string default=None
+            どちらの設定もない場合の値．NoneならKeyErrorを投げる
+        '''
+        if self.Suffix != '' and key in self.ChannelKeys:
+            if key+self.Suffix not in self.M4DIr.SettingDict:
+                print('{}{}が指定されていません．2台目以降のミニ四駆も送信先のポートを指定してください'.format(key,self.Suffix))
+            return self.M4DIr.GetFileValue(key+self.Suffix)              # 1台目のポートは使わない
+        if self.Suffix != '' and key+self.Suffix in self.M4DIr.SettingDict:
+            return self.M4DIr.GetFileValue(key+self.Suffix)
+        return self.M4DIr.GetFileValue(key,default)
+
+    def CheckChannels(self):
+        '''
+        複数台のミニ四駆を制御する場合に，このミニ四駆の送信先のポートが
+        指定されていて，他のミニ四駆と重なっていないことを確かめる．
+        同じポートを使うと，2台目のJavaプログラムが1台目のJavaプログラムに接続してしまい，
+        どちらのハンドラーも1台目のミニ四駆を動かすことになる．
+
+        Throws
+        ------
+        KeyError:
+            2台目以降のミニ四駆の送信先のポートが指定されていない場合
+        NotAllowedValue:
+            送信先のポートが他のミニ四駆と同じ場合
+        '''
+        CarCount = int(self.M4DIr.GetFileValue('CarCount','1'))
+        if CarCount <= 1:
+            return
+        for key in self.ChannelKeys:
+            if key == 'SensorCallbackPort' and self.M4DL.GetM4DSL() is None:
+                continue
+            value = self.GetCarValue(key,'0')
+            if key == 'SensorCallbackPort' and int(value) <= 0:
+                continue
+            for i in range(1,CarCount+1):
+                suffix = '' if i == 1 else '_{}'.format(i)
+                if suffix != self.Suffix and self.M4DIr.SettingDict.get(key+suffix) == value:
+                    print('{}{}と{}{}が同じ{}です．ミニ四駆ごとに別のポートを指定してください'\
+                        .format(key,self.Suffix,key,suffix,value))
+                    raise NotAllowedValue
+
+    def GetSuffix(self):
+        return self.Suffix
+
+    def GetM4DRL(self):
+        return self.M4DRL
+
+    def GetCommandLatency(self):
+        '''
+        フレームの取得からコマンドの送信が終わるまでの時間の中央値を返す．
+        まだ記録がない場合は0を返す．
+
+        Returns
+        -------
+        latency:float
+            フレームの取得からコマンドの送信が終わるまでの時間[s]
+        '''
+        if self.M4DLR is None or self.M4DLR.Count == 0:
+            return 0.0
+        return self.M4DLR.GetPercentile(50)/1000
+
     def onRightLED(self):
-        try:
-            self.app.onRightLED()
-        except Py4JNetworkError as e:
-            print(e)
+        self.PostCommand('rightLED',True)
 
     def offRightLED(self):
-        try:
-            self.app.offRightLED()
-        except Py4JNetworkError as e:
-            print(e)
+        self.PostCommand('rightLED',False)
 
     def onLeftLED(self):
-        try:
-            self.app.onLeftLED()
-        except Py4JNetworkError as e:
-            print(e)
+        self.PostCommand('leftLED',True)
 
     def offLeftLED(self):
-        try:
-            self.app.offLeftLED()
-        except Py4JNetworkError as e:
-            print(e)
+        self.PostCommand('leftLED',False)
 
 class Mini4WDDutyMap():
+    '''
+    Attributes
+    ----------
+    DutyMap:array_like
+        エリアごとのduty比を持つ二次元配列(float32)．
+        変更するときは新しい配列を作ってから差し替えるので，
+        GetDutyMapで受け取った配列が途中で書き換わることはない
+    Version:int
+        DutyMapが変更されるたびに増える版の番号．
+        Mini4WDLocationTableが表を作り直すかどうかの判断に使う．
+        DutyMapを差し替えた後に増やす
+    FilePath:string or None
+        最後に読み込んだDutyMapのファイルのパス
+    FileTime:float
+        最後に読み込んだときのファイルの更新時刻
+    Lock:threading.Lock
+        DutyMapを差し替える処理を一つずつ行うためのロック
+    WatchThread:threading.Thread or None
+        ファイルが更新されたら読み込み直すスレッド
+    '''
     def __init__(self,M4DH):
-        self.DutyMap=list()
-        self.M4DH = M4DH
-   
+        self.DutyMap        = np.zeros((0,0),dtype=np.float32)
+        self.M4DH           = M4DH
+        self.Version        = 0
+        self.FilePath       = None
+        self.FileTime       = 0.0
+        self.Lock           = threading.Lock()
+        self.WatchFlag      = False
+        self.WatchThread    = None
+
+    @staticmethod
+    def Validate(DutyMap):
+        '''
+        DutyMapとして使えるかどうかをまとめて調べ，float32の二次元配列にして返す．
+
+        Parameters
+        ----------
+        DutyMap:array_like
+            調べる二次元配列
+
+        Returns
+        -------
+        DutyMap:array_like
+            float32の二次元配列
+
+        Throws
+        ------
+        InvalidDutyMap:
+            二次元でないか，空か，数値でない値を含む場合
+        DutyRatioException:
+            Duty比が1より大きいか-1より小さい値を含む場合
+        '''
+        try:
+            DutyMap = np.array(DutyMap,dtype=np.float32)
+        except ValueError:
+            raise InvalidDutyMap
+        if DutyMap.ndim != 2 or DutyMap.size == 0 or not np.isfinite(DutyMap).all():
+            raise InvalidDutyMap
+        if (np.abs(DutyMap) > 1).any():
+            raise DutyRatioException
+        return DutyMap
+
+    def Swap(self,DutyMap,filepath=None):
+        '''
+        調べ終わったDutyMapに差し替えて版の番号を増やす．
+        検知の途中で呼び出しても，次のフレームから新しいDutyMapが使われる．
+
+        Parameters
+        ----------
+        DutyMap:array_like
+            Validateを通したfloat32の二次元配列
+        filepath:string default=None
+            DutyMapを読み込んだファイルのパス
+        '''
+        with self.Lock:
+            self.DutyMap    = DutyMap
+            self.M4DH.SetDivMapH(DutyMap.shape[0])
+            self.M4DH.SetDivMapW(DutyMap.shape[1])
+            if filepath is not None:
+                self.FilePath   = filepath
+                self.FileTime   = os.path.getmtime(filepath)
+            self.Version    += 1
+
+    def ApplyFileWithDmap(self,filepath):
+        '''
+        拡張子が.npyならバイナリ形式，それ以外はcsv形式のDutyMapを読み込んで適用する．
+        '''
+        if os.path.splitext(filepath)[1].lower() == '.npy':
+            self.ApplyBinaryFileWithDmap(filepath)
+        else:
+            self.ApplyCSVFileWithDmap(filepath)
+
     def ApplyCSVFileWithDmap(self,filepath):
-        self.DutyMap=list()
-        Flag = True
         with open(filepath, newline='') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                w = len(row)
-                if Flag:
-                    pw = w
-                    Flag = False
-                
-                if w != pw:
-                    raise InvalidDutyMap
-
-                temp = list()
-                for value in row:
-                    DutyRatio = float(value)
-                    temp.append(DutyRatio)
-                    if DutyRatio > 1 or DutyRatio < -1:
-                        raise DutyRatioException
-
-                self.DutyMap.append(temp)
-            print(pw,reader.line_num)
-            self.M4DH.SetDivMapW(pw)                # pwは一列目のduty比の数
-            self.M4DH.SetDivMapH(reader.line_num)   # line_numはreaderが今まで読み込んだ行数
+            rows = [row for row in csv.reader(f) if len(row) > 0]
+        if len(rows) == 0 or any(len(row) != len(rows[0]) for row in rows):
+            raise InvalidDutyMap
+        self.Swap(self.Validate(rows),filepath)
+
+    def ApplyBinaryFileWithDmap(self,filepath):
+        '''
+        SaveDutyMapAsBinaryで保存したバイナリ形式(.npy)のDutyMapを読み込んで適用する．
+        '''
+        try:
+            DutyMap = np.load(filepath,allow_pickle=False)
+        except ValueError:
+            raise InvalidDutyMap
+        self.Swap(self.Validate(DutyMap),filepath)
 
     def GetDutyRatio(self,X,Y):
-        return self.DutyMap[Y][X]
+        return float(self.DutyMap[Y,X])
 
     def GetDutyMap(self):
         '''
@@ -277,7 +671,7 @@ class Mini4WDDutyMap():
         Returns
         -------
         DutyMap:array_like
-            duty比が入ったマップ
+            duty比が入ったマップ．書き換えてはいけない
 
         '''
         return self.DutyMap
@@ -306,13 +700,77 @@ class Mini4WDDutyMap():
         '''
         if DutyRatio > 1 or DutyRatio < -1:
             raise DutyRatioException
-        else:
-            self.DutyMap[Y][X] = DutyRatio
+        with self.Lock:
+            DutyMap         = self.DutyMap.copy()
+            DutyMap[Y,X]    = DutyRatio
+            self.DutyMap    = DutyMap
+            self.Version    += 1
+
+    def GetVersion(self):
+        '''
+        DutyMapの版の番号を返す
+
+        Returns
+        -------
+        Version:int
+            DutyMapが変更されるたびに増える番号
+        '''
+        return self.Version
 
     def SaveDutyMapAsCSV(self,filepath):
         with open(filepath, 'wt', newline='') as f:
             writer = csv.writer(f)
-            writer.writerows(self.DutyMap)
+            writer.writerows([['{:g}'.format(value) for value in row] for row in self.DutyMap])
+
+    def SaveDutyMapAsBinary(self,filepath):
+        '''
+        DutyMapをバイナリ形式(.npy)で保存する．
+        監視しているファイルを書き換えても読み込み途中にならないように，
+        一時ファイルに書いてから置き換える．
+        '''
+        temp = filepath+'.tmp'
+        with open(temp,'wb') as f:
+            np.save(f,self.DutyMap,allow_pickle=False)
+        os.replace(temp,filepath)
+
+    def StartWatching(self,Interval):
+        '''
+        最後に読み込んだファイルをInterval秒ごとに調べ，更新されていたら読み込み直すスレッドを始める．
+        検知を止めずに周回の合間に新しいDutyMapを適用するために使う．
+        読み込めなかった場合は今のDutyMapのままとする．
+
+        Parameters
+        ----------
+        Interval:float
+            ファイルを調べる間隔[s]
+        '''
+        if self.WatchThread is not None:
+            return
+        self.WatchFlag      = True
+        self.WatchThread    = threading.Thread(target=self.Watch,args=(float(Interval),),daemon=True)
+        self.WatchThread.start()
+
+    def Watch(self,Interval):
+        while self.WatchFlag:
+            time.sleep(Interval)
+            if self.FilePath is None:
+                continue
+            try:
+                FileTime = os.path.getmtime(self.FilePath)
+                if FileTime == self.FileTime:
+                    continue
+                self.FileTime = FileTime                    # 読み込めなくても次に更新されるまでは読み込まない
+                self.ApplyFileWithDmap(self.FilePath)
+                self.M4DH.GetM4DL().WriteOperationLog('Duty map reloaded : {} (version {})'\
+                    .format(self.FilePath,self.Version))
+            except Exception as e:
+                print(e)
+
+    def StopWatching(self):
+        self.WatchFlag = False
+        if self.WatchThread is not None:
+            self.WatchThread.join()
+            self.WatchThread = None
 
 class Mini4WDJavaHandler():
     '''
@@ -321,11 +779,20 @@ class Mini4WDJavaHandler():
     Parameters
     ----------
     Process:subprocess.Popen
-        サブプロセスのインスタンス
+        サブプロセスのインスタンス．既に動いているJavaプログラムに接続した場合はNone
+    ReuseBridge:boolean
+        Javaプログラムを使いまわすかどうか．真の場合は同じポートで動いている
+        Javaプログラムがあればそれに接続し，なければPythonのプロセスが終了しても
+        動き続けるように起動する．StopJavaでは停止させないので，
+        停止させる場合はShutdownBridgeを呼び出す
+    SensorCallbackPort:int
+        Javaプログラムからセンサーの値を受け取るコールバックサーバのポート番号．
+        0ならコールバックサーバを起動しない．起動した場合はMini4WDLoggerを
+        Pythonのエントリーポイントとして公開し，JavaプログラムはAppendSensorBatchを呼び出す
 
     '''
 
-    def __init__(self,ClassPath='',ClassName='',PortNum=25333,PortName='COM4',LogFileName=''):
+    def __init__(self,ClassPath='',ClassName='',PortNum=25333,PortName='COM4',LogFileName='',StartTimeout=10.0,Mini4WDLogger=None,ReuseBridge=False,SensorCallbackPort=0):
         '''
 
         Parameters
@@ -340,12 +807,20 @@ class Mini4WDJavaHandler():
             通信を行うポート番号
         PortName:String default='COM4'
             ミニ四駆と通信を行うBluetoothのポートの名前
+        StartTimeout:float default=10.0
+            エントリーポイントが応答するまで待つ最大の時間[s]
+        Mini4WDLogger:Mini4WDLogger default=None
+            起動にかかった時間を記録するロガー．Noneなら記録しない
+        ReuseBridge:boolean default=False
+            Javaプログラムを使いまわすかどうか
+        SensorCallbackPort:int default=0
+            センサーの値を受け取るコールバックサーバのポート番号．0なら起動しない
 
         Throws
         ------
-        Error
-            ポートが使えないというエラー
-            もしくは指定されたワークスペースが間違っている
+        JVMStartFailed
+            Javaプログラムが途中で終了した(ポートが使えないなど)，
+            もしくはStartTimeout以内に応答しなかった
 
         '''
         self.ClassPath  = ClassPath
@@ -353,7 +828,13 @@ class Mini4WDJavaHandler():
         self.PortNum    = PortNum
         self.PortName   = PortName
         self.LogFileName = LogFileName
+        self.StartTimeout = float(StartTimeout)
+        self.M4DL       = Mini4WDLogger
+        self.ReuseBridge = ReuseBridge
+        self.SensorCallbackPort = int(SensorCallbackPort)
         self.Process    = None
+        self.Gateway    = None
+        self.app        = None
         self.StartJava()
     
     def __del__(self):
@@ -364,32 +845,197 @@ class Mini4WDJavaHandler():
 
     def StartJava(self):
         '''
-        指定したポートナンバーで，指定されたJavaプログラムを起動する
+        指定したポートナンバーで，指定されたJavaプログラムを起動する．
+        固定の時間待つのではなく，エントリーポイントが応答するまで
+        間隔を少しずつ延ばしながら問い合わせ，応答した時点で接続を終える．
+        ReuseBridgeが真の場合は，既に応答するJavaプログラムがあれば起動せずに接続する．
 
         Throws
         ------
-        Error
-            ポートが使えないというエラー
-            もしくは指定されたワークスペースが間違っている
+        JVMStartFailed
+            Javaプログラムが途中で終了した(ポートが使えないなど)，
+            もしくはStartTimeout以内に応答しなかった
         '''
 
+        start           = time.perf_counter()
+        self.Gateway    = self.CreateGateway()                                                     # connect to the JVM
+        if self.ReuseBridge and self.IsReady():
+            self.app    = self.Gateway.entry_point
+            elapsed     = (time.perf_counter()-start)*1000
+            print('動いているJavaプログラムに接続しました！ ({:.0f} ms)'.format(elapsed))
+            if self.M4DL is not None:
+                self.M4DL.WriteOperationLog('JVM attached : {:.0f} ms'.format(elapsed))
+            self.SwitchLogFile()
+            return
+
+        if self.IsListening():
+            # 別のプログラム(前回止め損ねたJavaプログラムなど)がポートを使っている．
+            # 起動してもポートを使えずに終了し，問い合わせには別のプログラムが応答してしまう
+            print('ポート{}は既に使われています．前回のJavaプログラムが残っていないか確かめてください'.format(self.PortNum))
+            self.CloseGateway()
+            raise JVMStartFailed
+
         # クラスパスを指定して実行
         print('Javaプログラムを始動します')
         args=(["java","-classpath",self.ClassPath,self.ClassName,str(self.PortNum),self.PortName,self.LogFileName])
         print(args)
-        self.Process=subprocess.Popen(args)
+        if self.ReuseBridge:
+            self.Process = subprocess.Popen(args,**self.GetDetachedOptions())
+        else:
+            self.Process = subprocess.Popen(args)
+        if not self.WaitUntilReady(start+self.StartTimeout):
+            # 使いまわす場合でも，応答しなかったJavaプログラムは残さずに止める
+            self.CloseGateway()
+            self.Process.kill()
+            self.Process.wait()
+            self.Process = None
+            raise JVMStartFailed
+        self.app        = self.Gateway.entry_point
+        elapsed         = (time.perf_counter()-start)*1000
+        print('Javaプログラムを正常に始動しました！ ({:.0f} ms)'.format(elapsed))
+        if self.M4DL is not None:
+            self.M4DL.WriteOperationLog('JVM ready : {:.0f} ms'.format(elapsed))
+
+    def SwitchLogFile(self):
+        '''
+        接続した既に動いているJavaプログラムに，このセッションのCSVファイルへ切り替えさせる．
+        Javaプログラムは起動したときのCSVファイルに書き込み続けるので，
+        切り替えられなかった場合は書き込み中のCSVファイルが別のセッションのものであることを操作ログに残す．
 
+        Returns
+        -------
+        ret:boolean
+            切り替えた場合True
+        '''
         try:
-            self.Process.wait(timeout=3)        #JVMが起動するまで待つ
-        except subprocess.TimeoutExpired as e:  #この例外は必ず発生する
-            pass
-        except Exception:
-            self.Process.kill()
-            return(Exception)
-        Gateway                 = JavaGateway(gateway_parameters=GatewayParameters(port=int(self.PortNum)))  # connect to the JVM
-        app                     = Gateway.entry_point
-        self.app                = app
-        print('Javaプログラムを正常に始動しました！')
+            self.app.SetLogFileName(self.LogFileName)
+            switched = True
+        except Py4JError:                           # SetLogFileNameを持たない古いJavaプログラム
+            switched = False
+        if switched:
+            message = 'JVM CSV log : {}'.format(self.LogFileName)
+        else:
+            message = 'JVM CSV log : not switched , still writing the file of the session that started the JVM'
+        print(message)
+        if self.M4DL is not None:
+            self.M4DL.WriteOperationLog(message)
+        return switched
+
+    @staticmethod
+    def GetDetachedOptions():
+        '''
+        Pythonのプロセスが終了しても動き続けるように子プロセスを起動するための
+        subprocess.Popenの引数を返す．
+
+        Returns
+        -------
+        options:dict
+            subprocess.Popenに渡すキーワード引数
+        '''
+        options = {'stdin':subprocess.DEVNULL,'stdout':subprocess.DEVNULL,'stderr':subprocess.DEVNULL}
+        if os.name == 'nt':
+            options['creationflags'] = subprocess.DETACHED_PROCESS|subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            options['start_new_session'] = True
+        return options
+
+    def WaitUntilReady(self,deadline,interval=0.02,MaxInterval=0.25):
+        '''
+        エントリーポイントが応答するまで問い合わせる．
+        Javaプログラムが先に終了した場合はすぐに諦める．
+        応答した場合も起動したJavaプログラムが動いていることを確かめ，
+        終了していれば応答したのは別のプログラムなので諦める．
+
+        Parameters
+        ----------
+        deadline:float
+            諦める時刻(time.perf_counter)
+        interval:float default=0.02
+            最初の問い合わせの間隔[s]．問い合わせるたびに倍にする
+        MaxInterval:float default=0.25
+            問い合わせの間隔の最大値[s]
+
+        Returns
+        -------
+        ret:boolean
+            応答した場合True
+        '''
+        while True:
+            if self.Process.poll() is not None:
+                print('Javaプログラムが終了しました (終了コード {})'.format(self.Process.returncode))
+                return False
+            if self.IsReady():
+                if self.Process.poll() is None:
+                    return True
+                print('Javaプログラムが終了しました (終了コード {})．応答したのは別のJavaプログラムです'\
+                    .format(self.Process.returncode))
+                return False
+            remaining = deadline-time.perf_counter()
+            if remaining <= 0:
+                print('Javaプログラムが{:.1f}秒以内に応答しませんでした'.format(self.StartTimeout))
+                return False
+            time.sleep(min(interval,remaining))
+            interval = min(interval*2,MaxInterval)
+
+    def IsReady(self):
+        '''
+        エントリーポイントが応答するかどうかを返す．
+
+        Returns
+        -------
+        ret:boolean
+            応答した場合True
+        '''
+        if not self.IsListening():
+            return False
+        try:
+            self.Gateway.entry_point.hashCode()     # エントリーポイントが登録されていれば応答する
+            return True
+        except Py4JError:
+            return False
+
+    def IsListening(self):
+        '''
+        ゲートウェイのポートが接続を受け付けているかどうかを返す．
+        py4jのゲートウェイに接続を試みるより軽いので，先にこちらで確かめる．
+
+        Returns
+        -------
+        ret:boolean
+            接続できた場合True
+        '''
+        try:
+            with socket.create_connection(('127.0.0.1',int(self.PortNum)),timeout=0.1):
+                return True
+        except OSError:
+            return False
+
+    def CreateGateway(self):
+        '''
+        Javaプログラムに接続するゲートウェイを作る．SensorCallbackPortが0でなければ
+        コールバックサーバも起動し，Mini4WDLoggerをPythonのエントリーポイントとする．
+
+        Returns
+        -------
+        Gateway:JavaGateway
+            ゲートウェイのインスタンス
+        '''
+        if self.SensorCallbackPort <= 0 or self.M4DL is None:
+            return JavaGateway(gateway_parameters=GatewayParameters(port=int(self.PortNum)))
+        return JavaGateway(gateway_parameters=GatewayParameters(port=int(self.PortNum)),\
+                callback_server_parameters=CallbackServerParameters(port=self.SensorCallbackPort,daemonize=True),\
+                python_server_entry_point=self.M4DL)
+
+    def CloseGateway(self):
+        '''
+        コールバックサーバを停止してからゲートウェイを閉じる．
+        '''
+        if self.Gateway is None:
+            return
+        if self.SensorCallbackPort > 0:
+            self.Gateway.shutdown_callback_server()
+        self.Gateway.close()
+        self.Gateway = None
 
     def StopJava(self):
         '''
@@ -405,9 +1051,21 @@ class Mini4WDJavaHandler():
 
         '''
 
+        if self.ReuseBridge:
+            # Javaプログラムは次に接続するときのために動かしたままにする
+            self.app = None
+            self.CloseGateway()
+            self.Process = None
+            return
         print(self.ClassName,'を止めます')
-        self.app.CloseCSVFile()
-        self.Process.kill()
+        if self.app is not None:
+            self.app.CloseCSVFile()
+            self.app = None
+        self.CloseGateway()
+        if self.Process is not None:
+            self.Process.kill()
+            self.Process.wait()
+            self.Process = None
 
     def GetApp(self):
         '''
@@ -422,8 +1080,276 @@ class Mini4WDJavaHandler():
         '''
         return self.app
 
+    def HasMethod(self,name):
+        '''
+        Javaプログラムのエントリーポイントが指定した名前のpublicなメソッドを持つかどうかを返す．
+        py4jはメソッドを呼び出すまで存在を確かめないので，Javaのリフレクションで調べる．
+
+        Parameters
+        ----------
+        name:string
+            メソッドの名前
+
+        Returns
+        -------
+        ret:boolean
+            持つ場合True
+        '''
+        try:
+            return any(method.getName() == name for method in self.app.getClass().getMethods())
+        except Py4JError:
+            return False
+
+def ShutdownBridge(PortNum=25333):
+    '''
+    使いまわしているJavaプログラムのCSVファイルを閉じてから，Javaプログラムを終了させる．
+
+    Parameters
+    ----------
+    PortNum:int default=25333
+        Javaプログラムが通信を受け付けているポート番号
+
+    Returns
+    -------
+    ret:boolean
+        Javaプログラムが動いていて，終了させた場合True
+    '''
+    Gateway = JavaGateway(gateway_parameters=GatewayParameters(port=int(PortNum)))
+    try:
+        Gateway.entry_point.CloseCSVFile()
+    except Py4JNetworkError:
+        print('ポート{}で動いているJavaプログラムはありません'.format(PortNum))
+        return False
+    try:
+        Gateway.jvm.System.exit(0)
+    except Py4JError:                           # 応答を返す前に終了するので必ず発生する
+        pass
+    finally:
+        Gateway.close()
+    print('ポート{}のJavaプログラムを終了させました'.format(PortNum))
+    return True
+
+class Mini4WDSerialHandler():
+    '''
+    Javaプログラムを介さずに，pyserialでミニ四駆と直接通信するもの．
+    Javaプログラムのエントリーポイントと同じSendDutyCommand,onRightLEDなどを持つので，
+    GetAppで返したインスタンスをMini4WDHandlerのappとしてそのまま使える．
+
+    コマンドは次の5バイトのフレームで送信する．
+        Header(0xA5) , CommandID , 値(int16,リトルエンディアン) , チェックサム
+    duty比は1000倍した整数，LEDは1(点灯)か0(消灯)を値とする．
+    duty比と左右のLEDを一度に送信する場合(state)は，値の下位11ビットを1000倍したduty比(2の補数)，
+    上位5ビットを変わった項目のビット(duty,右,左)と右と左のLEDの状態とする．
+    フレームの形式はEncodeCommandだけで決めているので，
+    ミニ四駆側の形式に合わせる場合はそこだけを変更すればよい．
+    この形式はJavaプログラムの形式ではなく，このクラスのために決めたものなので，
+    ミニ四駆側がこの形式を受け付ける場合だけ，設定ファイルでSerialProtocol=a5frameとする．
+    SerialProtocolがProtocolsのいずれでもない場合は，ポートを開く前にUnknownSerialProtocolを挙げる．
+
+    Parameters
+    ----------
+    PortName:String
+        ミニ四駆と通信を行うBluetoothのポートの名前
+    BaudRate:int
+        通信速度
+    Acknowledge:boolean
+        Trueならコマンドを送信するたびに同じフレームが返ってくるのを待つ
+    Protocol:String
+        ミニ四駆側が受け付けるフレームの形式
+    Serial:serial.Serial
+        シリアルポートのインスタンス
+    '''
+
+    Protocols   = ('a5frame',)
+    Header      = 0xA5
+    CommandIDs  = {'duty':0x01,'rightLED':0x02,'leftLED':0x03,'state':0x04}
+    FrameFormat = '<BBhB'
+    FrameSize   = struct.calcsize(FrameFormat)
+
+    def __init__(self,PortName='COM4',BaudRate=115200,Acknowledge=False,timeout=1.0,Protocol='none'):
+        '''
+
+        Parameters
+        ----------
+        PortName:String default='COM4'
+            ミニ四駆と通信を行うBluetoothのポートの名前
+        BaudRate:int default=115200
+            通信速度
+        Acknowledge:boolean default=False
+            Trueならコマンドを送信するたびに同じフレームが返ってくるのを待つ
+        timeout:float default=1.0
+            読み書きのタイムアウト[s]
+        Protocol:String default='none'
+            ミニ四駆側が受け付けるフレームの形式．Protocolsのいずれか
+
+        Throws
+        ------
+        UnknownSerialProtocol
+            Protocolが指定されていないか，対応していない形式の場合
+        serial.SerialException
+            ポートが開けなかった場合
+
+        '''
+        self.PortName       = PortName
+        self.BaudRate       = int(BaudRate)
+        self.Acknowledge    = Acknowledge
+        self.Protocol       = Protocol
+        if self.Protocol not in self.Protocols:
+            print('SerialProtocol={} には対応していません．Mini4WDTransport=serialは，ミニ四駆側が'.format(self.Protocol),\
+                '0xA5,CommandID,int16,チェックサムのフレームを受け付ける場合だけ SerialProtocol=a5frame として使えます')
+            raise UnknownSerialProtocol
+        print(self.PortName,'に接続します')
+        self.Serial         = serial.Serial(self.PortName,self.BaudRate,timeout=timeout,write_timeout=timeout)
+
+    def __del__(self):
+        '''
+        終了するときにシリアルポートを閉じる
+        '''
+        self.Close()
+
+    @classmethod
+    def EncodeCommand(cls,key,value):
+        '''
+        コマンドを送信するフレームに変換する．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類(duty,rightLED,leftLED,state)
+        value:float or boolean or tuple
+            duty比もしくはLEDを点けるかどうか．stateならMini4WDActuatorState.Packの組
+
+        Returns
+        -------
+        frame:bytes
+            送信するフレーム
+        '''
+        CommandID   = cls.CommandIDs[key]
+        if key == 'state':
+            duty, rightLED, leftLED, mask = value
+            value   = (int(round(float(duty)*1000))&0x7FF)|(mask<<11)|(int(rightLED)<<14)|(int(leftLED)<<15)
+            body    = struct.pack('<BBH',cls.Header,CommandID,value)
+            return body+bytes([sum(body)&0xFF])
+        if key == 'duty':
+            value   = int(round(float(value)*1000))
+        else:
+            value   = 1 if value else 0
+        body        = struct.pack('<BBh',cls.Header,CommandID,value)
+        return body+bytes([sum(body)&0xFF])
+
+    def Send(self,key,value):
+        '''
+        コマンドを送信する．Acknowledgeが真なら返事を待つ．
+
+        Throws
+        ------
+        serial.SerialTimeoutException
+            書き込みがタイムアウトした場合
+        IOError
+            返事が返ってこないか，送信したフレームと違った場合
+        '''
+        frame = self.EncodeCommand(key,value)
+        self.Serial.write(frame)
+        self.Serial.flush()
+        if self.Acknowledge and self.Serial.read(self.FrameSize) != frame:
+            raise IOError('No acknowledge from '+self.PortName)
+
+    def SendDutyCommand(self,dutyRatio):
+        self.Send('duty',dutyRatio)
+
+    def SendActuatorState(self,dutyRatio,rightLED,leftLED,mask):
+        self.Send('state',(dutyRatio,rightLED,leftLED,mask))
+
+    def onRightLED(self):
+        self.Send('rightLED',True)
+
+    def offRightLED(self):
+        self.Send('rightLED',False)
+
+    def onLeftLED(self):
+        self.Send('leftLED',True)
+
+    def offLeftLED(self):
+        self.Send('leftLED',False)
+
+    def CloseCSVFile(self):
+        '''
+        Javaプログラムとの互換のためのもの．直接通信する場合はCSVファイルを作らない
+        '''
+        pass
+
+    def Close(self):
+        '''
+        シリアルポートを閉じる
+        '''
+        if getattr(self,'Serial',None) is not None and self.Serial.is_open:
+            self.Serial.close()
+
+    def GetApp(self):
+        '''
+        Javaプログラムのエントリーポイントの代わりとして自分自身を返す
+        '''
+        return self
+
+    def HasMethod(self,name):
+        '''
+        Javaプログラムとの互換のためのもの．自分自身が指定した名前のメソッドを持つかどうかを返す
+        '''
+        return callable(getattr(self,name,None))
+
+class Mini4WDSerialLoopback():
+    '''
+    Mini4WDSerialHandlerを試すための，ミニ四駆の代わりとなる疑似端末(pty)．
+    受け取ったフレームをそのまま送り返す．os.openptyを使うのでPOSIXのみで使える．
+    Windowsではcom0comなどの仮想COMポートの組を使う．
+
+    Parameters
+    ----------
+    PortName:String
+        Mini4WDSerialHandlerに渡すポートの名前
+    Frames:list context=bytes
+        受け取ったフレーム
+    Delay:float
+        送り返すまでに待つ時間[s]．Bluetoothの遅延を模擬する
+    '''
+
+    def __init__(self,Delay=0.0):
+        if os.name == 'nt':
+            raise OSError('Mini4WDSerialLoopback needs os.openpty, which is not available on Windows. '\
+                'Use a virtual COM port pair (e.g. com0com) and pass its port name instead.')
+        self.Master, self.Slave = os.openpty()
+        self.PortName           = os.ttyname(self.Slave)
+        self.Frames             = list()
+        self.Delay              = Delay
+        self.RunFlag            = True
+        self.Thread             = threading.Thread(target=self.EchoLoop,daemon=True)
+        self.Thread.start()
+
+    def EchoLoop(self):
+        buffer = b''
+        while self.RunFlag:
+            try:
+                buffer += os.read(self.Master,64)
+            except OSError:
+                break
+            while len(buffer) >= Mini4WDSerialHandler.FrameSize:
+                frame   = buffer[:Mini4WDSerialHandler.FrameSize]
+                buffer  = buffer[Mini4WDSerialHandler.FrameSize:]
+                self.Frames.append(frame)
+                if self.Delay > 0:
+                    time.sleep(self.Delay)
+                os.write(self.Master,frame)
+
+    def GetPortName(self):
+        return self.PortName
+
+    def Close(self):
+        self.RunFlag = False
+        os.close(self.Slave)
+        os.close(self.Master)
+
 class Mini4WDHandlerForTest(Mini4WDHandler):
-    def __init__(self,Mini4WDLogger):
+    def __init__(self,Mini4WDLogger,Suffix=''):
 
         '''
 
@@ -438,19 +1364,28 @@ class Mini4WDHandlerForTest(Mini4WDHandler):
         '''
         self.M4DL               = Mini4WDLogger
         self.M4DIr              = self.M4DL.GetM4DIr()
+        self.Suffix             = Suffix
         self.X                  = 0
         self.Y                  = 0
         self.DivMapH            = 0
         self.DivMapW            = 0
         self.M4DM               = Mini4WDDutyMap(self)
-        self.M4DM.ApplyCSVFileWithDmap(self.M4DIr.GetFileValue('CSVFilePath'))
+        self.M4DM.ApplyFileWithDmap(self.GetCarValue('CSVFilePath'))
         self.currentDutyRatio   = 0
+        self.M4DAS              = Mini4WDActuatorState()
+        self.M4DRL              = self.CreateRateLimiter()
+        self.BatchedCommand     = True
+        self.M4DCD              = None
+        self.M4DLR              = None
 
     def __del__(self):
         pass
     
-    def SendDutyCommand(self, DutyRatio):
-        print('SendDutyRatioが呼ばれました',DutyRatio)
+    def TransmitCommand(self,key,value,FrameID=-1,FrameTime=None,PostTime=None):
+        if key == 'duty':
+            print('SendDutyRatioが呼ばれました',value)
+        else:
+            print(key,'が呼ばれました',value)
 
     def GetM4DM(self):
         return self.M4DM
@@ -0,0 +1,176 @@
+class Mini4WDCellHysteresis():
+    '''
+    ミニ四駆がエリアの境界付近にいるときに，重心のぶれでエリアが
+    行ったり来たりしてduty比を何度も送信しないようにするためのクラス．
+    新しいエリアは上下左右にMarginピクセル離れた点がどれも元のエリアに入っていないときに受け入れる．
+    ただし直前に受け入れていたエリアに戻る場合だけは，さらにHoldFrames回続けて観測されたか，
+    最初に観測してからHoldTime秒経つまで受け入れない．前に進む変化は遅らせない．
+    満たさない場合は元のエリアのままとする．
+
+    Attributes
+    ----------
+    M4DLT:Mini4WDLocationTable
+        座標からエリアとduty比を求める表
+    Margin:int
+        元のエリアの境界から離れていなければならない距離[pixel]．0なら空間の条件を使わない
+    HoldFrames:int
+        直前のエリアに戻る場合に続けて観測されなければならない回数．1以下ならすぐに受け入れる
+    HoldTime:float
+        直前のエリアを最初に観測してからこの時間[s]経てば回数によらず受け入れる．0以下なら使わない
+    Cell:tuple or None
+        受け入れているエリア(mapX,mapY)
+    PreviousCell:tuple or None
+        Cellの前に受け入れていたエリア(mapX,mapY)
+    Candidate:tuple or None
+        受け入れるかどうか判断中のエリア(mapX,mapY)
+    CandidateCount:int
+        Candidateが続けて観測された回数
+    CandidateTime:float
+        Candidateを最初に観測した時刻[s]
+    AcceptedCount:int
+        エリアの変化を受け入れた回数
+    SpatialSuppressedCount:int
+        空間の条件で抑えたエリアの変化の回数
+    TemporalSuppressedCount:int
+        時間の条件で抑えたエリアの変化の回数
+    '''
+
+    def __init__(self,M4DLT,Margin=3,HoldFrames=1,HoldTime=0.03):
+        '''
+        Parameters
+        ----------
+        M4DLT:Mini4WDLocationTable
+            座標からエリアとduty比を求める表
+        Margin:int default=3
+            元のエリアの境界から離れていなければならない距離[pixel]
+        HoldFrames:int default=1
+            直前のエリアに戻る場合に続けて観測されなければならない回数
+        HoldTime:float default=0.03
+            直前のエリアを最初に観測してから受け入れるまでの最大の時間[s]
+        '''
+        self.M4DLT      = M4DLT
+        self.Margin     = int(Margin)
+        self.HoldFrames = int(HoldFrames)
+        self.HoldTime   = float(HoldTime)
+        self.Reset()
+
+    def Reset(self,Cell=None):
+        '''
+        受け入れているエリアと各カウンタを初期化する．
+
+        Parameters
+        ----------
+        Cell:tuple default=None
+            最初に受け入れるエリア(mapX,mapY)．Noneなら最初に観測したエリアを受け入れる
+        '''
+        self.Cell                       = Cell
+        self.PreviousCell               = None
+        self.Candidate                  = None
+        self.CandidateCount             = 0
+        self.CandidateTime              = 0.0
+        self.AcceptedCount              = 0
+        self.SpatialSuppressedCount     = 0
+        self.TemporalSuppressedCount    = 0
+
+    def IsAwayFrom(self,gx,gy,mapX,mapY):
+        '''
+        上下左右にMarginピクセル離れた点がどれもエリア(mapX,mapY)に入っていないかどうかを返す．
+
+        Parameters
+        ----------
+        gx:float
+            ミニ四駆のX座標
+        gy:float
+            ミニ四駆のY座標
+        mapX:int
+            元のエリアの横の番号
+        mapY:int
+            元のエリアの縦の番号
+
+        Returns
+        -------
+        ret:boolean
+            どの点も元のエリアに入っていない場合True
+        '''
+        m = self.Margin
+        for x, y in ((gx-m,gy),(gx+m,gy),(gx,gy-m),(gx,gy+m)):
+            X, Y, DutyRatio = self.M4DLT.Lookup(x,y)
+            if X == mapX and Y == mapY:
+                return False
+        return True
+
+    def Filter(self,gx,gy,mapX,mapY,DutyRatio,t):
+        '''
+        観測したエリアを受け入れるかどうか判断し，受け入れているエリアを返す．
+
+        Parameters
+        ----------
+        gx:float
+            ミニ四駆のX座標
+        gy:float
+            ミニ四駆のY座標
+        mapX:int
+            観測したエリアの横の番号
+        mapY:int
+            観測したエリアの縦の番号
+        DutyRatio:float
+            観測したエリアのduty比
+        t:float
+            観測した時刻[s]
+
+        Returns
+        -------
+        mapX:int
+            受け入れているエリアの横の番号
+        mapY:int
+            受け入れているエリアの縦の番号
+        DutyRatio:float
+            受け入れているエリアのduty比
+        '''
+        if self.Cell is None:
+            self.Cell = (mapX,mapY)
+            return mapX,mapY,DutyRatio
+        if (mapX,mapY) == self.Cell:
+            self.Candidate = None
+            return mapX,mapY,DutyRatio
+        if self.Margin > 0 and not self.IsAwayFrom(gx,gy,*self.Cell):
+            self.SpatialSuppressedCount += 1
+            return self.GetCell()
+        if (mapX,mapY) == self.PreviousCell:                        # 直前のエリアに戻る場合だけ時間の条件を使う
+            if self.Candidate != (mapX,mapY):
+                self.Candidate      = (mapX,mapY)
+                self.CandidateCount = 0
+                self.CandidateTime  = t
+            self.CandidateCount += 1
+            if self.CandidateCount < self.HoldFrames and \
+                (self.HoldTime <= 0 or t-self.CandidateTime < self.HoldTime):
+                self.TemporalSuppressedCount += 1
+                return self.GetCell()
+        self.PreviousCell   = self.Cell
+        self.Cell           = (mapX,mapY)
+        self.Candidate      = None
+        self.AcceptedCount  += 1
+        return mapX,mapY,DutyRatio
+
+    def GetCell(self):
+        '''
+        受け入れているエリアとそのduty比を返す．
+        duty比はDutyMapが変わっても良いように毎回DutyMapから取り出す．
+        '''
+        mapX, mapY = self.Cell
+        return mapX,mapY,self.M4DLT.M4DM.GetDutyRatio(mapX,mapY)
+
+    def GetCounters(self):
+        '''
+        各カウンタを返す．
+
+        Returns
+        -------
+        AcceptedCount:int
+            エリアの変化を受け入れた回数
+        SpatialSuppressedCount:int
+            空間の条件で抑えたエリアの変化の回数
+        TemporalSuppressedCount:int
+            時間の条件で抑えたエリアの変化の回数
+        '''
+        return self.AcceptedCount,self.SpatialSuppressedCount,self.TemporalSuppressedCount
@@ -19,8 +19,25 @@ class Mini4WDImageProcessor():
         トリミングする右側のピクセルの数
     TrimLeft:int
         トリミングする左側のピクセルの数
+    DivFrame:int
+        画像の解像度．高ければ高いほど荒くなる
+    Gray:boolean
+        Trueならグレースケールに変換してから縮小とぼかしを行う．
+        背景差分は明るさしか使わないので，メモリの転送量が1/3になる
+    Interpolation:int
+        縮小に使う補間方法(cv2.INTER_*)
+    BlurOrder:string
+        ぼかしを縮小の前(before)に行うか後(after)に行うか．
+        afterの方がぼかすピクセルが少ないので速い
+    GrayBuffer:array_like
+        グレースケールに変換した画像を入れる使いまわしの配列
+    MiddleBuffer:array_like
+        縮小もしくはぼかしの途中の画像を入れる使いまわしの配列
     '''
 
+    Interpolations = {'nearest':cv2.INTER_NEAREST,'linear':cv2.INTER_LINEAR,\
+                        'area':cv2.INTER_AREA,'cubic':cv2.INTER_CUBIC}
+
     def __init__(self, Mini4WDInitializer,Mini4WDHandler):
         '''
         Parameters
@@ -41,6 +58,11 @@ class Mini4WDImageProcessor():
         self.TrimRight      = int(self.M4DIr.GetFileValue('TrimRight'))
         self.TrimLeft       = int(self.M4DIr.GetFileValue('TrimLeft'))
         self.DivFrame       = int(self.M4DIr.GetFileValue('DivFrame'))
+        self.Gray           = bool(int(self.M4DIr.GetFileValue('PreprocessingGray','0')))
+        self.Interpolation  = self.Interpolations[self.M4DIr.GetFileValue('ResizeInterpolation','linear')]
+        self.BlurOrder      = self.M4DIr.GetFileValue('BlurOrder','after')
+        self.GrayBuffer     = None
+        self.MiddleBuffer   = None
 
     def GetDivFrameNum(self):
         '''
@@ -67,14 +89,28 @@ class Mini4WDImageProcessor():
         '''
         return self.TrimTop,self.TrimBottom,self.TrimRight,self.TrimLeft
 
-    def ImagePreprocessing(self,img):
+    def IsGray(self):
+        '''
+        Returns
+        -------
+        Gray:boolean
+            前処理でグレースケールに変換するかどうか
+        '''
+        return self.Gray
+
+    def ImagePreprocessing(self,img,out=None):
         '''
-        画像の前処理を行う
+        画像の前処理を行う．
+        トリミングは配列の参照で行い，途中の画像は使いまわしの配列に書き込むので，
+        outを指定すれば1フレームごとに新しい配列を作らない．
 
         Parameters
         ----------
         img:array_like
             前処理したい画像配列
+        out:array_like default=None
+            前処理した画像を書き込む配列．
+            Noneもしくは大きさが合わない場合は新しく作成する．
 
         Returns
         -------
@@ -83,8 +119,34 @@ class Mini4WDImageProcessor():
 
         '''
 
-        img = img[self.TrimTop:self.TrimBottom, self.TrimLeft:self.TrimRight]
-        img = cv2.resize(img, (img.shape[1]//self.DivFrame, img.shape[0]//self.DivFrame))
-        img = cv2.GaussianBlur(img,(5,5),0)
-        
-        return img
+        img     = img[self.TrimTop:self.TrimBottom, self.TrimLeft:self.TrimRight]
+        dsize   = (img.shape[1]//self.DivFrame, img.shape[0]//self.DivFrame)
+        shape   = (dsize[1],dsize[0]) if self.Gray else (dsize[1],dsize[0],img.shape[2])
+        if out is None or out.shape != shape or out.dtype != img.dtype:
+            out = np.empty(shape,dtype=img.dtype)
+
+        if self.Gray:
+            self.GrayBuffer = self.GetBuffer(self.GrayBuffer,img.shape[:2],img.dtype)
+            img             = cv2.cvtColor(img,cv2.COLOR_BGR2GRAY,dst=self.GrayBuffer)
+
+        if self.DivFrame == 1:
+            cv2.GaussianBlur(img,(5,5),0,dst=out)
+        elif self.BlurOrder == 'before':
+            self.MiddleBuffer   = self.GetBuffer(self.MiddleBuffer,img.shape,img.dtype)
+            cv2.GaussianBlur(img,(5,5),0,dst=self.MiddleBuffer)
+            cv2.resize(self.MiddleBuffer,dsize,dst=out,interpolation=self.Interpolation)
+        else:
+            self.MiddleBuffer   = self.GetBuffer(self.MiddleBuffer,shape,img.dtype)
+            cv2.resize(img,dsize,dst=self.MiddleBuffer,interpolation=self.Interpolation)
+            cv2.GaussianBlur(self.MiddleBuffer,(5,5),0,dst=out)
+
+        return out
+
+    @staticmethod
+    def GetBuffer(buffer,shape,dtype):
+        '''
+        使いまわしの配列の大きさが合っていればそれを返し，合っていなければ作り直す．
+        '''
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape,dtype=dtype)
+        return buffer
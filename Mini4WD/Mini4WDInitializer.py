@@ -36,7 +36,7 @@ class Mini4WDInitializer():
         '''
         self.WriteFile(self.SettingFilePath)
 
-    def GetFileValue(self,key):
+    def GetFileValue(self,key,default=None):
         '''
 
         読み込んだ初期設定ファイルから作成したdict型において，
@@ -46,6 +46,9 @@ class Mini4WDInitializer():
         ----------
         key:string
             取り出したい初期設定の名前
+        default:object default=None
+            keyが存在しなかったときに返す値．
+            Noneの場合はKeyErrorを投げる．
         
         Returns
         -------
@@ -55,9 +58,11 @@ class Mini4WDInitializer():
         Throws
         ------
         KeyError:
-            指定されたキーが存在しなかった場合に投げられる
+            指定されたキーが存在せず，defaultも指定されなかった場合に投げられる
 
         '''
+        if default is not None and key not in self.SettingDict:
+            return default
         return self.SettingDict[key]
 
     def ReadFile(self,SettingFilePath=''):
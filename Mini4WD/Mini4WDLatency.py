@@ -0,0 +1,215 @@
+import csv
+import time
+import threading
+import numpy as np
+
+class Mini4WDLatencyRecorder():
+    '''
+    ミニ四駆へ送信したコマンドごとに，元になった検知のフレームと
+    送信の各時刻(time.perf_counter)を記録するクラス．
+    記録はログフォルダの<LogFileName>_command.csvに書き込み，
+    フレームの取得から送信が終わるまでの時間をヒストグラムに集計する．
+    検知ログ(time.time)と突き合わせられるように，フレームを取得した時刻と
+    送信が終わった時刻はtime.timeに換算した値も書き込む．
+    ヒストグラムは送信中でもGetHistogramで読み出せ，Reportを指定すれば
+    ReportInterval秒ごとにFormatHistogramの文字列を渡す．
+
+    Attributes
+    ----------
+    BinWidth:float
+        ヒストグラムの幅[ms]
+    Histogram:array_like
+        フレームの取得から送信が終わるまでの時間のヒストグラム．最後の要素はMaxLatencyを超えたもの
+    Rows:list
+        まだファイルに書き込んでいない記録
+    FlushRows:int
+        この数だけ記録が溜まったらファイルに書き込む
+    Count:int
+        記録したコマンドの数
+    FailedCount:int
+        送信に失敗したコマンドの数
+    MaxLatency:float
+        フレームの取得から送信が終わるまでの時間の最大値[ms]
+    WallOffset:float
+        time.perf_counterの時刻をtime.timeに換算するために足す値[s]
+    Report:function or None
+        Report(line)でヒストグラムの文字列を記録する関数．Noneなら記録しない
+    ReportInterval:float
+        ヒストグラムを記録する間隔[s]
+    '''
+
+    Header = ('frameId','frameTime','command','value','postTime','sendTime','completeTime','succeeded',\
+            'frameWallTime','completeWallTime')
+
+    def __init__(self,LogFileName,BinWidth=1.0,MaxLatency=500.0,FlushRows=256,Report=None,ReportInterval=10.0):
+        '''
+        Parameters
+        ----------
+        LogFileName:string
+            ログファイルの名前(Mini4WDLogger.GetLogFileName)
+        BinWidth:float default=1.0
+            ヒストグラムの幅[ms]
+        MaxLatency:float default=500.0
+            ヒストグラムで数える時間の上限[ms]
+        FlushRows:int default=256
+            この数だけ記録が溜まったらファイルに書き込む
+        Report:function default=None
+            Report(line)でヒストグラムの文字列を記録する関数(例えばMini4WDLogger.WriteOperationLog)
+        ReportInterval:float default=10.0
+            ヒストグラムを記録する間隔[s]．0以下なら記録しない
+        '''
+        self.BinWidth       = float(BinWidth)
+        self.Histogram      = np.zeros(int(np.ceil(MaxLatency/self.BinWidth))+1,dtype=np.int64)
+        self.Rows           = list()
+        self.FlushRows      = int(FlushRows)
+        self.Count          = 0
+        self.FailedCount    = 0
+        self.MaxLatency     = 0.0
+        self.WallOffset     = time.time()-time.perf_counter()
+        self.Report         = Report
+        self.ReportInterval = float(ReportInterval)
+        self.LastReport     = time.perf_counter()
+        self.Lock           = threading.Lock()
+        self.File           = open(LogFileName+'_command.csv','at',newline="")
+        csv.writer(self.File).writerow(self.Header)
+
+    def Record(self,key,value,FrameID,FrameTime,PostTime,SendTime,CompleteTime,succeeded=True):
+        '''
+        送信したコマンドを1つ記録する．
+
+        Parameters
+        ----------
+        key:string
+            コマンドの種類(duty,rightLED,leftLED)
+        value:object
+            コマンドの値
+        FrameID:int
+            元になった検知のフレームの番号．検知によらないコマンドは-1
+        FrameTime:float or None
+            元になったフレームを取得した時刻．検知によらないコマンドはNone
+        PostTime:float
+            コマンドを預けた時刻
+        SendTime:float
+            送信を始めた時刻
+        CompleteTime:float
+            送信が終わった時刻
+        succeeded:boolean default=True
+            送信に成功したかどうか
+        '''
+        start   = PostTime if FrameTime is None else FrameTime
+        latency = (CompleteTime-start)*1000
+        FrameWallTime = None if FrameTime is None else FrameTime+self.WallOffset
+        report  = False
+        with self.Lock:
+            self.Histogram[min(int(latency/self.BinWidth),len(self.Histogram)-1)] += 1
+            self.Count += 1
+            if not succeeded:
+                self.FailedCount += 1
+            if latency > self.MaxLatency:
+                self.MaxLatency = latency
+            self.Rows.append((FrameID,FrameTime,key,value,PostTime,SendTime,CompleteTime,int(succeeded),\
+                            FrameWallTime,CompleteTime+self.WallOffset))
+            if len(self.Rows) >= self.FlushRows:
+                self.Flush()
+            if self.Report is not None and self.ReportInterval > 0 and CompleteTime-self.LastReport >= self.ReportInterval:
+                self.LastReport = CompleteTime
+                report          = True
+        if report:
+            self.Report(self.FormatHistogram())
+
+    def Flush(self):
+        '''
+        溜まっている記録をファイルに書き込む．Lockを取得してから呼び出す．
+        '''
+        try:
+            csv.writer(self.File).writerows(self.Rows)
+        except IOError as e:
+            print(e)
+        self.Rows = list()
+
+    def Close(self):
+        '''
+        残りの記録を書き込んでファイルを閉じる．
+        '''
+        with self.Lock:
+            if self.File is None:
+                return
+            self.Flush()
+            self.File.close()
+            self.File = None
+
+    def GetHistogram(self):
+        '''
+        現在のヒストグラムを返す．
+
+        Returns
+        -------
+        edges:array_like
+            各ビンの下端[ms]
+        counts:array_like
+            各ビンの数．最後のビンは上限を超えたもの
+        '''
+        with self.Lock:
+            counts = self.Histogram.copy()
+        return np.arange(len(counts))*self.BinWidth,counts
+
+    def FormatHistogram(self):
+        '''
+        現在のヒストグラムを操作ログに書き込む1行の文字列にする．数が0のビンは省く．
+
+        Returns
+        -------
+        line:string
+            例えば'Command latency histogram : 3-4 ms 12 , 4-5 ms 40 , >=500 ms 1'
+        '''
+        edges, counts = self.GetHistogram()
+        bins = list()
+        for i in np.flatnonzero(counts):
+            if i == len(counts)-1:
+                bins.append('>={:g} ms {}'.format(edges[i],counts[i]))
+            else:
+                bins.append('{:g}-{:g} ms {}'.format(edges[i],edges[i]+self.BinWidth,counts[i]))
+        return 'Command latency histogram : '+(' , '.join(bins) if bins else 'no commands')
+
+    def GetPercentile(self,q):
+        '''
+        ヒストグラムから時間のパーセンタイルを求める．値はビンの上端なので最大で幅だけ大きい．
+
+        Parameters
+        ----------
+        q:float
+            パーセンタイル(0-100)
+
+        Returns
+        -------
+        latency:float
+            q%のコマンドがこの時間[ms]以内に送信し終えた
+        '''
+        edges, counts = self.GetHistogram()
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(counts),total*q/100.0))
+        return float(edges[min(index,len(edges)-1)]+self.BinWidth)
+
+    def GetCounters(self):
+        '''
+        記録の各カウンタを返す．
+
+        Returns
+        -------
+        Count:int
+            記録したコマンドの数
+        FailedCount:int
+            送信に失敗したコマンドの数
+        p50:float
+            時間の中央値[ms]
+        p95:float
+            時間の95パーセンタイル[ms]
+        p99:float
+            時間の99パーセンタイル[ms]
+        MaxLatency:float
+            時間の最大値[ms]
+        '''
+        return self.Count,self.FailedCount,self.GetPercentile(50),self.GetPercentile(95),\
+                self.GetPercentile(99),self.MaxLatency
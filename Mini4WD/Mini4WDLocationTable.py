@@ -0,0 +1,227 @@
+import numpy as np
+from Mini4WDException import NotAllowedValue
+
+class Mini4WDLocationTable():
+    '''
+    前処理後の画像のピクセルから，そのピクセルが属するエリアとduty比を
+    一度の配列の参照で求めるための表．
+    表はフレームの大きさとDutyMapが決まったときに作成し，
+    どちらかが変わった場合はIsOutdatedが真になるので作り直す．
+    エリアの境界を指定すれば，エリアの大きさを均等でなくすることもできる．
+    Interpolateが真の場合，duty比の表はエリアの中心の値を双線形補間した連続な値になる．
+
+    Attributes
+    ----------
+    M4DM:Mini4WDDutyMap
+        duty比を取り出すDutyMapのインスタンス
+    BoundariesX:list context=float or None
+        エリアの横の境界の位置を画像の幅に対する割合で並べたもの(DivMapW-1個)．
+        Noneなら均等に分割する
+    BoundariesY:list context=float or None
+        エリアの縦の境界の位置を画像の高さに対する割合で並べたもの(DivMapH-1個)．
+        Noneなら均等に分割する
+    Interpolate:boolean
+        duty比の表をエリアの中心の値から双線形補間するかどうか．
+        偽ならエリア内のduty比は一定(従来と同じ)
+    WeightX:array_like or None
+        補間する場合の，横の座標ごとの各エリアの中心の重み(幅×DivMapW)
+    WeightY:array_like or None
+        補間する場合の，縦の座標ごとの各エリアの中心の重み(高さ×DivMapH)
+    Shape:tuple or None
+        表を作成したときのフレームの(高さ,幅)
+    Version:int
+        表を作成したときのDutyMapの版
+    DivMapH:int
+        表を作成したときのエリアの縦の分割数
+    DivMapW:int
+        表を作成したときのエリアの横の分割数
+    CellX:array_like
+        横の座標からエリアの横の番号を求める配列
+    CellY:array_like
+        縦の座標からエリアの縦の番号を求める配列
+    CellTable:array_like
+        ピクセルごとのエリアの番号(mapY*DivMapW+mapX)
+    DutyTable:array_like
+        ピクセルごとのduty比
+    '''
+
+    def __init__(self,M4DM,BoundariesX=None,BoundariesY=None,Interpolate=False):
+        '''
+        Parameters
+        ----------
+        M4DM:Mini4WDDutyMap
+            duty比を取り出すDutyMapのインスタンス
+        BoundariesX:list context=float default=None
+            エリアの横の境界の位置(画像の幅に対する割合)
+        BoundariesY:list context=float default=None
+            エリアの縦の境界の位置(画像の高さに対する割合)
+        Interpolate:boolean default=False
+            duty比の表をエリアの中心の値から双線形補間するかどうか
+        '''
+        self.M4DM           = M4DM
+        self.BoundariesX    = BoundariesX
+        self.BoundariesY    = BoundariesY
+        self.Interpolate    = Interpolate
+        self.WeightX        = None
+        self.WeightY        = None
+        self.Shape          = None
+        self.Version        = -1
+        self.DivMapH        = 0
+        self.DivMapW        = 0
+        self.CellX          = None
+        self.CellY          = None
+        self.CellTable      = None
+        self.DutyTable      = None
+
+    def IsOutdated(self,shape):
+        '''
+        表を作り直す必要があるかどうかを返す．
+
+        Parameters
+        ----------
+        shape:tuple
+            現在のフレームのshape
+
+        Returns
+        -------
+        ret:boolean
+            フレームの大きさかDutyMapが表を作成したときと違う場合True
+        '''
+        return self.Shape != tuple(shape[:2]) or self.Version != self.M4DM.GetVersion()
+
+    def Build(self,shape):
+        '''
+        フレームの大きさと現在のDutyMapから表を作成する．
+        DutyMapだけが変わった場合はduty比の表だけを作り直す．
+
+        Parameters
+        ----------
+        shape:tuple
+            フレームのshape
+
+        Throws
+        ------
+        NotAllowedValue:
+            境界の数がエリアの分割数と合わない場合
+        '''
+        Version         = self.M4DM.GetVersion()           # 先に版を読んでおけば途中で変わっても次に作り直される
+        DutyMap         = np.asarray(self.M4DM.GetDutyMap(),dtype=np.float32)
+        DivMapH,DivMapW = DutyMap.shape
+        shape           = tuple(shape[:2])
+        if self.Shape != shape or self.DivMapH != DivMapH or self.DivMapW != DivMapW:
+            self.CellY      = self.CreateCellIndex(shape[0],DivMapH,self.BoundariesY)
+            self.CellX      = self.CreateCellIndex(shape[1],DivMapW,self.BoundariesX)
+            self.CellTable  = self.CellY[:,None]*DivMapW+self.CellX[None,:]
+            self.Shape      = shape
+            self.DivMapH    = DivMapH
+            self.DivMapW    = DivMapW
+            if self.Interpolate:
+                self.WeightY    = self.CreateInterpolationWeight(self.CellY,DivMapH)
+                self.WeightX    = self.CreateInterpolationWeight(self.CellX,DivMapW)
+        if self.Interpolate:                                # 縦と横に分けて線形補間する
+            self.DutyTable  = (self.WeightY@DutyMap@self.WeightX.T).astype(np.float32)
+        else:
+            self.DutyTable  = DutyMap[self.CellY[:,None],self.CellX[None,:]]
+        self.Version    = Version
+
+    @staticmethod
+    def CreateCellIndex(length,div,Boundaries=None):
+        '''
+        座標からエリアの番号を求める配列を作成する．
+        均等に分割する場合は従来と同じく座標//(length//div)とし，
+        あまりのピクセルは最後のエリアに含める．
+
+        Parameters
+        ----------
+        length:int
+            画像の幅もしくは高さ
+        div:int
+            エリアの分割数
+        Boundaries:list context=float default=None
+            エリアの境界の位置(length対する割合)
+
+        Returns
+        -------
+        CellIndex:array_like
+            座標ごとのエリアの番号
+        '''
+        coordinates = np.arange(length)
+        if Boundaries is None:
+            return np.minimum(coordinates//max(length//div,1),div-1).astype(np.int32)
+        if len(Boundaries) != div-1:
+            raise NotAllowedValue
+        Boundaries  = np.asarray(Boundaries,dtype=np.float64)*length
+        return np.searchsorted(Boundaries,coordinates,side='right').astype(np.int32)
+
+    @staticmethod
+    def CreateInterpolationWeight(CellIndex,div):
+        '''
+        座標ごとに，両隣のエリアの中心からの距離に応じた線形補間の重みを作成する．
+        最初と最後のエリアの中心より外側はそのエリアの値とする．
+
+        Parameters
+        ----------
+        CellIndex:array_like
+            座標ごとのエリアの番号(CreateCellIndexが返したもの)
+        div:int
+            エリアの分割数
+
+        Returns
+        -------
+        Weight:array_like
+            (座標の数×div)の重み．各行の和は1
+        '''
+        coordinates = np.arange(len(CellIndex),dtype=np.float64)
+        counts      = np.maximum(np.bincount(CellIndex,minlength=div),1)
+        centers     = np.bincount(CellIndex,weights=coordinates,minlength=div)/counts
+        eye         = np.eye(div,dtype=np.float32)
+        return np.stack([np.interp(coordinates,centers,eye[k]) for k in range(div)],axis=1).astype(np.float32)
+
+    def Lookup(self,gx,gy):
+        '''
+        座標からエリアとduty比を求める．
+
+        Parameters
+        ----------
+        gx:float
+            ミニ四駆のX座標
+        gy:float
+            ミニ四駆のY座標
+
+        Returns
+        -------
+        mapX:int
+            エリアの横の番号
+        mapY:int
+            エリアの縦の番号
+        DutyRatio:float
+            その座標のduty比．補間しない場合はそのエリアのduty比
+        '''
+        i       = min(max(int(gy),0),self.Shape[0]-1)
+        j       = min(max(int(gx),0),self.Shape[1]-1)
+        cell    = int(self.CellTable[i,j])
+        return cell%self.DivMapW,cell//self.DivMapW,float(self.DutyTable[i,j])
+
+    def GetCellTable(self):
+        return self.CellTable
+
+    def GetDutyTable(self):
+        return self.DutyTable
+
+def ParseBoundaries(value):
+    '''
+    設定ファイルに書かれたカンマ区切りの境界の値を読み込む．
+
+    Parameters
+    ----------
+    value:string
+        カンマ区切りの境界の値．空文字ならNone
+
+    Returns
+    -------
+    Boundaries:list context=float or None
+        境界の値
+    '''
+    if value is None or value == '':
+        return None
+    return [float(v) for v in value.split(',')]
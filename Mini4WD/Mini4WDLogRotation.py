@@ -0,0 +1,274 @@
+import os
+import csv
+import gzip
+import time
+import queue
+import shutil
+import threading
+
+IndexHeader = ('stream','segment','path','startTime','endTime','bytes')
+
+class Mini4WDLogRotator():
+    '''
+    1種類のログ(検知ログ，センサーログ，操作ログなど)をセグメントに分けて書き込むクラス．
+    セグメントの大きさがMaxBytesを超えるか，開いてからMaxSeconds秒経ったら次のセグメントに切り替え，
+    閉じたセグメントは別スレッドでgzipに圧縮する．
+    閉じたセグメントはセッションの索引ファイル(<LogFileName>_index.csv)に記録するので，
+    OpenSegmentsで時刻の範囲に入るセグメントだけを順に読み出せる．
+    MaxBytesとMaxSecondsがどちらも0の場合は切り替えず，ファイルの名前も従来と同じにする．
+
+    Attributes
+    ----------
+    LogFileName:string
+        ログファイルの名前(Mini4WDLogger.GetLogFileName)．索引ファイルの名前に使う
+    Stream:string
+        ログの種類の名前(例えばdetection_1，operation)．ファイルの名前は<LogFileName>_<Stream>になる
+    Extension:string
+        ファイルの拡張子(.csv，.bin，.txt)
+    Binary:boolean
+        バイナリのファイルとして開くかどうか
+    Header:tuple or None
+        csvのセグメントごとに最初に書き込むヘッダ
+    MaxBytes:int
+        セグメントの大きさの上限[byte]．0なら大きさでは切り替えない
+    MaxSeconds:float
+        セグメントを開いている時間の上限[s]．0なら時間では切り替えない
+    Compress:boolean
+        閉じたセグメントを圧縮するかどうか
+    File:file or None
+        書き込み中のセグメント
+    Segment:int
+        書き込み中のセグメントの番号(0から)
+    StartTime:float
+        書き込み中のセグメントを開いた時刻(time.time)
+    Lock:threading.Lock
+        Writeで書き込むときと切り替えるときのロック
+    '''
+
+    IndexLock = threading.Lock()                                # 索引ファイルはセッションで1つなのでログの種類をまたいで使う
+
+    def __init__(self,LogFileName,Stream,Extension,Binary=False,Header=None,MaxBytes=0,MaxSeconds=0,Compress=True):
+        '''
+        Parameters
+        ----------
+        LogFileName:string
+            ログファイルの名前(Mini4WDLogger.GetLogFileName)
+        Stream:string
+            ログの種類の名前
+        Extension:string
+            ファイルの拡張子
+        Binary:boolean default=False
+            バイナリのファイルとして開くかどうか
+        Header:tuple default=None
+            csvのセグメントごとに最初に書き込むヘッダ
+        MaxBytes:int default=0
+            セグメントの大きさの上限[byte]
+        MaxSeconds:float default=0
+            セグメントを開いている時間の上限[s]
+        Compress:boolean default=True
+            閉じたセグメントを圧縮するかどうか
+        '''
+        self.LogFileName    = LogFileName
+        self.Stream         = Stream
+        self.Extension      = Extension
+        self.Binary         = Binary
+        self.Header         = Header
+        self.MaxBytes       = int(MaxBytes)
+        self.MaxSeconds     = float(MaxSeconds)
+        self.Compress       = Compress
+        self.File           = None
+        self.Segment        = -1
+        self.StartTime      = 0.0
+        self.Lock           = threading.Lock()
+        self.Queue          = queue.Queue()
+        self.Thread         = None
+        self.Open()
+
+    def IsRotating(self):
+        return self.MaxBytes > 0 or self.MaxSeconds > 0
+
+    def GetSegmentPath(self,Segment):
+        '''
+        セグメントのファイルのパスを返す．切り替えない場合は従来と同じ名前にする．
+        '''
+        base = '{}_{}'.format(self.LogFileName,self.Stream)
+        if not self.IsRotating():
+            return base+self.Extension
+        return '{}.{:03d}{}'.format(base,Segment,self.Extension)
+
+    def Open(self):
+        '''
+        次のセグメントを開き，csvの場合はヘッダを書き込む．
+        '''
+        self.Segment    += 1
+        self.StartTime  = time.time()
+        if self.Binary:
+            self.File   = open(self.GetSegmentPath(self.Segment),'ab')
+        else:
+            self.File   = open(self.GetSegmentPath(self.Segment),'at',newline="")
+            if self.Header is not None:
+                csv.writer(self.File).writerow(self.Header)
+
+    def GetFile(self):
+        '''
+        書き込むセグメントを返す．大きさか時間が上限を超えていれば切り替えてから返す．
+        同じログに複数のスレッドから書き込む場合はWriteを使う．
+
+        Returns
+        -------
+        File:file
+            書き込むセグメント
+        '''
+        if (self.MaxBytes > 0 and self.File.tell() >= self.MaxBytes) or \
+            (self.MaxSeconds > 0 and time.time()-self.StartTime >= self.MaxSeconds):
+            self.Rotate()
+        return self.File
+
+    def Write(self,data):
+        '''
+        必要なら切り替えてから，dataをそのまま書き込む．複数のスレッドから呼び出してよい．
+        '''
+        with self.Lock:
+            self.GetFile().write(data)
+
+    def Flush(self):
+        with self.Lock:
+            self.File.flush()
+
+    def Rotate(self):
+        '''
+        書き込み中のセグメントを閉じて索引に記録し，次のセグメントを開く．
+        '''
+        self.CloseSegment()
+        self.Open()
+
+    def CloseSegment(self):
+        '''
+        書き込み中のセグメントを閉じて索引に記録し，圧縮するなら圧縮のスレッドに預ける．
+        '''
+        path    = self.GetSegmentPath(self.Segment)
+        size    = self.File.tell()
+        self.File.close()
+        self.File = None
+        with Mini4WDLogRotator.IndexLock:
+            IndexPath   = self.LogFileName+'_index.csv'
+            IsNew       = not os.path.exists(IndexPath)
+            with open(IndexPath,'at',newline="") as f:
+                writer = csv.writer(f)
+                if IsNew:
+                    writer.writerow(IndexHeader)
+                writer.writerow((self.Stream,self.Segment,os.path.basename(path),self.StartTime,time.time(),size))
+        if self.Compress and self.IsRotating():
+            if self.Thread is None:
+                self.Thread = threading.Thread(target=self.CompressLoop,daemon=True)
+                self.Thread.start()
+            self.Queue.put(path)
+
+    def CompressLoop(self):
+        '''
+        預けられたセグメントをgzipに圧縮し，元のファイルを消す．Noneを受け取ったら終わる．
+        '''
+        while True:
+            path = self.Queue.get()
+            if path is None:
+                break
+            try:
+                with open(path,'rb') as fin, gzip.open(path+'.gz.tmp','wb',compresslevel=6) as fout:
+                    shutil.copyfileobj(fin,fout)
+                os.replace(path+'.gz.tmp',path+'.gz')           # 圧縮し終えてから名前を付けるので，.gzは常に完全
+                os.remove(path)
+            except Exception as e:
+                print(e)
+
+    def Close(self):
+        '''
+        書き込み中のセグメントを閉じ，圧縮し終えるまで待つ．
+        '''
+        with self.Lock:
+            if self.File is None:
+                return
+            self.CloseSegment()
+        if self.Thread is not None:
+            self.Queue.put(None)
+            self.Thread.join()
+            self.Thread = None
+
+def ReadIndex(LogFileName,Stream=None):
+    '''
+    セッションの索引ファイルを読み込む．
+
+    Parameters
+    ----------
+    LogFileName:string
+        ログファイルの名前(Mini4WDLogger.GetLogFileName)
+    Stream:string default=None
+        ログの種類の名前．Noneならすべて
+
+    Returns
+    -------
+    index:list context=dict
+        閉じたセグメントごとのstream,segment,path,startTime,endTime,bytes．ログの種類とセグメントの順
+    '''
+    IndexPath = LogFileName+'_index.csv'
+    if not os.path.exists(IndexPath):
+        return list()
+    with open(IndexPath,newline='') as f:
+        index = [row for row in csv.DictReader(f) if Stream is None or row['stream'] == Stream]
+    for row in index:
+        row['segment']      = int(row['segment'])
+        row['startTime']    = float(row['startTime'])
+        row['endTime']      = float(row['endTime'])
+        row['bytes']        = int(row['bytes'])
+    return sorted(index,key=lambda row: (row['stream'],row['segment']))
+
+def OpenSegments(LogFileName,Stream,Binary=False,start=None,end=None):
+    '''
+    索引に記録されたセグメントのうち，時刻の範囲[start,end]に重なるものだけを順に開いて返す．
+    圧縮されたセグメントはgzipのまま読み出すので，セッション全体を展開する必要はない．
+
+    Parameters
+    ----------
+    LogFileName:string
+        ログファイルの名前(Mini4WDLogger.GetLogFileName)
+    Stream:string
+        ログの種類の名前
+    Binary:boolean default=False
+        バイナリとして開くかどうか．偽ならテキストとして開く
+    start:float default=None
+        範囲の始まりの時刻(time.time)．Noneなら最初から
+    end:float default=None
+        範囲の終わりの時刻(time.time)．Noneなら最後まで
+
+    Yields
+    ------
+    row:dict
+        セグメントの索引
+    f:file
+        開いたセグメント．次のセグメントを開く前に閉じる
+    '''
+    folder = os.path.dirname(LogFileName)
+    for row in ReadIndex(LogFileName,Stream):
+        if (start is not None and row['endTime'] < start) or (end is not None and row['startTime'] > end):
+            continue
+        path = os.path.join(folder,row['path'])
+        if os.path.exists(path+'.gz'):
+            f = gzip.open(path+'.gz','rb' if Binary else 'rt',newline=None if Binary else '')
+        else:
+            f = open(path,'rb' if Binary else 'rt',newline=None if Binary else '')
+        with f:
+            yield row,f
+
+def StreamCSVLog(LogFileName,Stream,start=None,end=None):
+    '''
+    csvのログをセグメントをまたいで1行ずつ読み出す．セグメントごとのヘッダは読み飛ばす．
+
+    Yields
+    ------
+    row:list context=string
+        ログの1行
+    '''
+    for index, f in OpenSegments(LogFileName,Stream,False,start,end):
+        reader = csv.reader(f)
+        next(reader,None)                                       # ヘッダ
+        for row in reader:
+            yield row
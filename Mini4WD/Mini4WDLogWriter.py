@@ -0,0 +1,263 @@
+import time
+import atexit
+import threading
+
+class Mini4WDLogWriter():
+    '''
+    ログの行を別スレッドでまとめてファイルに書き込むクラス．
+    Appendは行を預けてすぐに戻るので，検知のループがファイルの書き込みで止まらない．
+    書き込みのスレッドは，BatchSize行溜まったか，前回の書き込みからFlushInterval秒経ったときに
+    溜まった行をまとめてWriteRowsに渡す．
+    預けられる行の数はQueueSize行までとし，溜まりすぎた場合は最大BlockTimeout秒だけ
+    書き込みを待ち，それでも空かなければその行を捨てる(backpressure)．
+    Stopは溜まった行をすべて書き込んでから戻る．Startで終了時にStopが呼ばれるように登録する．
+    Tickを指定すると，書き込みのスレッドが行を待つ間も少なくともFlushInterval秒ごとに呼び出すので，
+    行が預けられなくても時間で行う処理(溜めた配列を渡す，セグメントを切り替えるなど)を続けられる．
+
+    Attributes
+    ----------
+    WriteRows:function
+        WriteRows(rows)で行のリストをファイルに書き込む関数．書き込みのスレッドから呼び出される
+    QueueSize:int
+        預けられる行の数の上限
+    BatchSize:int
+        この数だけ行が溜まったら書き込む
+    FlushInterval:float
+        前回の書き込みからこの時間[s]経ったら溜まった行を書き込む
+    BlockTimeout:float
+        溜まりすぎた場合に書き込みを待つ最大の時間[s]
+    Tick:function or None
+        Tick()で時間で行う処理をする関数．書き込みのスレッドから呼び出される
+    Rows:list
+        まだ書き込んでいない行
+    Condition:threading.Condition
+        Rowsを操作するときのロック
+    RunFlag:boolean
+        書き込みのスレッドを動かすかどうかのフラグ
+    IsWriting:boolean
+        書き込みのスレッドが書き込み中かどうか
+    AppendCount:int
+        預けられた行の数
+    WrittenCount:int
+        書き込んだ行の数
+    BatchCount:int
+        WriteRowsを呼び出した回数
+    BlockedCount:int
+        溜まりすぎて書き込みを待った回数
+    BlockedTime:float
+        溜まりすぎて書き込みを待った時間の合計[s]
+    DroppedCount:int
+        待っても空かずに捨てた行の数
+    MaxDepth:int
+        まだ書き込んでいない行の数の最大値
+    '''
+
+    def __init__(self,WriteRows,QueueSize=20000,BatchSize=1000,FlushInterval=1.0,BlockTimeout=0.05,Tick=None):
+        '''
+        Parameters
+        ----------
+        WriteRows:function
+            WriteRows(rows)で行のリストをファイルに書き込む関数
+        QueueSize:int default=20000
+            預けられる行の数の上限
+        BatchSize:int default=1000
+            この数だけ行が溜まったら書き込む
+        FlushInterval:float default=1.0
+            前回の書き込みからこの時間[s]経ったら溜まった行を書き込む
+        BlockTimeout:float default=0.05
+            溜まりすぎた場合に書き込みを待つ最大の時間[s]
+        Tick:function default=None
+            Tick()で時間で行う処理をする関数．Noneなら呼び出さない
+        '''
+        self.WriteRows      = WriteRows
+        self.QueueSize      = max(int(QueueSize),1)
+        self.BatchSize      = min(max(int(BatchSize),1),self.QueueSize)
+        self.FlushInterval  = float(FlushInterval)
+        self.BlockTimeout   = float(BlockTimeout)
+        self.Tick           = Tick
+        self.Rows           = list()
+        self.Condition      = threading.Condition()
+        self.Thread         = None
+        self.RunFlag        = False
+        self.IsWriting      = False
+        self.FlushRequested = False
+        self.AppendCount    = 0
+        self.WrittenCount   = 0
+        self.BatchCount     = 0
+        self.BlockedCount   = 0
+        self.BlockedTime    = 0.0
+        self.DroppedCount   = 0
+        self.MaxDepth       = 0
+
+    def Start(self):
+        '''
+        書き込みのスレッドを始動する．
+        '''
+        if self.Thread is not None:
+            return
+        self.RunFlag    = True
+        self.Thread     = threading.Thread(target=self.WriteLoop,daemon=True)
+        self.Thread.start()
+        atexit.register(self.Stop)
+
+    def Stop(self,timeout=5.0):
+        '''
+        溜まった行をすべて書き込んでから書き込みのスレッドを停止する．
+        スレッドが止まらなかった場合や始動していない場合は，呼び出したスレッドで書き込む．
+
+        Parameters
+        ----------
+        timeout:float default=5.0
+            書き込み終えるまで待つ最大の時間[s]
+        '''
+        with self.Condition:
+            self.RunFlag = False
+            self.Condition.notify_all()
+        if self.Thread is not None:
+            self.Thread.join(timeout)
+            if self.Thread.is_alive():
+                return
+            self.Thread = None
+            atexit.unregister(self.Stop)
+        with self.Condition:
+            rows        = self.Rows
+            self.Rows   = list()
+        if len(rows) > 0:
+            self.Write(rows)
+
+    def Append(self,row):
+        '''
+        行を預ける．溜まりすぎている場合は最大BlockTimeout秒だけ書き込みを待つ．
+
+        Parameters
+        ----------
+        row:list
+            ログの1行
+
+        Returns
+        -------
+        ret:boolean
+            預けた場合True．溜まりすぎて捨てた場合False
+        '''
+        with self.Condition:
+            if len(self.Rows) >= self.QueueSize:
+                if not self.RunFlag:
+                    self.DroppedCount += 1
+                    return False
+                self.BlockedCount += 1
+                start = time.perf_counter()
+                self.Condition.notify_all()
+                self.Condition.wait_for(lambda: len(self.Rows) < self.QueueSize,self.BlockTimeout)
+                self.BlockedTime += time.perf_counter()-start
+                if len(self.Rows) >= self.QueueSize:
+                    self.DroppedCount += 1
+                    return False
+            self.Rows.append(row)
+            self.AppendCount += 1
+            if len(self.Rows) > self.MaxDepth:
+                self.MaxDepth = len(self.Rows)
+            if len(self.Rows) >= self.BatchSize:
+                self.Condition.notify_all()
+        return True
+
+    def Flush(self,timeout=5.0):
+        '''
+        溜まった行をすぐに書き込ませ，書き込み終えるまで待つ．
+        ファイルを切り替える前に呼び出す．スレッドが動いていない場合は呼び出したスレッドで書き込む．
+
+        Parameters
+        ----------
+        timeout:float default=5.0
+            待つ最大の時間[s]
+
+        Returns
+        -------
+        ret:boolean
+            すべて書き込み終えた場合True
+        '''
+        deadline = time.perf_counter()+timeout
+        with self.Condition:
+            if not self.RunFlag:
+                rows        = self.Rows
+                self.Rows   = list()
+            else:
+                rows                = None
+                self.FlushRequested = True
+                self.Condition.notify_all()
+                while (len(self.Rows) > 0 or self.IsWriting) and self.RunFlag:
+                    remaining = deadline-time.perf_counter()
+                    if remaining <= 0:
+                        return False
+                    self.Condition.wait(remaining)
+        if rows:
+            self.Write(rows)
+        return True
+
+    def WriteLoop(self):
+        '''
+        溜まった行をBatchSize行ごとか，FlushInterval秒ごとに書き込み続ける．
+        書き込むたびに(行がなくても少なくともFlushInterval秒ごとに)Tickを呼び出す．
+        '''
+        last = time.perf_counter()
+        while True:
+            with self.Condition:
+                while self.RunFlag and not self.FlushRequested and len(self.Rows) < self.BatchSize:
+                    remaining = last+self.FlushInterval-time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self.Condition.wait(remaining)
+                rows                = self.Rows
+                self.Rows           = list()
+                self.FlushRequested = False
+                self.IsWriting      = len(rows) > 0
+                if not self.RunFlag and len(rows) == 0:
+                    self.Condition.notify_all()
+                    break
+                self.Condition.notify_all()                     # 書き込みを待っているAppendを起こす
+            last = time.perf_counter()
+            if len(rows) > 0:
+                self.Write(rows)
+            with self.Condition:
+                self.IsWriting = False
+                self.Condition.notify_all()
+            if self.Tick is not None:                           # 書き込み終えてから呼び出すので，Tickが預けた行で溜まりすぎない
+                try:
+                    self.Tick()
+                except Exception as e:
+                    print(e)
+
+    def Write(self,rows):
+        try:
+            self.WriteRows(rows)
+        except Exception as e:
+            print(e)
+        self.WrittenCount   += len(rows)
+        self.BatchCount     += 1
+
+    def GetCounters(self):
+        '''
+        書き込みの各カウンタを返す．
+
+        Returns
+        -------
+        AppendCount:int
+            預けられた行の数
+        WrittenCount:int
+            書き込んだ行の数
+        BatchCount:int
+            WriteRowsを呼び出した回数
+        Depth:int
+            現在のまだ書き込んでいない行の数
+        MaxDepth:int
+            まだ書き込んでいない行の数の最大値
+        BlockedCount:int
+            溜まりすぎて書き込みを待った回数
+        BlockedTime:float
+            溜まりすぎて書き込みを待った時間の合計[ms]
+        DroppedCount:int
+            待っても空かずに捨てた行の数
+        '''
+        with self.Condition:
+            Depth = len(self.Rows)
+        return self.AppendCount,self.WrittenCount,self.BatchCount,Depth,self.MaxDepth,\
+            self.BlockedCount,self.BlockedTime*1000,self.DroppedCount
@@ -2,8 +2,16 @@ import time
 import os
 import csv
 import threading
+from Mini4WDLogWriter import Mini4WDLogWriter
+from Mini4WDBinaryLog import Mini4WDBinaryLog
+from Mini4WDLogRotation import Mini4WDLogRotator
+from Mini4WDSensor import Mini4WDSensorLog
 
 class Mini4WDLogger:
+    class Java:
+        # py4jのコールバックでJavaプログラムからセンサーの値を受け取るためのインターフェース
+        implements = ['Mini4WDSensorListener']
+
     def __init__(self,M4DIr):
         self.M4DIr                  = M4DIr
         self.AreLogsLeft            = True                                                              # 作成したログを消すか否か
@@ -11,28 +19,49 @@ class Mini4WDLogger:
         self.stime                  = time.strftime("%Y%m%d%H%M%S", time.localtime())                      # 日付の取得
         self.LogFileName            = self.logFolderPath+self.stime+'/'+self.stime
         os.mkdir(self.logFolderPath+self.stime)                                                              # ログフォルダを作成する．
-        self.operationLogFile       = self.createFile(self.LogFileName+'_operation.txt')   # オペレーションログファイルを作成する．
-        # self.mini4WDSensorLogFile   = self.createFile(self.LogFileName+'_sensor.csv')   # センサーログファイルを作成する．
+        self.operationLogFile       = self.CreateRotator('operation','.txt')                            # オペレーションログファイルを作成する．
         self.detectionLogFile       = None                                                              # ミニ四駆検知ログファイル（初期値はNone）
         self.dcount                 = 0
-        self.scount                 = 0
-        self.drow                   = 0
-        self.detectionLog           = list()
-        self.sensorLog              = list()
+        self.detectionLock          = threading.Lock()                                                  # 検知ログファイルを切り替えるときのロック
+        self.detectionLogFormat     = self.M4DIr.GetFileValue('DetectionLogFormat','csv')                 # csvかbinary
+        self.detectionBinaryLog     = None                                                              # binaryの場合に検知ログを溜める配列
+        queueSize, batchSize        = int(self.M4DIr.GetFileValue('LogQueueSize','20000')),int(self.M4DIr.GetFileValue('LogBatchSize','1000'))
+        if self.detectionLogFormat == 'binary':                                                         # 書き込みのスレッドには行ではなく配列を預ける
+            chunkSize               = int(self.M4DIr.GetFileValue('DetectionLogChunkSize','4096'))
+            queueSize, batchSize    = max(queueSize//chunkSize,2),1
+        self.detectionLogWriter     = Mini4WDLogWriter(self.WriteDetectionRows,queueSize,batchSize,\
+                                        float(self.M4DIr.GetFileValue('LogFlushInterval','1.0')),\
+                                        float(self.M4DIr.GetFileValue('LogBlockTimeout','0.05')),\
+                                        self.OnWriterTick)
+        if self.detectionLogFormat == 'binary':
+            self.detectionBinaryLog = Mini4WDBinaryLog(self.detectionLogWriter.Append,chunkSize,\
+                                        float(self.M4DIr.GetFileValue('LogFlushInterval','1.0')))
+        self.detectionLogWriter.Start()                                                                 # 検知ログは別スレッドで書き込む
+        self.M4DSL                  = None                                                              # センサーログ（SensorLogが0ならNone）
+        if int(self.M4DIr.GetFileValue('SensorLog','0')):
+            self.M4DSL              = Mini4WDSensorLog(self,\
+                                        self.M4DIr.GetFileValue('SensorChannels','accX,accY,accZ,current').split(','),\
+                                        self.M4DIr.GetFileValue('SensorLogFormat','binary') == 'binary',\
+                                        int(self.M4DIr.GetFileValue('SensorLogChunkSize','8192')),\
+                                        float(self.M4DIr.GetFileValue('LogFlushInterval','1.0')))
 
     def __del__(self):
         '''
         作成したすべてのファイルを適切にクローズする.
         LeaveFlagがFalseの場合，ログをすべて消す．
         '''
+        if self.detectionBinaryLog is not None:
+            self.detectionBinaryLog.Flush()
+        self.detectionLogWriter.Stop()                                                                  # 溜まった検知ログをすべて書き込む
+        self.WriteOperationLog('Detection log writer : appended {} , written {} , batches {} , depth {} (max {}) , blocked {} ({:.1f} ms) , dropped {}'\
+            .format(*self.detectionLogWriter.GetCounters()))
+        if self.M4DSL is not None:
+            self.M4DSL.Close()                                                                          # 溜まったセンサーログをすべて書き込む
         self.WriteOperationLog('Mini4WD Controler is stopped.')
-        self.operationLogFile.close()
-        # self.WriteMini4WDSensorLog()
-        # self.mini4WDSensorLogFile.close()
+        self.operationLogFile.Close()
 
         if self.detectionLogFile is not None:
-            self.WriteDetectionLog()
-            self.detectionLogFile.close()
+            self.detectionLogFile.Close()
 
         if self.AreLogsLeft is False:
             os.remove(self.logFolderPath+self.stime)
@@ -54,78 +83,137 @@ class Mini4WDLogger:
             exit()
         return fout
 
-    def WriteOperationLog(self,line):
+    def CreateRotator(self,stream,extension,binary=False,header=None):
         '''
-        操作ログに記録する．
+        設定ファイルのLogRotateBytes,LogRotateSecondsでセグメントに分けて書き込むログファイルを作る．
+        どちらも0ならば従来と同じ名前の1つのファイルに書き込む．
+
+        Parameters
+        ----------
+        stream:string
+            ログの種類の名前．ファイルの名前は<LogFileName>_<stream>になる
+        extension:string
+            ファイルの拡張子
+        binary:boolean default=False
+            バイナリのファイルとして開くかどうか
+        header:tuple default=None
+            csvのセグメントごとに最初に書き込むヘッダ
+
+        Returns
+        -------
+        rotator:Mini4WDLogRotator
+            ログファイルのインスタンス
         '''
         try:
-            self.operationLogFile.write(time.strftime("%Y%m%d%H%M%S", time.localtime())+'\t' + line+'\n')
+            rotator = Mini4WDLogRotator(self.LogFileName,stream,extension,binary,header,\
+                        int(self.M4DIr.GetFileValue('LogRotateBytes','0')),\
+                        float(self.M4DIr.GetFileValue('LogRotateSeconds','0')),\
+                        bool(int(self.M4DIr.GetFileValue('LogCompress','1'))))
         except IOError as e:
             print(e)
+            exit()
+        return rotator
 
-    def AppendSensorLog(self,array):
-        array = list(array)
-        array.insert(0,time.time())
-        self.sensorLog.append(array)
-        self.scount += 1
-        print(self.sensorLog)
-        if self.scount == 1:
-            print('書き込みます')
-            thread = threading(target=self.WriteMini4WDSensorLog)
-            self.scount = 0
-
-    def WriteMini4WDSensorLog(self):
+    def WriteOperationLog(self,line):
         '''
-        センサーログに記録する
+        操作ログに記録する．複数のスレッドから呼び出してよい．
         '''
         try:
-            cout = csv.writer(self.mini4WDSensorLogFile)
-            if len(self.detectionLog)>1:
-                cout.writerows(self.sensorLog)
-            else :
-                cout.writerow(self.sensorLog)
+            self.operationLogFile.Write(time.strftime("%Y%m%d%H%M%S", time.localtime())+'\t' + line+'\n')
         except IOError as e:
             print(e)
 
+    def AppendSensorBatch(self,data):
+        '''
+        センサーの値をまとめて受け取り，センサーログに預ける．Javaプログラムから呼び出される．
+        dataの並びはMini4WDSensor.CreateSensorDtypeを参照．
+
+        Returns
+        -------
+        count:int
+            受け取ったサンプルの数．センサーログを取らない場合は0
+        '''
+        if self.M4DSL is None:
+            return 0
+        return self.M4DSL.AppendSensorBatch(data)
+
+    def AppendSensorLog(self,array):
+        '''
+        センサーの値を1サンプルだけ受け取り，センサーログに預ける．
+        多くのサンプルを送る場合はAppendSensorBatchを使う．
+        '''
+        if self.M4DSL is not None:
+            self.M4DSL.AppendSensorLog(array)
+
+    def GetM4DSL(self):
+        return self.M4DSL
+
     def AppendDetectionLog(self,array):
+        '''
+        ミニ四駆検知ログの1行を書き込みのスレッドに預ける．すぐに戻る．
+        binaryの場合はあらかじめ確保した配列に書き込み，配列ごと預ける．
+        '''
+        if self.detectionBinaryLog is not None:
+            self.detectionBinaryLog.Append(array)
+            return
         array = list(array)
         array.insert(0,time.time())
-        self.detectionLog.append(array)
-        self.drow += 1                  # 関数呼び出しがいやだからこう書いている．でも速くなるかは不明
-        if self.drow == 10000:
-            thread = threading(target=self.WriteDetectionLog)
-            self.drow = 0
+        self.detectionLogWriter.Append(array)
 
     def WriteDetectionLog(self):
         '''
-        ミニ四駆検知ログに記録する
+        預けたミニ四駆検知ログをすべてファイルに書き込ませ，書き込み終えるまで待つ．
         '''
-        try:
-            cout = csv.writer(self.detectionLogFile)
-            if len(self.detectionLog)>1:
-                cout.writerows(self.detectionLog)
-            else :
-                cout.writerow(self.detectionLog)
-        except IOError as e:
-            print(e)
-        self.detectionLog = list()
+        if self.detectionBinaryLog is not None:
+            self.detectionBinaryLog.Flush()
+        self.detectionLogWriter.Flush()
+
+    def OnWriterTick(self):
+        '''
+        検知ログの書き込みのスレッドから定期的に呼び出され，binaryの場合は
+        検知が止まっていても前回渡してからLogFlushInterval秒経った配列を書き込みに渡す．
+        '''
+        if self.detectionBinaryLog is not None:
+            self.detectionBinaryLog.FlushIfDue()
+
+    def WriteDetectionRows(self,rows):
+        '''
+        ミニ四駆検知ログに記録する．書き込みのスレッドから呼び出される．
+        クラッシュしても失うのが最後の書き込み以降だけになるように，書き込むたびにflushする．
+        binaryの場合，rowsは構造化配列のリストでそのまま書き出す．
+        '''
+        with self.detectionLock:
+            if self.detectionLogFile is None:
+                return
+            try:
+                f = self.detectionLogFile.GetFile()                            # 大きさか時間が上限を超えていれば次のセグメントにする
+                if self.detectionBinaryLog is not None:
+                    for chunk in rows:
+                        f.write(chunk.tobytes())
+                else:
+                    cout = csv.writer(f)
+                    cout.writerows(rows)
+                f.flush()
+            except IOError as e:
+                print(e)
 
     def UpdateDetectionLogFile(self):
         '''
         Detection Log Fileのみ，Detectionの実行ごとにファイルを書き換えるので，
         書き込むログファイルをアップデートする．
         '''
-        if self.detectionLogFile is not None:
-            self.WriteDetectionLog()
-            self.detectionLogFile.close()
-        self.dcount += 1
-        self.detectionLogFile = open('{}_detection_{}.csv'\
-            .format(self.LogFileName,self.dcount),'at',newline="")
-        try:
-            cout = csv.writer(self.detectionLogFile)
-            cout.writerow(("time","mapX","mapY","xCoordinate","yCoordinate","wLength","hLength","mapArea"))
-        except IOError as e:
-            print(e)
+        self.WriteDetectionLog()
+        header = ("time","mapX","mapY","xCoordinate","yCoordinate","wLength","hLength","mapArea")
+        if int(self.M4DIr.GetFileValue('CarCount','1')) > 1:                  # 複数台の場合はミニ四駆の番号を加える
+            header += ("car",)
+        with self.detectionLock:                                               # ヘッダより先に検知ログが書き込まれないようにする
+            if self.detectionLogFile is not None:
+                self.detectionLogFile.Close()
+            self.dcount += 1
+            if self.detectionBinaryLog is not None:                            # ヘッダのないDetectionDtypeの並び
+                self.detectionLogFile = self.CreateRotator('detection_{}'.format(self.dcount),'.bin',True)
+            else:                                                               # セグメントごとにヘッダを書き込む
+                self.detectionLogFile = self.CreateRotator('detection_{}'.format(self.dcount),'.csv',False,header)
 
     def GetDetectionLogFileNum(self):
         '''
@@ -0,0 +1,282 @@
+import cv2
+import time
+import queue
+import multiprocessing
+import numpy as np
+from Mini4WDImage import Mini4WDImageProcessor
+from Mini4WDBackground import Mini4WDBackgroundModel
+from Mini4WDBlob import Mini4WDBlobSelector
+from Mini4WDSearchWindow import Mini4WDSearchWindow
+from Mini4WDTracker import Mini4WDTracker
+
+class Mini4WDSettingSnapshot():
+    '''
+    子プロセスに渡すための設定の写し．
+    Mini4WDInitializerと同じGetFileValueを持つが，破棄されても設定ファイルに書き込まない．
+
+    Attributes
+    ----------
+    SettingDict:dict
+        設定の名前と値
+    '''
+
+    def __init__(self,SettingDict):
+        self.SettingDict = dict(SettingDict)
+
+    def GetFileValue(self,key,default=None):
+        if default is not None and key not in self.SettingDict:
+            return default
+        return self.SettingDict[key]
+
+class Mini4WDPipeline():
+    '''
+    カメラからの読み込みと前処理，ミニ四駆の検知をそれぞれ別のプロセスで行い，
+    検知の結果を受け取ってduty比の送信とログの記録を行うクラス．
+    フレームはmultiprocessing.shared_memoryの共有メモリのスロットに書き込み，
+    スロットの番号だけをキューで受け渡すのでフレームはpickleされない．
+    duty比の送信とログの記録はpy4jの接続とログファイルを持っているこのプロセスの
+    StartDetectingMini4WDを呼び出したスレッドで行う．
+    shared_memoryを使うのでpython3.8以上が必要．
+
+    Attributes
+    ----------
+    M4DD:Mini4WDDetector
+        検知の結果を反映するMini4WDDetectorのインスタンス
+    Slots:int
+        共有メモリに用意するフレームのスロットの数
+    CapturedFrames:multiprocessing.Value
+        読み込みのプロセスが読み込んだフレーム数
+    DroppedFrames:multiprocessing.Value
+        検知されずに捨てられたフレーム数
+    ResultCount:int
+        受け取った検知の結果の数
+    TotalLatency:float
+        フレームの取得から結果を受け取るまでの時間の合計[s]
+    MaxLatency:float
+        フレームの取得から結果を受け取るまでの時間の最大値[s]
+    '''
+
+    def __init__(self,M4DD,Slots=4):
+        '''
+        Parameters
+        ----------
+        M4DD:Mini4WDDetector
+            検知の結果を反映するMini4WDDetectorのインスタンス
+        Slots:int default=4
+            共有メモリに用意するフレームのスロットの数
+        '''
+        self.M4DD           = M4DD
+        self.Slots          = max(int(Slots),2)
+        self.CapturedFrames = None
+        self.DroppedFrames  = None
+        self.ResultCount    = 0
+        self.TotalLatency   = 0.0
+        self.MaxLatency     = 0.0
+
+    def Run(self,gx_pre,gy_pre):
+        '''
+        子プロセスを起動し，M4DDのStartFlagが偽になるか映像が終わるまで
+        検知の結果を反映し続ける．カメラは子プロセスで開くので，
+        実行中はM4DDのカメラを解放し，終了後に開きなおす．
+
+        Parameters
+        ----------
+        gx_pre:int
+            ミニ四駆を一番初めに設置したエリアの座標
+        gy_pre:int
+            ミニ四駆を一番初めに設置したエリアの座標
+        '''
+        from multiprocessing import shared_memory
+
+        BackGroundImage     = self.M4DD.GetBackGroundImage()
+        shape               = BackGroundImage.shape
+        shm                 = shared_memory.SharedMemory(create=True,size=int(np.prod(shape))*self.Slots)
+        FreeQueue           = multiprocessing.Queue()
+        ReadyQueue          = multiprocessing.Queue()
+        ResultQueue         = multiprocessing.Queue()
+        StopEvent           = multiprocessing.Event()
+        self.CapturedFrames = multiprocessing.Value('i',0)
+        self.DroppedFrames  = multiprocessing.Value('i',0)
+        self.ResultCount    = 0
+        self.TotalLatency   = 0.0
+        self.MaxLatency     = 0.0
+        for slot in range(self.Slots):
+            FreeQueue.put(slot)
+
+        Source      = self.M4DD.ReleaseCamera()
+        SettingDict = self.M4DD.GetM4DIr().SettingDict
+        processes   = [
+            multiprocessing.Process(target=CaptureProcess,daemon=True,\
+                args=(SettingDict,Source,shm.name,self.Slots,shape,FreeQueue,ReadyQueue,StopEvent,\
+                    self.CapturedFrames,self.DroppedFrames)),
+            multiprocessing.Process(target=DetectionProcess,daemon=True,\
+                args=(SettingDict,BackGroundImage,shm.name,self.Slots,FreeQueue,ReadyQueue,ResultQueue,StopEvent,\
+                    self.DroppedFrames,gx_pre,gy_pre)),
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            while self.M4DD.StartFlag:
+                try:
+                    result = ResultQueue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if result is None:                  # 映像が終わった
+                    break
+                FrameID, t, x, y, w, h, gx, gy, area = result
+                latency             = time.perf_counter()-t
+                self.ResultCount    += 1
+                self.TotalLatency   += latency
+                if latency > self.MaxLatency:
+                    self.MaxLatency = latency
+                if self.M4DD.GetM4DT() is not None:
+                    self.M4DD.GetM4DT().Update(gx,gy,t)
+                self.M4DD.OnMini4WDDetected(gx,gy,w,h,area,FrameID,t)
+        finally:
+            StopEvent.set()
+            for process in processes:
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.terminate()
+            shm.close()
+            shm.unlink()
+            self.M4DD.OpenCamera(Source)
+            self.M4DD.GetM4DL().WriteOperationLog(\
+                'Pipeline : captured {} , dropped {} , detected {} , latency {:.1f} ms (max {:.1f} ms)'\
+                .format(*self.GetCounters()))
+
+    def GetCounters(self):
+        '''
+        パイプラインの各カウンタを返す．
+
+        Returns
+        -------
+        CapturedFrames:int
+            読み込んだフレーム数
+        DroppedFrames:int
+            検知されずに捨てられたフレーム数
+        ResultCount:int
+            ミニ四駆が見つかったフレーム数
+        MeanLatency:float
+            フレームの取得から結果を受け取るまでの時間の平均[ms]
+        MaxLatency:float
+            フレームの取得から結果を受け取るまでの時間の最大値[ms]
+        '''
+        CapturedFrames  = self.CapturedFrames.value if self.CapturedFrames is not None else 0
+        DroppedFrames   = self.DroppedFrames.value if self.DroppedFrames is not None else 0
+        MeanLatency     = self.TotalLatency/self.ResultCount*1000 if self.ResultCount > 0 else 0.0
+        return CapturedFrames,DroppedFrames,self.ResultCount,MeanLatency,self.MaxLatency*1000
+
+def CaptureProcess(SettingDict,Source,ShmName,Slots,shape,FreeQueue,ReadyQueue,StopEvent,CapturedFrames,DroppedFrames):
+    '''
+    カメラからフレームを読み込んで前処理し，空いているスロットに書き込む．
+    空いているスロットがない場合はまだ検知されていない一番古いフレームを捨てて使う．
+    スロットの番号は(スロット,取得時刻,フレームの番号)として渡す．
+    '''
+    from multiprocessing import shared_memory
+
+    shm     = shared_memory.SharedMemory(name=ShmName)
+    frames  = np.ndarray((Slots,)+tuple(shape),dtype=np.uint8,buffer=shm.buf)
+    M4DIP   = Mini4WDImageProcessor(Mini4WDSettingSnapshot(SettingDict),None)
+    camera  = cv2.VideoCapture(Source)
+    try:
+        while not StopEvent.is_set() and camera.isOpened():
+            ret, frame = camera.read()
+            t = time.perf_counter()
+            if not ret:
+                break
+            with CapturedFrames.get_lock():
+                CapturedFrames.value += 1
+                FrameID = CapturedFrames.value
+            try:
+                slot = FreeQueue.get_nowait()
+            except queue.Empty:
+                try:
+                    slot, t_old, id_old = ReadyQueue.get_nowait()   # 古いフレームを捨てる
+                except queue.Empty:
+                    continue
+                with DroppedFrames.get_lock():
+                    DroppedFrames.value += 1
+            M4DIP.ImagePreprocessing(frame,frames[slot])       # 共有メモリに直接書き込む
+            ReadyQueue.put((slot,t,FrameID))
+    finally:
+        ReadyQueue.put(None)
+        camera.release()
+        del frames
+        shm.close()
+
+def DetectionProcess(SettingDict,BackGroundImage,ShmName,Slots,FreeQueue,ReadyQueue,ResultQueue,StopEvent,DroppedFrames,gx_pre,gy_pre):
+    '''
+    スロットに書き込まれた最新のフレームからミニ四駆を検知し，
+    見つかった場合は(フレームの番号,取得時刻,x,y,w,h,gx,gy,area)を結果のキューに入れる．
+    '''
+    from multiprocessing import shared_memory
+
+    shm     = shared_memory.SharedMemory(name=ShmName)
+    frames  = np.ndarray((Slots,)+BackGroundImage.shape,dtype=np.uint8,buffer=shm.buf)
+    M4DIr   = Mini4WDSettingSnapshot(SettingDict)
+    M4DBM   = Mini4WDBackgroundModel(BackGroundImage,M4DIr.GetFileValue('BGSMethod','legacy'),\
+                int(M4DIr.GetFileValue('BGSThreshold','25')))
+    M4DBS   = Mini4WDBlobSelector(M4DIr.GetFileValue('DetectionBackend','contour'),\
+                int(M4DIr.GetFileValue('Mini4WDMinSize')),int(M4DIr.GetFileValue('Mini4WDMaxSize')),\
+                float(M4DIr.GetFileValue('GateDistance','4.5')))
+    M4DSW   = None
+    if int(M4DIr.GetFileValue('SearchWindow','0')):
+        M4DSW = Mini4WDSearchWindow(int(M4DIr.GetFileValue('SearchWindowSize','40')),\
+                float(M4DIr.GetFileValue('SearchWindowGrowth','1.5')),\
+                int(M4DIr.GetFileValue('SearchWindowMaxMiss','5')))
+    M4DT    = None
+    if int(M4DIr.GetFileValue('Tracker','0')):
+        M4DT = Mini4WDTracker(float(M4DIr.GetFileValue('TrackerAlpha','0.75')),\
+                float(M4DIr.GetFileValue('TrackerBeta','0.45')),\
+                float(M4DIr.GetFileValue('TrackerMaxCoast','0.5')))
+        M4DT.Reset(gx_pre,gy_pre)
+
+    try:
+        while not StopEvent.is_set():
+            try:
+                item = ReadyQueue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            # 溜まっている場合は最新のフレームだけを使う．終わりの印(None)の前のフレームは検知してから終わる
+            stopping = False
+            while True:
+                try:
+                    newer = ReadyQueue.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    stopping = True
+                    break
+                FreeQueue.put(item[0])
+                with DroppedFrames.get_lock():
+                    DroppedFrames.value += 1
+                item = newer
+
+            slot, t, FrameID = item
+            if M4DT is not None:
+                gx_pre, gy_pre = M4DT.Predict(t)
+            Window      = None if M4DSW is None else M4DSW.GetWindow(gx_pre,gy_pre,BackGroundImage.shape)
+            binaryImage = M4DBM.Apply(frames[slot],Window)
+            FreeQueue.put(slot)
+            offset      = (0,0) if Window is None else (Window[0],Window[1])
+            x, y, w, h, gx, gy, area = M4DBS.Detect(binaryImage,gx_pre,gy_pre,offset)
+            if M4DSW is not None:
+                if gx == -1:
+                    M4DSW.Miss()
+                else:
+                    M4DSW.Hit()
+            if gx != -1:
+                if M4DT is not None:
+                    M4DT.Update(gx,gy,t)
+                gx_pre, gy_pre = gx, gy
+                ResultQueue.put((FrameID,t,x,y,w,h,gx,gy,area))
+            if stopping:
+                break
+    finally:
+        ResultQueue.put(None)
+        del frames
+        shm.close()
@@ -0,0 +1,94 @@
+import time
+import json
+import numpy as np
+
+class Mini4WDProfiler():
+    '''
+    検知のループの各段階にかかった時間を記録するクラス．
+    Startを呼び出してから，各段階が終わるたびにLapを呼び出すと，
+    前回のStartもしくはLapからの時間がその段階の時間として記録される．
+
+    Attributes
+    ----------
+    Stages:tuple context=string
+        記録する段階の名前
+        read:カメラからの読み込み
+        preprocess:Mini4WDImageProcessor.ImagePreprocessing
+        bgsub:背景差分
+        extract:輪郭もしくはブロブの取り出し
+        select:ミニ四駆の選択
+        set_info:SetInformationsOfDetection
+        log:AppendDetectionLog
+        dispatch:LocationChangeEventListner
+    Samples:dict
+        段階の名前をキーとして，かかった時間[s]のリストを持つ
+    LastTime:float
+        前回StartもしくはLapを呼び出した時刻[s]
+    '''
+
+    Stages = ('read','preprocess','bgsub','extract','select','set_info','log','dispatch')
+
+    def __init__(self):
+        self.Samples    = {stage:list() for stage in self.Stages}
+        self.LastTime   = time.perf_counter()
+
+    def Start(self):
+        '''
+        1フレームの処理の始まりを記録する．
+        '''
+        self.LastTime = time.perf_counter()
+
+    def Lap(self,stage):
+        '''
+        段階が終わったことを記録する．
+
+        Parameters
+        ----------
+        stage:string
+            終わった段階の名前
+        '''
+        now = time.perf_counter()
+        self.Samples[stage].append(now-self.LastTime)
+        self.LastTime = now
+
+    def Reset(self):
+        '''
+        記録した時間をすべて消す．
+        '''
+        self.__init__()
+
+    def GetSummary(self):
+        '''
+        各段階の時間の統計量を返す．
+
+        Returns
+        -------
+        summary:dict
+            段階の名前をキーとして，count,mean,p50,p95,p99,max[ms]を持つdict
+        '''
+        summary = dict()
+        for stage in self.Stages:
+            samples = np.asarray(self.Samples[stage])*1000
+            if len(samples) == 0:
+                summary[stage] = {'count':0}
+                continue
+            p50, p95, p99  = np.percentile(samples,(50,95,99))
+            summary[stage] = {'count':int(len(samples)),'mean':float(samples.mean()),\
+                                'p50':float(p50),'p95':float(p95),'p99':float(p99),'max':float(samples.max())}
+        return summary
+
+    def SaveJSON(self,filepath,information=None):
+        '''
+        各段階の時間の統計量をJSONファイルに保存する．
+
+        Parameters
+        ----------
+        filepath:string
+            保存先のパス
+        information:dict default=None
+            一緒に保存する実行条件など
+        '''
+        result = dict() if information is None else dict(information)
+        result['stages'] = self.GetSummary()
+        with open(filepath,'wt',encoding='UTF-8') as f:
+            json.dump(result,f,indent=2,ensure_ascii=False)
@@ -0,0 +1,83 @@
+class Mini4WDDutyRateLimiter():
+    '''
+    duty比を補間して毎フレーム求める場合に，送信の回数を抑えるためのクラス．
+    前回送信したduty比からThreshold以上変わったか，前回の送信からInterval秒以上
+    経って値が変わっている場合だけ送信する．
+
+    Attributes
+    ----------
+    Threshold:float
+        すぐに送信するduty比の変化の大きさ
+    Interval:float
+        変化が小さくても送信するまでの時間[s]．0以下なら時間では送信しない
+    LastDutyRatio:float or None
+        最後に送信したduty比．Noneならまだ送信していない
+    LastTime:float
+        最後に送信した時刻[s]
+    SentCount:int
+        送信を許した回数
+    SuppressedCount:int
+        送信を抑えた回数
+    '''
+
+    def __init__(self,Threshold=0.02,Interval=0.1):
+        '''
+        Parameters
+        ----------
+        Threshold:float default=0.02
+            すぐに送信するduty比の変化の大きさ
+        Interval:float default=0.1
+            変化が小さくても送信するまでの時間[s]
+        '''
+        self.Threshold  = float(Threshold)
+        self.Interval   = float(Interval)
+        self.Reset()
+
+    def Reset(self):
+        '''
+        最後に送信したduty比と各カウンタを初期化する．
+        '''
+        self.LastDutyRatio      = None
+        self.LastTime           = 0.0
+        self.SentCount          = 0
+        self.SuppressedCount    = 0
+
+    def Accept(self,DutyRatio,t):
+        '''
+        duty比を送信するかどうか判断する．送信する場合は送信したものとして記録する．
+
+        Parameters
+        ----------
+        DutyRatio:float
+            送信しようとしているduty比
+        t:float
+            送信しようとしている時刻[s]
+
+        Returns
+        -------
+        ret:boolean
+            送信する場合True
+        '''
+        if self.LastDutyRatio is not None:
+            change = abs(DutyRatio-self.LastDutyRatio)
+            if change == 0 or (change < self.Threshold and \
+                (self.Interval <= 0 or t-self.LastTime < self.Interval)):
+                self.SuppressedCount += 1
+                return False
+        self.LastDutyRatio  = DutyRatio
+        self.LastTime       = t
+        self.SentCount      += 1
+        return True
+
+    def GetCounters(self):
+        '''
+        各カウンタを返す．
+
+        Returns
+        -------
+        SentCount:int
+            送信を許した回数
+        SuppressedCount:int
+            送信を抑えた回数
+        '''
+        return self.SentCount,self.SuppressedCount
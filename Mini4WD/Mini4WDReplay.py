@@ -0,0 +1,293 @@
+import cv2
+import os
+import math
+import time
+import numpy as np
+from Mini4WDException import InvalidImageFile
+
+class Mini4WDReplayCapture():
+    '''
+    録画した映像もしくは画像を保存したフォルダからフレームを読み込み，
+    cv2.VideoCaptureの代わりにMini4WDDetectorへ渡すクラス．
+    カメラやミニ四駆がなくても同じ映像で検知を繰り返し実行できる．
+
+    Attributes
+    ----------
+    Source:string
+        映像ファイルのパスもしくは画像を保存したフォルダのパス
+    Clock:string
+        フレームを渡す速さ．以下のいずれか
+        fast:待たずにできるだけ速く渡す
+        realtime:映像のFPSに合わせて待ってから渡す
+    FPS:float
+        映像のFPS
+    FrameFiles:list context=string or None
+        フォルダから読み込む場合の画像のパスのリスト
+    Video:cv2.VideoCapture or None
+        映像ファイルから読み込む場合のインスタンス
+    FrameNum:int
+        これまでに渡したフレーム数
+    StartTime:float or None
+        最初のフレームを渡した時刻[s]．フレームの時刻の基準とする
+    IsOpened:boolean
+        まだフレームが残っているかどうか
+    '''
+
+    ImageExtensions = ('.jpg','.jpeg','.png','.bmp')
+
+    def __init__(self,Source,Clock='fast',FPS=None):
+        '''
+        Parameters
+        ----------
+        Source:string
+            映像ファイルのパスもしくは画像を保存したフォルダのパス
+        Clock:string default='fast'
+            フレームを渡す速さ(fast,realtime)
+        FPS:float default=None
+            映像のFPS．Noneなら映像ファイルから取得し，フォルダの場合は30とする
+
+        Throws
+        ------
+        InvalidImageFile:
+            映像もしくはフォルダが開けなかった場合
+        '''
+        self.Source         = Source
+        self.Clock          = Clock
+        self.FrameFiles     = None
+        self.Video          = None
+        self.FrameNum       = 0
+        self.StartTime      = None
+        if os.path.isdir(Source):
+            self.FrameFiles = sorted([os.path.join(Source,name) for name in os.listdir(Source)\
+                                if os.path.splitext(name)[1].lower() in self.ImageExtensions])
+            self.FPS        = 30.0 if FPS is None else float(FPS)
+            self.IsOpened   = len(self.FrameFiles) > 0
+        else:
+            self.Video      = cv2.VideoCapture(Source)
+            fps             = self.Video.get(cv2.CAP_PROP_FPS)
+            self.FPS        = float(FPS) if FPS is not None else (fps if fps > 0 else 30.0)
+            self.IsOpened   = self.Video.isOpened()
+        if not self.IsOpened:
+            raise InvalidImageFile
+
+    def isOpened(self):
+        return self.IsOpened
+
+    def read(self):
+        '''
+        次のフレームを読み込む．realtimeの場合は映像の時刻になるまで待つ．
+
+        Returns
+        -------
+        ret:boolean
+            フレームを読み込めたかどうか．最後まで読み込んだ場合はFalse
+        frame:array_like
+            読み込んだフレーム
+        '''
+        if not self.IsOpened:
+            return False,None
+        if self.FrameFiles is not None:
+            if self.FrameNum >= len(self.FrameFiles):
+                self.IsOpened = False
+                return False,None
+            frame = cv2.imread(self.FrameFiles[self.FrameNum])
+            ret   = frame is not None
+        else:
+            ret, frame = self.Video.read()
+        if not ret:
+            self.IsOpened = False
+            return False,None
+
+        if self.StartTime is None:
+            self.StartTime = time.perf_counter()
+        elif self.Clock == 'realtime':
+            wait = self.StartTime+self.FrameNum/self.FPS-time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        self.FrameNum += 1
+        return True,frame
+
+    def get(self,propId):
+        '''
+        cv2.VideoCapture.getのうち，フレーム数，FPS，現在のフレーム番号を返す．
+        '''
+        if propId == cv2.CAP_PROP_FRAME_COUNT:
+            if self.FrameFiles is not None:
+                return float(len(self.FrameFiles))
+            return self.Video.get(cv2.CAP_PROP_FRAME_COUNT)
+        if propId == cv2.CAP_PROP_FPS:
+            return self.FPS
+        if propId == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.FrameNum)
+        return 0.0
+
+    def release(self):
+        self.IsOpened = False
+        if self.Video is not None:
+            self.Video.release()
+
+    def GetFrameNum(self):
+        '''
+        これまでに渡したフレーム数を返す
+        '''
+        return self.FrameNum
+
+    def GetElapsedTime(self):
+        '''
+        最初のフレームを渡してからの経過時間[s]を返す
+        '''
+        if self.StartTime is None:
+            return 0.0
+        return time.perf_counter()-self.StartTime
+
+    def GetFrameTime(self):
+        '''
+        最後に渡したフレームの映像の時刻を返す．最初のフレームを渡した時刻にフレームの番号/FPSを足したもので，
+        fastの場合も実際に渡した時刻ではなく映像の間隔になるので，予測や速度の推定が処理の速さに左右されない．
+
+        Returns
+        -------
+        t:float
+            フレームの時刻[s](time.perf_counterと同じ基準)．まだ渡していなければ今の時刻
+        '''
+        if self.StartTime is None:
+            return time.perf_counter()
+        return self.StartTime+(self.FrameNum-1)/self.FPS
+
+class Mini4WDSyntheticCapture():
+    '''
+    ミニ四駆に見立てた長方形が楕円のコースを周回する映像を作成し，
+    cv2.VideoCaptureの代わりに渡すクラス．
+    最初のStillFrames枚は長方形を描かないので，その間に背景画像を取得できる．
+    CarCountを2以上にすると，コースを等間隔に分けた位置から同じ速さで周回する長方形を描く．
+
+    Attributes
+    ----------
+    Background:array_like
+        乱数で作成した背景画像
+    Center:tuple
+        コースの中心の座標
+    Radius:tuple
+        コースの横と縦の半径[pixel]
+    CarSize:tuple
+        長方形の横と縦の長さ[pixel]
+    FramesPerLap:int
+        一周にかかるフレーム数
+    CarCount:int
+        描く長方形の数
+    FrameCount:int
+        作成するフレーム数(背景だけのフレームを除く)
+    StillFrames:int
+        最初に背景だけを渡すフレーム数
+    FPS:float
+        フレームの時刻の間隔を決めるFPS
+    FrameNum:int
+        これまでに渡したフレーム数
+    StartTime:float or None
+        最初のフレームを渡した時刻[s]．フレームの時刻の基準とする
+    '''
+
+    def __init__(self,width=1280,height=720,Center=None,Radius=None,CarSize=(12,8),FramesPerLap=120,FrameCount=1200,StillFrames=60,CarCount=1,FPS=30.0):
+        '''
+        Parameters
+        ----------
+        width:int default=1280
+            フレームの横の長さ
+        height:int default=720
+            フレームの縦の長さ
+        Center:tuple default=None
+            コースの中心の座標．Noneならフレームの中心
+        Radius:tuple default=None
+            コースの横と縦の半径．Noneならフレームの大きさの0.4倍
+        CarSize:tuple default=(12,8)
+            長方形の横と縦の長さ
+        FramesPerLap:int default=120
+            一周にかかるフレーム数
+        FrameCount:int default=1200
+            作成するフレーム数(背景だけのフレームを除く)
+        StillFrames:int default=60
+            最初に背景だけを渡すフレーム数
+        CarCount:int default=1
+            描く長方形の数
+        FPS:float default=30.0
+            フレームの時刻の間隔を決めるFPS
+        '''
+        rng                 = np.random.RandomState(0)
+        self.Background     = cv2.GaussianBlur(rng.randint(60,120,(height,width,3)).astype(np.uint8),(5,5),0)
+        self.Center         = (width/2,height/2) if Center is None else Center
+        self.Radius         = (width*0.4,height*0.4) if Radius is None else Radius
+        self.CarSize        = CarSize
+        self.FramesPerLap   = int(FramesPerLap)
+        self.FrameCount     = int(FrameCount)
+        self.StillFrames    = int(StillFrames)
+        self.CarCount       = max(int(CarCount),1)
+        self.FPS            = float(FPS)
+        self.FrameNum       = 0
+        self.StartTime      = None
+        self.Source         = None
+
+    def isOpened(self):
+        return self.FrameNum < self.StillFrames+self.FrameCount
+
+    def read(self):
+        '''
+        次のフレームを作成する．
+
+        Returns
+        -------
+        ret:boolean
+            フレームを作成できたかどうか．最後まで渡した場合はFalse
+        frame:array_like
+            作成したフレーム
+        '''
+        if not self.isOpened():
+            return False,None
+        frame = self.Background.copy()
+        if self.FrameNum >= self.StillFrames:
+            w, h    = self.CarSize
+            for gx, gy in self.GetPositions(self.FrameNum-self.StillFrames):
+                gx, gy = int(gx), int(gy)
+                cv2.rectangle(frame,(gx-w//2,gy-h//2),(gx+w//2,gy+h//2),(240,240,240),-1)
+        if self.StartTime is None:
+            self.StartTime = time.perf_counter()
+        self.FrameNum += 1
+        return True,frame
+
+    def GetPositions(self,n):
+        '''
+        背景だけのフレームを除いてn番目のフレームにおける，各長方形の中心の座標を返す．
+
+        Returns
+        -------
+        positions:list context=tuple
+            長方形ごとの(gx,gy)．1台目から順
+        '''
+        positions = list()
+        for i in range(self.CarCount):
+            theta   = 2*math.pi*(n/self.FramesPerLap+i/self.CarCount)
+            positions.append((self.Center[0]+self.Radius[0]*math.cos(theta),\
+                            self.Center[1]+self.Radius[1]*math.sin(theta)))
+        return positions
+
+    def get(self,propId):
+        if propId == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.StillFrames+self.FrameCount)
+        if propId == cv2.CAP_PROP_FPS:
+            return self.FPS
+        if propId == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.FrameNum)
+        return 0.0
+
+    def release(self):
+        self.FrameNum = self.StillFrames+self.FrameCount
+
+    def GetFrameNum(self):
+        return self.FrameNum
+
+    def GetFrameTime(self):
+        '''
+        最後に渡したフレームの時刻を返す．Mini4WDReplayCapture.GetFrameTimeと同じく映像の間隔で進む
+        '''
+        if self.StartTime is None:
+            return time.perf_counter()
+        return self.StartTime+(self.FrameNum-1)/self.FPS
@@ -0,0 +1,177 @@
+import numpy as np
+
+class Mini4WDDutyScheduler():
+    '''
+    推定した速度とコマンドの遅れから，ミニ四駆が次に入るエリアを予測し，
+    境界を越える前にそのエリアのduty比を送信するためのクラス．
+    現在の位置から(遅れ+LeadTime)秒後までの直線上をSteps点調べ，
+    最初に現在と違うエリアになった点のエリアを送信すべきエリアとする．
+    違うエリアがなければ現在のエリアを送信すべきエリアとする．
+
+    Attributes
+    ----------
+    M4DLT:Mini4WDLocationTable
+        座標からエリアとduty比を求める表
+    LeadTime:float
+        コマンドの遅れに加えて，どれだけ早く送信するか[s]
+    MaxHorizon:float
+        予測する時間の上限[s]
+    Steps:int
+        予測する直線上を調べる点の数
+    Pending:tuple or None
+        予測して先に送信したエリア(mapX,mapY)．まだ入っていない場合のみ
+    PendingTime:float
+        Pendingを送信した時刻[s]
+    ScheduledCount:int
+        予測して先に送信した回数
+    HitCount:int
+        予測したエリアに実際に入った回数
+    MissCount:int
+        予測したエリアに入らなかった(違うエリアに入ったか予測を取り消した)回数
+    TotalLead:float
+        予測したエリアに入った場合の，送信してから入るまでの時間の合計[s]
+    '''
+
+    def __init__(self,M4DLT,LeadTime=0.05,MaxHorizon=0.5,Steps=16):
+        '''
+        Parameters
+        ----------
+        M4DLT:Mini4WDLocationTable
+            座標からエリアとduty比を求める表
+        LeadTime:float default=0.05
+            コマンドの遅れに加えて，どれだけ早く送信するか[s]
+        MaxHorizon:float default=0.5
+            予測する時間の上限[s]
+        Steps:int default=16
+            予測する直線上を調べる点の数
+        '''
+        self.M4DLT      = M4DLT
+        self.LeadTime   = float(LeadTime)
+        self.MaxHorizon = float(MaxHorizon)
+        self.Steps      = max(int(Steps),1)
+        self.Reset()
+
+    def Reset(self):
+        '''
+        予測の状態と各カウンタを初期化する．
+        '''
+        self.Current        = None
+        self.Pending        = None
+        self.PendingTime    = 0.0
+        self.ScheduledCount = 0
+        self.HitCount       = 0
+        self.MissCount      = 0
+        self.TotalLead      = 0.0
+
+    def PredictNextCell(self,gx,gy,vx,vy,horizon):
+        '''
+        現在の位置からhorizon秒後までに最初に入るエリアを求める．
+
+        Parameters
+        ----------
+        gx:float
+            ミニ四駆のX座標
+        gy:float
+            ミニ四駆のY座標
+        vx:float
+            X方向の速度[pixel/s]
+        vy:float
+            Y方向の速度[pixel/s]
+        horizon:float
+            予測する時間[s]
+
+        Returns
+        -------
+        cell:int or None
+            最初に入るエリアの番号(mapY*DivMapW+mapX)．入らない場合はNone
+        i:int
+            そのエリアの縦のピクセル
+        j:int
+            そのエリアの横のピクセル
+        '''
+        CellTable   = self.M4DLT.GetCellTable()
+        height,width= CellTable.shape
+        ts          = np.linspace(0.0,horizon,self.Steps+1)[1:]
+        js          = np.clip((gx+vx*ts).astype(np.int32),0,width-1)
+        iss         = np.clip((gy+vy*ts).astype(np.int32),0,height-1)
+        current     = CellTable[min(max(int(gy),0),height-1),min(max(int(gx),0),width-1)]
+        cells       = CellTable[iss,js]
+        changed     = np.flatnonzero(cells != current)
+        if len(changed) == 0:
+            return None,-1,-1
+        k = changed[0]
+        return int(cells[k]),int(iss[k]),int(js[k])
+
+    def Update(self,gx,gy,vx,vy,t,Latency=0.0):
+        '''
+        検知した位置と推定した速度から，今送信すべきエリアとduty比を求める．
+
+        Parameters
+        ----------
+        gx:float
+            ミニ四駆のX座標
+        gy:float
+            ミニ四駆のY座標
+        vx:float
+            X方向の速度[pixel/s]
+        vy:float
+            Y方向の速度[pixel/s]
+        t:float
+            位置を検知したフレームの時刻[s]
+        Latency:float default=0.0
+            フレームの取得からコマンドの送信が終わるまでの時間[s]
+
+        Returns
+        -------
+        mapX:int
+            送信すべきエリアの横の番号
+        mapY:int
+            送信すべきエリアの縦の番号
+        DutyRatio:float
+            送信すべきduty比
+        '''
+        mapX,mapY,DutyRatio = self.M4DLT.Lookup(gx,gy)
+        if self.Pending is not None:
+            if (mapX,mapY) == self.Pending:                             # 予測したエリアに入った
+                self.HitCount   += 1
+                self.TotalLead  += t-self.PendingTime
+                self.Pending    = None
+            elif (mapX,mapY) != self.Current:                           # 違うエリアに入った
+                self.MissCount  += 1
+                self.Pending    = None
+        self.Current = (mapX,mapY)
+
+        horizon         = min(Latency+self.LeadTime,self.MaxHorizon)
+        cell, i, j      = self.PredictNextCell(gx,gy,vx,vy,horizon)
+        if cell is None:
+            if self.Pending is not None:                                # 予測を取り消す
+                self.MissCount  += 1
+                self.Pending    = None
+            return mapX,mapY,DutyRatio
+        DivMapW = self.M4DLT.DivMapW
+        nextCell= (cell%DivMapW,cell//DivMapW)
+        if nextCell != self.Pending:
+            if self.Pending is not None:
+                self.MissCount  += 1
+            self.Pending        = nextCell
+            self.PendingTime    = t
+            self.ScheduledCount += 1
+        return nextCell[0],nextCell[1],float(self.M4DLT.GetDutyTable()[i,j])
+
+    def GetCounters(self):
+        '''
+        予測の各カウンタを返す．
+
+        Returns
+        -------
+        ScheduledCount:int
+            予測して先に送信した回数
+        HitCount:int
+            予測したエリアに実際に入った回数
+        MissCount:int
+            予測したエリアに入らなかった回数
+        MeanLead:float
+            予測したエリアに入った場合の，送信してから入るまでの時間の平均[ms]
+        '''
+        MeanLead = self.TotalLead/self.HitCount*1000 if self.HitCount > 0 else 0.0
+        return self.ScheduledCount,self.HitCount,self.MissCount,MeanLead
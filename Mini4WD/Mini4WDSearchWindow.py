@@ -0,0 +1,134 @@
+class Mini4WDSearchWindow():
+    '''
+    ミニ四駆を探索する範囲（探索窓）を管理するクラス．
+    前回のミニ四駆の位置の周りだけを切り出して検知を行い，
+    見つからなかったときは窓を広げ，MaxMiss回連続で見つからなかったときは
+    フレーム全体を探索する．
+
+    Attributes
+    ----------
+    Size:int
+        探索窓の初期の大きさ（中心からの半分の幅）[pixel]
+    Growth:float
+        見つからなかったときに探索窓を広げる倍率
+    MaxMiss:int
+        フレーム全体の探索に切り替えるまでに連続して見つからなかった回数
+    CurrentSize:float
+        現在の探索窓の大きさ（中心からの半分の幅）[pixel]
+    MissCount:int
+        連続して見つからなかった回数
+    IsFullFrame:boolean
+        直前のGetWindowでフレーム全体を探索したかどうか
+    HitCount:int
+        探索窓の中で見つかった回数
+    TotalMissCount:int
+        探索窓の中で見つからなかった回数
+    FallbackCount:int
+        フレーム全体の探索に切り替えた回数
+    ProcessedPixels:int
+        探索したピクセル数の合計
+    TotalPixels:int
+        フレーム全体を探索した場合のピクセル数の合計
+    '''
+
+    def __init__(self,Size=40,Growth=1.5,MaxMiss=5):
+        '''
+        Parameters
+        ----------
+        Size:int default=40
+            探索窓の初期の大きさ（中心からの半分の幅）[pixel]
+        Growth:float default=1.5
+            見つからなかったときに探索窓を広げる倍率
+        MaxMiss:int default=5
+            フレーム全体の探索に切り替えるまでに連続して見つからなかった回数
+        '''
+        self.Size               = int(Size)
+        self.Growth             = float(Growth)
+        self.MaxMiss            = int(MaxMiss)
+        self.CurrentSize        = float(self.Size)
+        self.MissCount          = 0
+        self.IsFullFrame        = False
+        self.HitCount           = 0
+        self.TotalMissCount     = 0
+        self.FallbackCount      = 0
+        self.ProcessedPixels    = 0
+        self.TotalPixels        = 0
+
+    def GetWindow(self,gx,gy,shape):
+        '''
+        今回探索する範囲を返す．
+
+        Parameters
+        ----------
+        gx:int
+            探索窓の中心のX座標
+        gy:int
+            探索窓の中心のY座標
+        shape:tuple
+            探索するフレームのshape
+
+        Returns
+        -------
+        Window:tuple or None
+            探索窓の(左,上,右,下)の座標．
+            フレーム全体を探索する場合はNone
+        '''
+        height, width       = shape[0], shape[1]
+        self.TotalPixels    += height*width
+        self.IsFullFrame    = self.MissCount >= self.MaxMiss or gx < 0 or gy < 0
+        if self.IsFullFrame:
+            self.ProcessedPixels += height*width
+            return None
+
+        size    = int(self.CurrentSize)
+        x0      = min(max(int(gx)-size,0),width-1)
+        y0      = min(max(int(gy)-size,0),height-1)
+        x1      = max(min(int(gx)+size+1,width),x0+1)
+        y1      = max(min(int(gy)+size+1,height),y0+1)
+        self.ProcessedPixels += (x1-x0)*(y1-y0)
+        return x0,y0,x1,y1
+
+    def Hit(self):
+        '''
+        ミニ四駆が見つかったときに呼び出し，探索窓を初期の大きさに戻す．
+        '''
+        if not self.IsFullFrame:
+            self.HitCount += 1
+        self.CurrentSize    = float(self.Size)
+        self.MissCount      = 0
+
+    def Miss(self):
+        '''
+        ミニ四駆が見つからなかったときに呼び出し，探索窓を広げる．
+        '''
+        if self.IsFullFrame:
+            return
+        self.TotalMissCount += 1
+        self.MissCount      += 1
+        self.CurrentSize    *= self.Growth
+        if self.MissCount == self.MaxMiss:
+            self.FallbackCount += 1
+
+    def Reset(self):
+        '''
+        探索窓と各カウンタを初期化する．
+        '''
+        self.__init__(self.Size,self.Growth,self.MaxMiss)
+
+    def GetCounters(self):
+        '''
+        探索窓の調整のためのカウンタを返す．
+
+        Returns
+        -------
+        HitCount:int
+            探索窓の中で見つかった回数
+        TotalMissCount:int
+            探索窓の中で見つからなかった回数
+        FallbackCount:int
+            フレーム全体の探索に切り替えた回数
+        PixelRatio:float
+            フレーム全体を探索した場合に対する探索したピクセル数の割合
+        '''
+        PixelRatio = self.ProcessedPixels/self.TotalPixels if self.TotalPixels > 0 else 1.0
+        return self.HitCount,self.TotalMissCount,self.FallbackCount,PixelRatio
@@ -0,0 +1,182 @@
+import csv
+import threading
+import numpy as np
+from Mini4WDLogWriter import Mini4WDLogWriter
+from Mini4WDBinaryLog import Mini4WDBinaryLog
+
+def CreateSensorDtype(Channels):
+    '''
+    ミニ四駆から送られるセンサーの1サンプルの型と，センサーログの1行の型を作る．
+
+    Parameters
+    ----------
+    Channels:list context=string
+        センサーの名前(例えばaccX,accY,accZ,current)
+
+    Returns
+    -------
+    PacketDtype:numpy.dtype
+        1サンプルの型．ミニ四駆の時刻tick(uint32,マイクロ秒)とセンサーごとのfloat32を
+        リトルエンディアンで並べたもの．Javaプログラムはこの並びのbyte[]を送る
+    RecordDtype:numpy.dtype
+        センサーログの1行の型．PacketDtypeの前に受け取った時刻time(float64,time.time)を加えたもの
+    '''
+    PacketDtype = np.dtype([('tick','<u4')]+[(name,'<f4') for name in Channels])
+    RecordDtype = np.dtype([('time','<f8')]+[(name,PacketDtype[name]) for name in PacketDtype.names])
+    return PacketDtype,RecordDtype
+
+class Mini4WDSensorLog():
+    '''
+    ミニ四駆のセンサーの値をまとめて受け取り，別スレッドでセンサーログ(_sensor)に書き込むクラス．
+    JavaプログラムはAppendSensorBatchでPacketDtypeの並びのbyte[]をまとめて送る．
+    受け取った値はnp.frombufferでそのまま読み，あらかじめ確保した配列にコピーして，
+    いっぱいになるかFlushInterval秒経ったら書き込みのスレッドに預ける．
+    コールバックはpy4jのスレッドで呼び出されるので，検知のスレッドには関わらない．
+
+    Attributes
+    ----------
+    M4DL:Mini4WDLogger
+        ログファイルを作るインスタンス
+    PacketDtype:numpy.dtype
+        ミニ四駆から送られる1サンプルの型
+    RecordDtype:numpy.dtype
+        センサーログの1行の型
+    Binary:boolean
+        センサーログをバイナリ形式(.bin)で書き込むかどうか．偽ならcsv形式
+    File:Mini4WDLogRotator
+        センサーログのファイル
+    M4DLW:Mini4WDLogWriter
+        センサーログを書き込むスレッド
+    M4DBL:Mini4WDBinaryLog
+        受け取った値を溜める配列
+    BatchCount:int
+        受け取ったまとまりの数
+    SampleCount:int
+        受け取ったサンプルの数
+    TruncatedBytes:int
+        サンプルの大きさに満たずに捨てた末尾のバイト数
+    MaxBatch:int
+        1つのまとまりのサンプルの数の最大値
+    '''
+
+    def __init__(self,M4DL,Channels,Binary=True,ChunkSize=8192,FlushInterval=1.0,QueueSize=64):
+        '''
+        Parameters
+        ----------
+        M4DL:Mini4WDLogger
+            ログファイルを作るインスタンス
+        Channels:list context=string
+            センサーの名前
+        Binary:boolean default=True
+            センサーログをバイナリ形式(.bin)で書き込むかどうか
+        ChunkSize:int default=8192
+            一度に確保する行の数
+        FlushInterval:float default=1.0
+            前回預けてからこの時間[s]経ったら，いっぱいでなくても書き込む
+        QueueSize:int default=64
+            書き込みのスレッドに預けられる配列の数の上限
+        '''
+        self.M4DL                           = M4DL
+        self.PacketDtype,self.RecordDtype   = CreateSensorDtype(Channels)
+        self.Binary                         = Binary
+        if self.Binary:
+            self.File                       = self.M4DL.CreateRotator('sensor','.bin',True)
+        else:
+            self.File                       = self.M4DL.CreateRotator('sensor','.csv',False,self.RecordDtype.names)
+        self.M4DLW                          = Mini4WDLogWriter(self.WriteChunks,QueueSize,1,FlushInterval,Tick=self.OnWriterTick)
+        self.M4DBL                          = Mini4WDBinaryLog(self.M4DLW.Append,ChunkSize,FlushInterval,self.RecordDtype)
+        self.Lock                           = threading.Lock()
+        self.BatchCount                     = 0
+        self.SampleCount                    = 0
+        self.TruncatedBytes                 = 0
+        self.MaxBatch                       = 0
+        self.M4DLW.Start()
+
+    def AppendSensorBatch(self,data):
+        '''
+        PacketDtypeの並びのbyte[]をまとめて受け取る．Javaプログラムから呼び出される．
+
+        Parameters
+        ----------
+        data:bytes
+            PacketDtypeのサンプルを並べたもの
+
+        Returns
+        -------
+        count:int
+            受け取ったサンプルの数
+        '''
+        size    = self.PacketDtype.itemsize
+        count   = len(data)//size
+        samples = np.frombuffer(data,dtype=self.PacketDtype,count=count)
+        self.M4DBL.Extend(samples)
+        with self.Lock:
+            self.BatchCount     += 1
+            self.SampleCount    += count
+            self.TruncatedBytes += len(data)-count*size
+            if count > self.MaxBatch:
+                self.MaxBatch = count
+        return count
+
+    def AppendSensorLog(self,array):
+        '''
+        1サンプルだけを受け取る．
+
+        Parameters
+        ----------
+        array:list
+            tickとセンサーごとの値
+        '''
+        self.M4DBL.Append(array)
+        with self.Lock:
+            self.SampleCount += 1
+
+    def OnWriterTick(self):
+        '''
+        書き込みのスレッドから定期的に呼び出され，センサーの値が届かなくなっても
+        前回渡してからFlushInterval秒経った値を書き込みに渡す．
+        '''
+        self.M4DBL.FlushIfDue()
+
+    def WriteChunks(self,chunks):
+        '''
+        溜めた配列をセンサーログに書き込む．書き込みのスレッドから呼び出される．
+        '''
+        f = self.File.GetFile()
+        if self.Binary:
+            for chunk in chunks:
+                f.write(chunk.tobytes())
+        else:
+            cout = csv.writer(f)
+            for chunk in chunks:
+                cout.writerows(zip(*(chunk[name].tolist() for name in self.RecordDtype.names)))
+        f.flush()
+
+    def Close(self):
+        '''
+        溜めた値をすべて書き込んでからセンサーログを閉じ，受け取りの各カウンタを操作ログに記録する．
+        '''
+        self.M4DBL.Flush()
+        self.M4DLW.Stop()
+        self.File.Close()
+        self.M4DL.WriteOperationLog(\
+            'Sensor log : batches {} , samples {} , truncated {} bytes , max batch {} , writer dropped {} chunks'\
+            .format(*self.GetCounters(),self.M4DLW.GetCounters()[7]))
+
+    def GetCounters(self):
+        '''
+        受け取りの各カウンタを返す．
+
+        Returns
+        -------
+        BatchCount:int
+            受け取ったまとまりの数
+        SampleCount:int
+            受け取ったサンプルの数
+        TruncatedBytes:int
+            サンプルの大きさに満たずに捨てた末尾のバイト数
+        MaxBatch:int
+            1つのまとまりのサンプルの数の最大値
+        '''
+        with self.Lock:
+            return self.BatchCount,self.SampleCount,self.TruncatedBytes,self.MaxBatch
@@ -0,0 +1,143 @@
+import time
+
+class Mini4WDTracker():
+    '''
+    ミニ四駆の位置と速度を等速直線運動のα-βフィルタで推定し，
+    次のフレームでの位置を予測するクラス．
+    状態はState一つにまとめて代入するので，検知のスレッド以外から
+    GetPredictedPositionを呼び出しても途中の値を読むことはない．
+
+    Attributes
+    ----------
+    Alpha:float
+        位置の補正の重み
+    Beta:float
+        速度の補正の重み
+    MaxCoast:float
+        観測がないまま速度で外挿を続ける最大の時間[s]．
+        これを超えた場合は最後の位置で止まっているものとみなす
+    State:tuple or None
+        (x,y,vx,vy,t)の組．位置[pixel]，速度[pixel/s]とその時刻[s]．
+        まだ観測がない場合はNone
+    '''
+
+    def __init__(self,Alpha=0.75,Beta=0.45,MaxCoast=0.5):
+        '''
+        Parameters
+        ----------
+        Alpha:float default=0.75
+            位置の補正の重み
+        Beta:float default=0.45
+            速度の補正の重み
+        MaxCoast:float default=0.5
+            観測がないまま速度で外挿を続ける最大の時間[s]
+        '''
+        self.Alpha      = float(Alpha)
+        self.Beta       = float(Beta)
+        self.MaxCoast   = float(MaxCoast)
+        self.State      = None
+
+    def Reset(self,x=None,y=None,t=None):
+        '''
+        推定した状態を初期化する．座標を指定した場合は
+        その位置に速度0で止まっているものとする．
+
+        Parameters
+        ----------
+        x:float default=None
+            初期位置のX座標
+        y:float default=None
+            初期位置のY座標
+        t:float default=None
+            初期位置の時刻[s]．Noneなら現在時刻
+        '''
+        if x is None or y is None:
+            self.State = None
+        else:
+            self.State = (float(x),float(y),0.0,0.0,time.perf_counter() if t is None else t)
+
+    def Predict(self,t):
+        '''
+        時刻tにおけるミニ四駆の位置を予測する．
+
+        Parameters
+        ----------
+        t:float
+            予測する時刻[s](time.perf_counterと同じ基準)
+
+        Returns
+        -------
+        px:float
+            予測したX座標．まだ観測がない場合は-1
+        py:float
+            予測したY座標．まだ観測がない場合は-1
+        '''
+        State = self.State
+        if State is None:
+            return -1,-1
+        x, y, vx, vy, t0 = State
+        dt = min(max(t-t0,0.0),self.MaxCoast)
+        return x+vx*dt,y+vy*dt
+
+    def Update(self,gx,gy,t):
+        '''
+        観測したミニ四駆の座標で状態を更新する．
+
+        Parameters
+        ----------
+        gx:float
+            観測したX座標
+        gy:float
+            観測したY座標
+        t:float
+            観測した時刻[s]
+        '''
+        State = self.State
+        if State is None:
+            self.State = (float(gx),float(gy),0.0,0.0,t)
+            return
+        x, y, vx, vy, t0 = State
+        dt = t-t0
+        if dt <= 0:
+            return
+        if dt > self.MaxCoast:                      # 長く見失っていた場合は速度を信用しない
+            self.State = (float(gx),float(gy),0.0,0.0,t)
+            return
+        px, py  = x+vx*dt, y+vy*dt
+        rx, ry  = gx-px, gy-py
+        self.State = (px+self.Alpha*rx, py+self.Alpha*ry,\
+                        vx+self.Beta*rx/dt, vy+self.Beta*ry/dt, t)
+
+    def GetPredictedPosition(self,Milliseconds=0):
+        '''
+        現在からMilliseconds[ms]後のミニ四駆の位置を予測する．
+
+        Parameters
+        ----------
+        Milliseconds:float default=0
+            何ミリ秒後の位置を予測するか
+
+        Returns
+        -------
+        px:float
+            予測したX座標．まだ観測がない場合は-1
+        py:float
+            予測したY座標．まだ観測がない場合は-1
+        '''
+        return self.Predict(time.perf_counter()+Milliseconds/1000)
+
+    def GetVelocity(self):
+        '''
+        推定したミニ四駆の速度を返す．
+
+        Returns
+        -------
+        vx:float
+            X方向の速度[pixel/s]
+        vy:float
+            Y方向の速度[pixel/s]
+        '''
+        State = self.State
+        if State is None:
+            return 0.0,0.0
+        return State[2],State[3]
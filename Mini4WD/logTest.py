@@ -1,24 +1,76 @@
-from Mini4WDDetector import Mini4WDDetector
+import time
+import argparse
+import threading
+import numpy as np
 from Mini4WDInitializer import Mini4WDInitializer
 from Mini4WDLogger import Mini4WDLogger
-from Mini4WDHandler import Mini4WDHandler,Mini4WDHandlerForTest
-from Mini4WDGUI import Mini4WDGUI
-import Mini4WDException
 from py4j.java_gateway import JavaGateway, CallbackServerParameters
 
+def PushSyntheticSamples(M4DL,PacketDtype,seconds,rate,batch):
+    '''
+    Javaプログラムの代わりに，rate[Hz]のサンプルをbatch個ずつまとめてAppendSensorBatchに送る．
+
+    Returns
+    -------
+    count:int
+        送ったサンプルの数
+    '''
+    samples     = np.zeros(batch,dtype=PacketDtype)
+    interval    = batch/rate
+    count       = 0
+    start       = time.perf_counter()
+    while time.perf_counter()-start < seconds:
+        tick                = int((time.perf_counter()-start)*1e6)
+        samples['tick']     = tick+np.arange(batch,dtype=np.uint32)*int(1e6/rate)
+        for name in PacketDtype.names[1:]:
+            samples[name]   = np.random.standard_normal(batch)
+        count += M4DL.AppendSensorBatch(samples.tobytes())
+        next_time = start+(count/rate)
+        time.sleep(max(next_time-time.perf_counter(),0))
+    return count
+
 def main():
-    M4DIr   = Mini4WDInitializer('./.setting')      # 初期設定を呼び出す者
+    '''
+    センサーログの受け取りを確かめる．
+    --syntheticを指定した場合はJavaプログラムを使わずに，別スレッドから
+    rate[Hz]のサンプルをまとめて送り，受け取れた数を表示する．
+    指定しない場合はMini4WDLoggerをエントリーポイントとしてコールバックサーバを起動し，
+    JavaプログラムからAppendSensorBatchが呼ばれるのを待つ(Ctrl+Cで終了)．
+
+    python logTest.py [--synthetic 10] [--rate 1000] [--batch 50]
+    '''
+    parser = argparse.ArgumentParser(description='Check sensor telemetry ingestion.')
+    parser.add_argument('--synthetic',type=float,default=0,help='push synthetic samples for this many seconds instead of waiting for Java')
+    parser.add_argument('--rate',type=float,default=1000,help='samples per second')
+    parser.add_argument('--batch',type=int,default=50,help='samples per batch')
+    parser.add_argument('--setting',default='./.setting')
+    args = parser.parse_args()
+
+    M4DIr   = Mini4WDInitializer(args.setting)      # 初期設定を呼び出す者
     M4DL    = Mini4WDLogger(M4DIr)                  # ログをとるクラスのインスタンス
-    # M4DL.WriteOperationLog('test')
-    # test=[2, 1, 260.5, 61.5, 3, 3, 2.5]
-    
-    # test2=[2, 1, 260.5, 62.5, 3, 3, 1.5]
-    # M4DL.UpdateDetectionLogFile()
-    # M4DL.WriteDetectionLog(test)
-    # M4DL.WriteMini4WDSensorLog(test2)
+    if M4DL.GetM4DSL() is None:
+        print('設定ファイルのSensorLogを1にしてください')
+        return
+    if args.synthetic > 0:
+        PacketDtype = M4DL.GetM4DSL().PacketDtype
+        start       = time.perf_counter()
+        thread      = threading.Thread(target=lambda: print('sent {} samples'\
+                        .format(PushSyntheticSamples(M4DL,PacketDtype,args.synthetic,args.rate,args.batch))))
+        thread.start()
+        thread.join()
+        elapsed     = time.perf_counter()-start
+        batches, samples, truncated, maxBatch = M4DL.GetM4DSL().GetCounters()
+        print('received {} samples in {} batches , {:.0f} samples/s'.format(samples,batches,samples/elapsed))
+        return
     gateway = JavaGateway(
-        callback_server_parameters=CallbackServerParameters(),
+        callback_server_parameters=CallbackServerParameters(port=int(M4DIr.GetFileValue('SensorCallbackPort','0')) or 25336),
         python_server_entry_point=M4DL)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        gateway.shutdown_callback_server()
+        gateway.close()
 
 if __name__=='__main__':
-    main()
\ No newline at end of file
+    main()
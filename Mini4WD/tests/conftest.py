@@ -0,0 +1,53 @@
+import gc
+import os
+import sys
+import pytest
+
+# テストはMini4WDフォルダのモジュールを直接importする
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0,ROOT)
+
+def ReadSetting(path):
+    '''
+    設定ファイルを(キー,値)のリストとして読み込む．
+    '''
+    with open(path,encoding='utf-8') as f:
+        return [line.rstrip('\r\n').split('=',1) for line in f if '=' in line]
+
+def WriteDutyMap(path,DivMapH=5,DivMapW=8):
+    '''
+    エリアごとに異なるduty比(0.1から0.9)のDutyMapを作る．
+    '''
+    with open(path,'w',newline='') as f:
+        for y in range(DivMapH):
+            f.write(','.join('{:.2f}'.format(0.1+0.8*(y*DivMapW+x)/(DivMapH*DivMapW-1)) for x in range(DivMapW))+'\n')
+
+@pytest.fixture(autouse=True)
+def CloseLogs():
+    '''
+    テストで作ったMini4WDLoggerなどを終了時ではなくテストごとに__del__で閉じる．
+    '''
+    yield
+    gc.collect()
+
+@pytest.fixture
+def SettingFile(tmp_path):
+    '''
+    リポジトリの.settingを元に，ログや背景画像を一時フォルダに書き込む設定ファイルを作る．
+    戻り値の関数にキーと値を渡すと上書きした設定ファイルのパスを返す．
+    '''
+    def create(**overrides):
+        WriteDutyMap(str(tmp_path/'dmap.csv'))
+        (tmp_path/'log').mkdir(exist_ok=True)
+        values = dict(ReadSetting(os.path.join(ROOT,'.setting')))
+        values.update({'LogFolderPath':str(tmp_path/'log')+'/','BGSIPath':str(tmp_path/'bgsi.png'),\
+                        'CSVFilePath':str(tmp_path/'dmap.csv'),'TrimTop':'0','TrimBottom':'240',\
+                        'TrimLeft':'0','TrimRight':'320',\
+                        'BGSMethod':'absdiff'})                     # legacyはopencv-contribのcv2.bgsegmが必要
+        values.update({key:str(value) for key, value in overrides.items()})
+        path = tmp_path/'test.setting'
+        with open(str(path),'w',encoding='utf-8') as f:
+            f.write(''.join('{}={}\n'.format(key,value) for key, value in values.items()))
+        return str(path)
+    return create
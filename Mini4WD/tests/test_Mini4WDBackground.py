@@ -0,0 +1,18 @@
+import cv2
+import numpy as np
+import pytest
+from Mini4WDBackground import Mini4WDBackgroundModel
+
+Methods = [method for method in Mini4WDBackgroundModel.Methods if method != 'legacy' or hasattr(cv2,'bgsegm')]
+
+@pytest.mark.parametrize('method',Methods)
+def test_compare_uses_the_selected_method(method):
+    rng         = np.random.RandomState(0)
+    background  = cv2.GaussianBlur(rng.randint(60,120,(120,160,3)).astype(np.uint8),(5,5),0)
+    frame       = background.copy()
+    frame[40:48,50:62] = 240
+    assert cv2.countNonZero(Mini4WDBackgroundModel.Compare(background,background.copy(),method)) == 0
+    assert cv2.countNonZero(Mini4WDBackgroundModel.Compare(background,frame,method)) > 0
+
+def test_legacy_is_the_default_method():
+    assert Mini4WDBackgroundModel.__init__.__defaults__[0] == 'legacy'
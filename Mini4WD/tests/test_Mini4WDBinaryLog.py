@@ -0,0 +1,38 @@
+import os
+import gzip
+import time
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLogger import Mini4WDLogger
+from Mini4WDBinaryLog import DetectionDtype,ReadDetectionLog,ReadDetectionSession
+
+def WaitFor(condition,timeout=3.0):
+    deadline = time.perf_counter()+timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+def test_last_rows_are_written_after_detection_stops(SettingFile):
+    # 検知が止まってAppendが呼ばれなくても，LogFlushInterval秒経てば書き込まれる
+    M4DL = Mini4WDLogger(Mini4WDInitializer(SettingFile(DetectionLogFormat='binary',LogFlushInterval=0.1)))
+    M4DL.UpdateDetectionLogFile()
+    path = M4DL.GetLogFileName()+'_detection_1.bin'
+    M4DL.AppendDetectionLog((1,2,10.0,20.0,12,8,96.0))
+    assert WaitFor(lambda: os.path.getsize(path) == DetectionDtype.itemsize)
+    log  = ReadDetectionLog(path,False)
+    assert (log['mapX'][0],log['mapY'][0],log['xCoordinate'][0]) == (1,2,10.0)
+
+def test_session_reads_each_segment_once(SettingFile):
+    # 圧縮し終えて元のファイルを消す前に読み込んでも，同じ行を二度返さない
+    M4DL = Mini4WDLogger(Mini4WDInitializer(SettingFile(DetectionLogFormat='binary',LogRotateBytes=DetectionDtype.itemsize*2)))
+    M4DL.UpdateDetectionLogFile()
+    for i in range(5):
+        M4DL.AppendDetectionLog((i,0,float(i),0.0,12,8,96.0))
+        M4DL.WriteDetectionLog()
+    M4DL.UpdateDetectionLogFile()                                   # 閉じて圧縮する
+    name = M4DL.GetLogFileName()
+    segment = name+'_detection_1.000.bin'
+    with gzip.open(segment+'.gz','rb') as f:                        # 消す前の元のファイルを戻す
+        with open(segment,'wb') as fout:
+            fout.write(f.read())
+    log  = ReadDetectionSession(name)
+    assert log['mapX'].tolist() == [0,1,2,3,4]
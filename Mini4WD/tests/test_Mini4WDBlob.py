@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from Mini4WDBlob import Mini4WDBlobSelector
+
+def CreateBinaryImage(rects,shape=(120,160)):
+    '''
+    (x,y,w,h)の長方形を前景(255)とした二値画像を作る．
+    '''
+    binaryImage = np.zeros(shape,dtype=np.uint8)
+    for x, y, w, h in rects:
+        binaryImage[y:y+h,x:x+w] = 255
+    return binaryImage
+
+@pytest.mark.parametrize('offset',[(0,0),(30,20)])
+def test_ccl_selects_the_same_blob_as_contour(offset):
+    binaryImage = CreateBinaryImage([(50,40,12,8),(100,90,10,10),(10,10,30,20)])
+    gx_pre, gy_pre = 56+offset[0], 44+offset[1]                    # 1つ目の長方形の中心
+    results = dict()
+    for backend in Mini4WDBlobSelector.Backends:
+        M4DBS = Mini4WDBlobSelector(backend,14,400,4.5)
+        results[backend] = M4DBS.Detect(binaryImage,gx_pre,gy_pre,offset)
+    assert results['ccl'][:6] == results['contour'][:6]           # 外接矩形と中心は同じ．面積の測り方だけが違う
+    assert results['ccl'][:6] == (50+offset[0],40+offset[1],12,8,56.0+offset[0],44.0+offset[1])
+    assert results['ccl'][6] == 12*8
+
+def test_ccl_ignores_blobs_outside_the_size_range():
+    binaryImage = CreateBinaryImage([(50,40,12,8),(63,44,1,1),(0,0,40,40)])   # 1ピクセルのノイズが前回の座標に一番近い
+    M4DBS       = Mini4WDBlobSelector('ccl',14,400,20)
+    assert M4DBS.Detect(binaryImage,62,44)[:6] == (50,40,12,8,56.0,44.0)
+
+def test_ccl_reports_not_found_outside_the_gate():
+    binaryImage = CreateBinaryImage([(50,40,12,8)])
+    M4DBS       = Mini4WDBlobSelector('ccl',14,400,4.5)
+    assert M4DBS.Detect(binaryImage,70,44) == (-1,-1,-1,-1,-1,-1,-1)
@@ -0,0 +1,27 @@
+import cv2
+import time
+import numpy as np
+import pytest
+from Mini4WDReplay import Mini4WDReplayCapture,Mini4WDSyntheticCapture
+
+def test_frame_time_follows_the_video_in_fast_mode(tmp_path):
+    for i in range(3):
+        cv2.imwrite(str(tmp_path/'{:03d}.png'.format(i)),np.full((8,8,3),i,dtype=np.uint8))
+    capture = Mini4WDReplayCapture(str(tmp_path),'fast',FPS=10)
+    times   = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        times.append(capture.GetFrameTime())
+        time.sleep(0.02)                                            # 処理が遅くてもフレームの時刻は変わらない
+    assert len(times) == 3
+    assert np.diff(times) == pytest.approx([0.1,0.1])
+
+def test_synthetic_frame_time():
+    capture = Mini4WDSyntheticCapture(64,48,FrameCount=2,StillFrames=1,FPS=50)
+    capture.read()
+    start   = capture.GetFrameTime()
+    capture.read()
+    capture.read()
+    assert capture.GetFrameTime()-start == pytest.approx(0.04)
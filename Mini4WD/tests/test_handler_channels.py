@@ -0,0 +1,20 @@
+import pytest
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLogger import Mini4WDLogger
+from Mini4WDHandler import Mini4WDHandler
+from Mini4WDException import NotAllowedValue
+
+# どちらもJavaプログラムを起動する前に失敗する
+
+def test_second_car_requires_its_own_port(SettingFile):
+    M4DL = Mini4WDLogger(Mini4WDInitializer(SettingFile(CarCount=2,Mini4WDPortName_2='COM15')))
+    with pytest.raises(KeyError):
+        Mini4WDHandler(M4DL,'_2')                                   # M4DSPortNum_2がない
+
+def test_second_car_rejects_the_port_of_the_first(SettingFile):
+    M4DL = Mini4WDLogger(Mini4WDInitializer(SettingFile(CarCount=2,M4DSPortNum=25335,M4DSPortNum_2=25335,\
+            Mini4WDPortName_2='COM15')))
+    with pytest.raises(NotAllowedValue):
+        Mini4WDHandler(M4DL,'_2')
+    with pytest.raises(NotAllowedValue):
+        Mini4WDHandler(M4DL)                                        # 1台目から見ても重なっている
@@ -0,0 +1,34 @@
+import pytest
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLogger import Mini4WDLogger
+from Mini4WDHandler import Mini4WDHandlerForTest
+from Mini4WDException import NotAllowedValue
+
+class RecordingHandler(Mini4WDHandlerForTest):
+    def __init__(self,Mini4WDLogger):
+        super().__init__(Mini4WDLogger)
+        self.Sent = []
+
+    def TransmitCommand(self,key,value,FrameID=-1,FrameTime=None,PostTime=None):
+        self.Sent.append((key,value))
+
+class Bridge():
+    # SendActuatorStateを持たない古いJavaプログラムの代わり
+    def HasMethod(self,name):
+        return name != 'SendActuatorState'
+
+def test_stop_is_sent_even_if_the_last_state_was_stopped(SettingFile):
+    M4DH = RecordingHandler(Mini4WDLogger(Mini4WDInitializer(SettingFile())))
+    M4DH.SendActuatorState(0,False,False)
+    M4DH.Sent.clear()
+    assert not M4DH.SendActuatorState(0,False,False)                # 差分がないので送信しない
+    M4DH.StopCar()
+    assert M4DH.Sent == [('state',{'duty':0,'rightLED':False,'leftLED':False})]
+
+def test_batched_command_requires_the_entry_point(SettingFile):
+    M4DH = RecordingHandler(Mini4WDLogger(Mini4WDInitializer(SettingFile())))
+    M4DH.M4DJH = Bridge()
+    with pytest.raises(NotAllowedValue):
+        M4DH.CheckBatchedCommand()
+    M4DH.BatchedCommand = False                                     # 一つずつ送信する場合は確かめない
+    M4DH.CheckBatchedCommand()
@@ -0,0 +1,39 @@
+import socket
+import subprocess
+import sys
+import time
+import pytest
+from Mini4WDHandler import Mini4WDJavaHandler
+from Mini4WDException import JVMStartFailed
+
+@pytest.fixture
+def BusyPort():
+    '''
+    前回止め損ねたJavaプログラムの代わりにポートを使うソケット
+    '''
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1',0))
+        listener.listen()
+        yield listener.getsockname()[1]
+
+class AnsweringHandler(Mini4WDJavaHandler):
+    # 起動したJavaプログラムがポートを使えずに終了し，別のJavaプログラムが応答する場合の代わり
+    def IsReady(self):
+        self.Process.wait()
+        return True
+
+def test_refuses_a_port_already_in_use(BusyPort):
+    # Javaプログラムを起動する前に失敗する
+    with pytest.raises(JVMStartFailed):
+        Mini4WDJavaHandler(PortNum=BusyPort,StartTimeout=1.0)
+
+def test_does_not_trust_the_probe_after_the_process_exited(BusyPort):
+    M4DJH           = AnsweringHandler.__new__(AnsweringHandler)
+    M4DJH.PortNum   = BusyPort
+    M4DJH.StartTimeout = 1.0
+    M4DJH.ReuseBridge = False
+    M4DJH.ClassName = 'Mini4WD'
+    M4DJH.app       = None
+    M4DJH.Gateway   = None
+    M4DJH.Process   = subprocess.Popen([sys.executable,'-c','import time; time.sleep(0.2)'])
+    assert not M4DJH.WaitUntilReady(time.perf_counter()+1.0)
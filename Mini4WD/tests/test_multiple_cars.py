@@ -0,0 +1,31 @@
+import cv2
+import math
+import pytest
+from Mini4WDInitializer import Mini4WDInitializer
+from Mini4WDLogger import Mini4WDLogger
+from Mini4WDHandler import Mini4WDHandlerForTest
+from Mini4WDReplay import Mini4WDSyntheticCapture
+from Mini4WDDetector import Mini4WDDetector
+
+@pytest.fixture(autouse=True)
+def NoWindow(monkeypatch):
+    monkeypatch.setattr(cv2,'destroyAllWindows',lambda: None)     # ウィンドウを表示できない環境でも動かす
+
+def test_two_cars_are_tracked_from_the_first_frame(SettingFile):
+    # 1台目は(120,72)，2台目は(40,72)から周回する．どちらもmapX_pre,mapY_preから求める最初の座標と同じ
+    path    = SettingFile(CarCount=2,mapX_pre=5,mapY_pre=2,mapX_pre_2=1,mapY_pre_2=2,\
+                M4DSPortNum_2=25336,Mini4WDPortName_2='COM15')
+    M4DIr   = Mini4WDInitializer(path)
+    M4DL    = Mini4WDLogger(M4DIr)
+    M4DHs   = [Mini4WDHandlerForTest(M4DL),Mini4WDHandlerForTest(M4DL,'_2')]
+    capture = Mini4WDSyntheticCapture(320,240,Center=(80,72),Radius=(40,40),FramesPerLap=120,FrameCount=90,CarCount=2)
+    M4DD    = Mini4WDDetector(M4DHs[0],capture,None,M4DHs[1:])
+    M4DL.UpdateDetectionLogFile()
+
+    M4DD.StartDetectingMini4WD()                                    # 1台目が見つかる前のフレームで止まらない
+
+    expected = capture.GetPositions(capture.FrameCount-1)
+    for car, (gx, gy) in zip(M4DD.GetCars(),expected):
+        mapX, mapY, x, y, w, h, area = car.GetInformationsOfDetection()
+        assert math.hypot(x-gx,y-gy) < 2                            # 入れ替わらずに最後まで追っている
+    assert M4DD.GetMini4WDXYCoordinates() == M4DD.GetCars()[0].GetInformationsOfDetection()[2:4]